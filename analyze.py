@@ -1,22 +1,35 @@
 import glob
 import os
 import json
+from typing import Optional
 
 def execute_matching_files(folder_path,
                            file_pattern="*.py",
-                           exclude_mark=False):
+                           exclude_mark=False,
+                           timeout=None,
+                           memory_limit_mb=None,
+                           workers=1,
+                           resume=False,
+                           problems=None):
     """
     Traverse files matching pattern, execute their functions and collect results
     
     Args:
         folder_path (str): Path to the folder containing the Python files
         file_pattern (str): Pattern to match files (e.g., "*.py")
+        timeout (float): Per-file wall-clock limit in seconds (default: config.json "execution")
+        memory_limit_mb (float): Per-file memory limit (default: config.json "execution")
+        workers (int): Number of files executed at the same time
+        resume (bool): Reuse earlier results (`execution_results.json` and its journal) of files
+            that have not changed since they were executed
+        problems (dict): Dataset entries by file key, used to give each solve its share of cores
         
     Returns:
         dict: Dictionary with filenames as keys and function return values as values
     """
-    results = {}
-    import types
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from executor import execute_file, get_execution_pool
+    from utils import CompletionManifest, ResultJournal, load_results
 
     # Get all matching files using glob
     pattern = os.path.join(folder_path, file_pattern)
@@ -30,43 +43,100 @@ def execute_matching_files(folder_path,
                 f for f in matching_files if f not in exclude_files
             ]
 
-    for file_path in matching_files:
+    def file_key(file_path):
         # Get the filename without extension
-        file_name = os.path.basename(file_path)
-        file_name_key = file_name.split('.')[0]  # Remove the .py extension
-        print("Processing:", file_name_key)
-        # if not exclude_mark:
-        #     file_name_key = file_name_key[:-2]
-        # Create a new namespace for the file
-        file_namespace = {}
-
-        try:
-            # Execute the entire file content in the namespace
-            with open(file_path, 'r', encoding='utf-8') as f:
-                file_content = f.read()
-
-            # Execute the file in the namespace
-            exec(file_content, file_namespace)
-
-            # Find and execute the function
-            found_function = False
-            for item_name, item in file_namespace.items():
-                if callable(item) and not item_name.startswith('__') and isinstance(item, types.FunctionType):
-                    result = item()
-                    results[file_name_key] = result
-                    found_function = True
-                    break
-
-            if not found_function:
-                results[file_name_key] = 'Error: No callable function found'
-
-        except Exception as e:
-            print(f"Error processing {file_path}: {str(e)}")
-            results[file_name_key] = f'Error: {str(e)}'
+        return os.path.basename(file_path).split('.')[0]
+
+    def execute(file_path):
+        print("Processing:", file_key(file_path))
+        # Run the file's first function in a child process with time/memory limits
+        execution = execute_file(file_path, timeout=timeout, memory_limit_mb=memory_limit_mb, function_order="definition",
+                                 problem=(problems or {}).get(file_key(file_path)))
+        if execution.ok:
+            # Values that cannot leave the child (e.g. Gurobi objects) arrive as their float() or str()
+            return execution.value
+        # The same strings as the original in-process runner; timeouts and crashes are new
+        if execution.error_kind == "no_function":
+            return 'Error: No callable function found'
+        if execution.error_kind in ("exception", "memory"):
+            message = execution.message
+            try:
+                # exec() compiled the source as "<string>", which syntax errors quote
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    compile(f.read(), "<string>", "exec")
+            except Exception as e:
+                message = str(e)
+            print(f"Error processing {file_path}: {message}")
+            return f'Error: {message}'
+        print(f"Error processing {file_path}: {execution.error}")
+        return f'Error: {execution.error}'
+
+    def finish(file_path, result):
+        collected[file_path] = result
+        journal.append(file_key(file_path), result)
+        # Remembers the file's modification time, so an edited file is executed again on resume
+        manifest.mark_complete("execution", file_key(file_path), [], inputs=[file_path])
+
+    # Each result is streamed to execution_results.jsonl as soon as it is known
+    results_file = os.path.join(folder_path, "execution_results.json")
+    previous_results = load_results(results_file) if resume else {}
+    journal = ResultJournal(results_file)
+    manifest = CompletionManifest(folder_path)
+    collected = {}
+    todo_files = []
+    for file_path in matching_files:
+        if (file_key(file_path) in previous_results
+                and manifest.is_complete("execution", file_key(file_path), previous_results)):
+            collected[file_path] = previous_results[file_key(file_path)]
+        else:
+            todo_files.append(file_path)
+
+    workers = max(1, workers)
+    if workers > 1:
+        pool = get_execution_pool()
+        if pool is not None:
+            pool.grow(workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(execute, file_path): file_path for file_path in todo_files}
+            for future in as_completed(futures):
+                finish(futures[future], future.result())
+    else:
+        for file_path in todo_files:
+            finish(file_path, execute(file_path))
 
+    # Same keys in the same (glob) order as a sequential run
+    results = {file_key(file_path): collected[file_path] for file_path in matching_files}
+    journal.compact({key: rank for rank, key in enumerate(results)})
     return results
 
 
+def comparison_summary(match_count: int, total_count: int, problem_type_stats: Optional[dict] = None,
+                       problem_size_stats: Optional[dict] = None) -> dict:
+    """
+    The `__summary__` of a comparison: the overall accuracy and, when their
+    {"total", "matched"} counts per group are given, the accuracy per problem
+    type and size.
+    """
+    summary = {
+        "total_count": total_count,
+        "match_count": match_count,
+        "accuracy": match_count / total_count * 100 if total_count > 0 else 0
+    }
+    for stats_name, group_stats in (("problem_type_stats", problem_type_stats),
+                                    ("problem_size_stats", problem_size_stats)):
+        if group_stats is None:
+            continue
+        summary[stats_name] = {
+            group_name: {
+                "total": stats["total"],
+                "matched": stats["matched"],
+                "accuracy": stats["matched"] / stats["total"] * 100 if stats["total"] > 0 else 0
+            }
+            for group_name, stats in group_stats.items()
+        }
+    return summary
+
+
 def compare_results(results_a: dict, results_b: dict, save_path: str, save_file_name: str, is_ground_truth=False, prob_type=None, prob_size=None):
     """
     Compare two sets of results and display in tabular format using Rich
@@ -259,21 +329,13 @@ def compare_results(results_a: dict, results_b: dict, save_path: str, save_file_
     console.print(table)
 
     # Add summary information
-    if total_count > 0:
-        accuracy = match_count / total_count * 100
-    else:
-        accuracy = 0
-
-    comparison_results["__summary__"] = {
-        "total_count": total_count,
-        "match_count": match_count,
-        "accuracy": accuracy
-    }
+    comparison_results["__summary__"] = comparison_summary(match_count, total_count,
+                                                           problem_type_stats if prob_type else None,
+                                                           problem_size_stats if prob_size else None)
+    accuracy = comparison_results["__summary__"]["accuracy"]
 
     # Add problem type statistics to summary
     if prob_type:
-        comparison_results["__summary__"]["problem_type_stats"] = {}
-
         # Create a table for problem type analysis
         type_table = Table(
             show_header=True,
@@ -287,34 +349,21 @@ def compare_results(results_a: dict, results_b: dict, save_path: str, save_file_
         type_table.add_column("Matched", justify="right")
         type_table.add_column("Total", justify="right")
 
-        for type_name, stats in problem_type_stats.items():
-            if stats["total"] > 0:
-                type_accuracy = (stats["matched"] / stats["total"]) * 100
-            else:
-                type_accuracy = 0
-
+        for type_name, stats in comparison_results["__summary__"]["problem_type_stats"].items():
             # Add the type statistics row
             type_table.add_row(
                 type_name,
-                f"{type_accuracy:.2f}%",
+                f"{stats['accuracy']:.2f}%",
                 str(stats["matched"]),
                 str(stats["total"])
             )
 
-            comparison_results["__summary__"]["problem_type_stats"][type_name] = {
-                "total": stats["total"],
-                "matched": stats["matched"],
-                "accuracy": type_accuracy
-            }
-
         # Display the problem type analysis table
         console.print("\n")
         console.print(type_table)
 
     # Add problem size statistics to summary
     if prob_size:
-        comparison_results["__summary__"]["problem_size_stats"] = {}
-
         # Create a table for problem size analysis
         size_table = Table(
             show_header=True,
@@ -328,26 +377,15 @@ def compare_results(results_a: dict, results_b: dict, save_path: str, save_file_
         size_table.add_column("Matched", justify="right")
         size_table.add_column("Total", justify="right")
 
-        for size_name, stats in problem_size_stats.items():
-            if stats["total"] > 0:
-                size_accuracy = (stats["matched"] / stats["total"]) * 100
-            else:
-                size_accuracy = 0
-
+        for size_name, stats in comparison_results["__summary__"]["problem_size_stats"].items():
             # Add the size statistics row
             size_table.add_row(
                 size_name,
-                f"{size_accuracy:.2f}%",
+                f"{stats['accuracy']:.2f}%",
                 str(stats["matched"]),
                 str(stats["total"])
             )
 
-            comparison_results["__summary__"]["problem_size_stats"][size_name] = {
-                "total": stats["total"],
-                "matched": stats["matched"],
-                "accuracy": size_accuracy
-            }
-
         # Display the problem size analysis table
         console.print("\n")
         console.print(size_table)
@@ -0,0 +1,365 @@
+import ast
+import difflib
+import re
+from typing import Callable, List, Optional, Tuple
+
+
+# Names that generated code uses without importing, and the import that binds them
+KNOWN_IMPORTS = {
+    "gp": "import gurobipy as gp",
+    "gurobipy": "import gurobipy",
+    "GRB": "from gurobipy import GRB",
+    "quicksum": "from gurobipy import quicksum",
+    "Model": "from gurobipy import Model",
+    "tupledict": "from gurobipy import tupledict",
+    "tuplelist": "from gurobipy import tuplelist",
+    "multidict": "from gurobipy import multidict",
+    "max_": "from gurobipy import max_",
+    "min_": "from gurobipy import min_",
+    "abs_": "from gurobipy import abs_",
+    "math": "import math",
+    "np": "import numpy as np",
+    "numpy": "import numpy",
+    "itertools": "import itertools",
+    "product": "from itertools import product",
+    "combinations": "from itertools import combinations",
+    "permutations": "from itertools import permutations",
+    "defaultdict": "from collections import defaultdict",
+}
+
+# Expression methods that builtin sum() loses when every term is a number
+EXPRESSION_METHODS = ("getValue", "getConstant", "getVar", "getCoeff", "size", "addTerms", "add")
+
+# Attributes that are only available once the model has a solution
+SOLUTION_ATTRIBUTES = ("ObjVal", "ObjBound", "MIPGap")
+
+
+class ParsedError:
+    """
+    Exception type, message and user-code line number recovered from an
+    execution error string (the output of `format_user_traceback`, or a
+    full traceback when the error was raised outside the user module).
+    """
+
+    def __init__(self, exc_type: str, message: str, lineno: Optional[int]):
+        self.exc_type = exc_type
+        self.message = message
+        self.lineno = lineno
+
+    @classmethod
+    def parse(cls, error_message: str) -> Optional["ParsedError"]:
+        if not isinstance(error_message, str):
+            return None
+        exceptions = re.findall(r"^([A-Za-z_][\w.]*(?:Error|Exception)): (.*)$", error_message, re.MULTILINE)
+        if not exceptions:
+            return None
+        exc_type, message = exceptions[-1]
+        lines = re.findall(r'File "[^"]*temp_module\.py", line (\d+)', error_message)
+        return cls(exc_type.rsplit(".", 1)[-1], message.strip(), int(lines[-1]) if lines else None)
+
+
+class SourceEditor:
+    """
+    Collects replacements of AST node spans and applies them to the original
+    text, so everything outside the edited expressions keeps its formatting
+    and comments.
+    """
+
+    def __init__(self, code: str):
+        self.code = code
+        self.lines = code.splitlines(keepends=True)
+        self.line_starts = [0]
+        for line in self.lines:
+            self.line_starts.append(self.line_starts[-1] + len(line))
+        self.edits = []
+
+    def offset(self, lineno: int, col_offset: int) -> int:
+        # ast column offsets count UTF-8 bytes
+        line = self.lines[lineno - 1]
+        return self.line_starts[lineno - 1] + len(line.encode("utf-8")[:col_offset].decode("utf-8", errors="ignore"))
+
+    def segment(self, node: ast.AST) -> str:
+        start, end = self.span(node)
+        return self.code[start:end]
+
+    def span(self, node: ast.AST) -> Tuple[int, int]:
+        return (self.offset(node.lineno, node.col_offset),  # type: ignore
+                self.offset(node.end_lineno, node.end_col_offset))  # type: ignore
+
+    def replace(self, node: ast.AST, text: str):
+        self.edits.append((*self.span(node), text))
+
+    def insert_line(self, lineno: int, text: str):
+        position = self.line_starts[min(lineno, len(self.lines) + 1) - 1]
+        if position == len(self.code) and self.code and not self.code.endswith("\n"):
+            text = "\n" + text
+        self.edits.append((position, position, text + "\n"))
+
+    def apply(self) -> Optional[str]:
+        if not self.edits:
+            return None
+        code = self.code
+        # Insertions go before replacements at the same position; the outermost replacement wins when spans nest
+        edits = sorted(set(self.edits), key=lambda edit: (edit[0], edit[0] != edit[1], -edit[1]))
+        kept, covered_until = [], -1
+        for start, end, text in edits:
+            if start == end:
+                kept.append((start, end, text))
+                continue
+            if start < covered_until:
+                continue
+            kept.append((start, end, text))
+            covered_until = end
+        for start, end, text in reversed(kept):
+            code = code[:start] + text + code[end:]
+        return code
+
+
+def _import_line(tree: ast.Module) -> int:
+    """Line before which new imports go: after the docstring and __future__ imports."""
+    for index, node in enumerate(tree.body):
+        if index == 0 and isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) \
+                and isinstance(node.value.value, str):
+            continue
+        if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+            continue
+        decorators = getattr(node, "decorator_list", [])
+        return min([node.lineno] + [decorator.lineno for decorator in decorators])
+    return tree.body[-1].end_lineno + 1 if tree.body else 1  # type: ignore
+
+
+def _module_names(tree: ast.Module) -> set:
+    """Names bound by imports anywhere in the module."""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add(alias.asname or alias.name.split(".")[0])
+    return names
+
+
+def _gurobipy_prefix(tree: ast.Module, editor: SourceEditor, name: str) -> str:
+    """
+    Expression that reaches `gurobipy.<name>` in this module, adding
+    `from gurobipy import <name>` when nothing binds it yet.
+    """
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module == "gurobipy":
+            for alias in node.names:
+                if alias.name == name:
+                    return alias.asname or name
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name == "gurobipy":
+                    return f"{alias.asname or 'gurobipy'}.{name}"
+    editor.insert_line(_import_line(tree), f"from gurobipy import {name}")
+    return name
+
+
+def fix_missing_import(tree: ast.Module, editor: SourceEditor, error: ParsedError) -> bool:
+    """NameError for a well-known module or gurobipy name: add its import."""
+    match = re.match(r"name '(\w+)' is not defined", error.message)
+    if error.exc_type != "NameError" or not match or match.group(1) not in KNOWN_IMPORTS:
+        return False
+    if match.group(1) in _module_names(tree):
+        return False
+    editor.insert_line(_import_line(tree), KNOWN_IMPORTS[match.group(1)])
+    return True
+
+
+def fix_grb_constant(tree: ast.Module, editor: SourceEditor, error: ParsedError) -> bool:
+    """Misspelled or wrongly cased GRB constant, e.g. GRB.Integer or GRB.MINIMISE."""
+    match = re.match(r"(?:type object '(\w+)'|'(\w+)' object) has no attribute '(\w+)'", error.message)
+    if error.exc_type != "AttributeError" or not match:
+        return False
+    owner, owner_type, wrong = match.groups()
+    try:
+        from gurobipy import GRB
+    except ImportError:
+        return False
+    if owner is None:
+        # Nested constant classes are instances, e.g. GRB.Status is a 'StatusConstClass'
+        owner = next((name for name in dir(GRB) if type(getattr(GRB, name)).__name__ == owner_type), None)
+        if owner is None:
+            return False
+    namespace = GRB if owner == "GRB" else getattr(GRB, owner, None)
+    if namespace is None:
+        return False
+    constants = [name for name in dir(namespace) if name.isupper() and not name.startswith("_")]
+    if wrong.upper() in constants:
+        right = wrong.upper()
+    else:
+        matches = difflib.get_close_matches(wrong.upper(), constants, n=1, cutoff=0.8)
+        if not matches:
+            return False
+        right = matches[0]
+    applied = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr == wrong:
+            base = node.value
+            base_name = base.attr if isinstance(base, ast.Attribute) else getattr(base, "id", None)
+            if base_name == owner:
+                editor.replace(node, f"{editor.segment(base)}.{right}")
+                applied = True
+    return applied
+
+
+def _is_guarded(node: ast.AST, parents: dict) -> bool:
+    """Whether `node` is already evaluated under a test on the model status or solution count."""
+    while node in parents:
+        node = parents[node]
+        if isinstance(node, (ast.If, ast.IfExp, ast.While)):
+            test = ast.dump(node.test)
+            if "Status" in test or "status" in test or "SolCount" in test:
+                return True
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            return False
+    return False
+
+
+def fix_solution_attribute(tree: ast.Module, editor: SourceEditor, error: ParsedError) -> bool:
+    """
+    Reading model.ObjVal (or ObjBound/MIPGap) without an optimal solution:
+    guard each unguarded read so that it gives an "Error: ..." string with the
+    model status instead, which keeps the debug loop going on a model that is
+    infeasible or unbounded.
+    """
+    match = re.match(r"Unable to retrieve attribute '(\w+)'", error.message)
+    if not match or match.group(1) not in SOLUTION_ATTRIBUTES:
+        return False
+    grb = _gurobipy_prefix(tree, editor, "GRB")
+    parents = {child: parent for parent in ast.walk(tree) for child in ast.iter_child_nodes(parent)}
+    applied = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr == match.group(1) and isinstance(node.ctx, ast.Load) \
+                and not _is_guarded(node, parents):
+            model = editor.segment(node.value)
+            editor.replace(node, f"({model}.{node.attr} if {model}.Status == {grb}.OPTIMAL "
+                                 f"else \"Error: no optimal solution, model Status \" + str({model}.Status))")
+            applied = True
+    return applied
+
+
+def _is_builtin_sum(node: ast.AST) -> bool:
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "sum" \
+        and len(node.args) == 1 and not node.keywords
+
+
+def fix_constant_sum(tree: ast.Module, editor: SourceEditor, error: ParsedError) -> bool:
+    """
+    `sum(...)` over a generator whose terms are all numbers yields a plain
+    int/float without the LinExpr methods. Rewrite the sums feeding the
+    failing expression as `quicksum`, which always returns a LinExpr.
+    """
+    match = re.match(r"'(?:int|float|numpy\.\w+)' object has no attribute '(\w+)'", error.message)
+    if error.exc_type != "AttributeError" or not match or match.group(1) not in EXPRESSION_METHODS:
+        return False
+    method = match.group(1)
+    targets = set()
+    sums = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr == method \
+                and (error.lineno is None or node.lineno == error.lineno):
+            if _is_builtin_sum(node.value):
+                sums.append(node.value)
+            elif isinstance(node.value, ast.Name):
+                targets.add(node.value.id)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and _is_builtin_sum(node.value) \
+                and any(isinstance(target, ast.Name) and target.id in targets for target in node.targets):
+            sums.append(node.value)
+        if isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name) and node.target.id in targets \
+                and _is_builtin_sum(node.value):
+            sums.append(node.value)
+    if not sums:
+        return False
+    quicksum = _gurobipy_prefix(tree, editor, "quicksum")
+    for node in sums:
+        editor.replace(node.func, quicksum)  # type: ignore
+    return True
+
+
+def _addvars_names(tree: ast.Module) -> set:
+    """Variables assigned the tupledict returned by Model.addVars."""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call) \
+                and isinstance(node.value.func, ast.Attribute) and node.value.func.attr == "addVars":
+            names.update(target.id for target in node.targets if isinstance(target, ast.Name))
+    return names
+
+
+def fix_addvars_index(tree: ast.Module, editor: SourceEditor, error: ParsedError) -> bool:
+    """
+    `x[i][j]` on a tupledict from addVars raises KeyError because its keys
+    are tuples; index it as `x[i, j]`.
+    """
+    if error.exc_type != "KeyError":
+        return False
+    names = _addvars_names(tree)
+    if not names:
+        return False
+    applied = False
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Subscript):
+            continue
+        indices = []
+        base = node
+        while isinstance(base, ast.Subscript):
+            index = base.slice
+            indices[:0] = index.elts if isinstance(index, ast.Tuple) else [index]
+            base = base.value
+        if not isinstance(base, ast.Name) or base.id not in names or not isinstance(node.value, ast.Subscript):
+            continue
+        if any(isinstance(index, (ast.Slice, ast.Starred)) for index in indices):
+            continue
+        editor.replace(node, f"{base.id}[{', '.join(editor.segment(index) for index in indices)}]")
+        applied = True
+    return applied
+
+
+AUTOFIX_RULES: List[Tuple[str, Callable[[ast.Module, SourceEditor, ParsedError], bool]]] = [
+    ("missing_import", fix_missing_import),
+    ("grb_constant", fix_grb_constant),
+    ("solution_attribute", fix_solution_attribute),
+    ("constant_sum", fix_constant_sum),
+    ("addvars_index", fix_addvars_index),
+]
+
+
+def is_objective_value(value) -> bool:
+    """Whether an execution result is an objective value (a number, or a tuple or list starting with one)."""
+    if isinstance(value, (tuple, list)) and value:
+        value = value[0]
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def apply_autofix(code_text: str, error_message: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Try the deterministic repair rules on code that failed with `error_message`.
+
+    Returns:
+        tuple: (fixed code, rule name) for the first rule that changed the
+        code, or (None, None) when no rule applies.
+    """
+    error = ParsedError.parse(error_message)
+    if error is None or not code_text:
+        return None, None
+    try:
+        tree = ast.parse(code_text)
+    except SyntaxError:
+        return None, None
+    for name, rule in AUTOFIX_RULES:
+        editor = SourceEditor(code_text)
+        if not rule(tree, editor, error):
+            continue
+        fixed_code = editor.apply()
+        if fixed_code is None or fixed_code == code_text:
+            continue
+        try:
+            ast.parse(fixed_code)
+        except SyntaxError:
+            continue
+        return fixed_code, name
+    return None, None
@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+def make_cache_key(*parts) -> str:
+    """
+    Content-address a request: sha256 over the canonical JSON of `parts`.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheBackend:
+    """
+    Storage interface for content-addressed cache entries.
+
+    Entries are JSON-serializable dicts. Backends track creation and last
+    access time so `evict` can drop expired entries first and then the least
+    recently used ones until the store fits in `max_size_bytes`.
+    """
+
+    def get(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: dict):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def evict(self, max_size_bytes: Optional[int] = None, ttl: Optional[float] = None) -> int:
+        raise NotImplementedError
+
+    def size(self) -> int:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Single-file SQLite store, the default for one machine."""
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, last_access REAL NOT NULL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON entries(last_access)")
+
+    def get(self, key: str) -> Optional[dict]:
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: dict):
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), now, now))
+
+    def delete(self, key: str):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def evict(self, max_size_bytes: Optional[int] = None, ttl: Optional[float] = None) -> int:
+        evicted = 0
+        with self.lock, self.conn:
+            if ttl:
+                evicted += self.conn.execute("DELETE FROM entries WHERE created < ?",
+                                             (time.time() - ttl,)).rowcount
+            if max_size_bytes is not None:
+                total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > max_size_bytes:
+                    stale_keys = []
+                    for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+                        if total <= max_size_bytes:
+                            break
+                        stale_keys.append((key,))
+                        total -= size
+                    self.conn.executemany("DELETE FROM entries WHERE key = ?", stale_keys)
+                    evicted += len(stale_keys)
+        return evicted
+
+    def size(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM entries")
+
+
+class DirectoryCacheBackend(CacheBackend):
+    """
+    One JSON file per entry under a (possibly shared/NFS) directory.
+
+    Files are written to a temporary name and renamed into place, so several
+    machines can share the directory without reading half-written entries.
+    The file mtime doubles as the last access time for LRU eviction.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return entry["value"]
+
+    def set(self, key: str, value: dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "value": value}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat
+
+    def evict(self, max_size_bytes: Optional[int] = None, ttl: Optional[float] = None) -> int:
+        evicted = 0
+        entries = []
+        for path, stat in self._entries():
+            # mtime is refreshed on every hit, ctime approximates creation
+            if ttl and stat.st_ctime < time.time() - ttl:
+                try:
+                    os.remove(path)
+                    evicted += 1
+                except FileNotFoundError:
+                    pass
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        if max_size_bytes is not None:
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= max_size_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    evicted += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+        return evicted
+
+    def size(self) -> int:
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def clear(self):
+        for path, _ in list(self._entries()):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+CACHE_BACKENDS = {
+    "sqlite": SQLiteCacheBackend,
+    "directory": DirectoryCacheBackend,
+}
+
+
+class ResponseCache:
+    """
+    Content-addressed cache with hit/miss counters and size/TTL eviction.
+
+    Modes:
+        "on":      read and write the cache
+        "off":     bypass the cache entirely
+        "refresh": ignore existing entries but store fresh results
+    """
+
+    MODES = ("on", "off", "refresh")
+
+    def __init__(self,
+                 backend: Optional[CacheBackend] = None,
+                 mode: str = "on",
+                 max_size_mb: Optional[float] = None,
+                 ttl_days: Optional[float] = None,
+                 evict_every: int = 100):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown cache mode: {mode}. Supported modes are: {', '.join(self.MODES)}")
+        self.backend = backend
+        self.mode = mode
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.ttl = ttl_days * 86400 if ttl_days else None
+        self.evict_every = evict_every
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @classmethod
+    def from_config(cls, cache_config: dict, mode: Optional[str] = None) -> "ResponseCache":
+        """
+        Build a cache from a config.json section such as
+        {"backend": "sqlite", "path": "cache/llm_cache.sqlite", "max_size_mb": 1024, "ttl_days": 30}.
+        """
+        mode = mode or cache_config.get("mode", "on")
+        backend = None
+        if mode != "off":
+            backend_name = cache_config.get("backend", "sqlite")
+            if backend_name not in CACHE_BACKENDS:
+                raise ValueError(f"Unknown cache backend: {backend_name}. Supported backends are: {', '.join(CACHE_BACKENDS)}")
+            backend = CACHE_BACKENDS[backend_name](cache_config["path"])
+        cache = cls(backend=backend,
+                    mode=mode,
+                    max_size_mb=cache_config.get("max_size_mb"),
+                    ttl_days=cache_config.get("ttl_days"))
+        cache.evict()
+        return cache
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None and self.mode != "off"
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.enabled or self.mode == "refresh":
+            return None
+        value = self.backend.get(key)  # type: ignore
+        with self.lock:
+            self.stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    def put(self, key: str, value: dict):
+        if not self.enabled:
+            return
+        self.backend.set(key, value)  # type: ignore
+        with self.lock:
+            self.stats["stores"] += 1
+            run_eviction = self.stats["stores"] % self.evict_every == 0
+        if run_eviction:
+            self.evict()
+
+    def evict(self) -> int:
+        if not self.enabled or (self.max_size_bytes is None and self.ttl is None):
+            return 0
+        evicted = self.backend.evict(self.max_size_bytes, self.ttl)  # type: ignore
+        with self.lock:
+            self.stats["evictions"] += evicted
+        return evicted
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["mode"] = self.mode
+        return stats
@@ -0,0 +1,672 @@
+"""
+Coordinator/worker protocol
+
+One JSON object per line over TCP, each request answered by one reply:
+
+    {"op": "hello", "worker": name}              -> {"args": {...main.py arguments...}, "lease_timeout": s}
+    {"op": "lease", "worker": name}              -> {"task": {...}} | {"wait": s} | {"done": true}
+    {"op": "heartbeat", "lease": id}             -> {"ok": bool}
+    {"op": "result", "lease": id, "result": {...}, "seconds": s,
+     "process": name, "llm_stats": {...}}      -> {"ok": bool}
+
+A task is one agent stage ("model", "solve" or a baseline pattern) for one
+problem key. A lease that is not renewed by a heartbeat within
+`lease_timeout` seconds, or whose worker disconnects, is put back in the
+queue for another worker. The coordinator only writes the files a task
+is expected to produce (`{key}.py`, `{key}.txt`); a result with any other
+file name is rejected and its task re-queued. There is no authentication,
+so the coordinator listens on localhost unless --listen says otherwise.
+`llm_stats` covers the whole worker process, so
+the slots of one process report it under the same `process` name.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from collections import deque
+from itertools import islice
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.progress import Progress, TextColumn, BarColumn, TimeElapsedColumn
+
+from main import build_parser, configure_run
+from llm_call import get_llm_stats
+from scheduler import CostScheduler
+from shards import merge_llm_stats, shard_dir_name
+from utils import ResultJournal, CompletionManifest, TokenManager, load_results, str2py
+from workflow import Dataset, Baselines, ORThoughtModelAgent, ORThoughtSolveAgent, pending_items
+
+
+DEFAULT_PORT = 8765
+
+
+def send_message(stream, message: dict):
+    stream.write((json.dumps(message, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+    stream.flush()
+
+
+def receive_message(stream) -> Optional[dict]:
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line.decode("utf-8"))
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port or DEFAULT_PORT)
+
+
+def read_files(folder: str, names: List[str]) -> dict:
+    files = {}
+    for name in names:
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                files[name] = f.read()
+    return files
+
+
+def task_file_names(key: str) -> set:
+    """The only files a task may send back."""
+    return {f"{key}.py", f"{key}.txt"}
+
+
+def valid_files(files, key: str) -> bool:
+    return isinstance(files, dict) and all(
+        name in task_file_names(key) and os.path.basename(name) == name and isinstance(content, str)
+        for name, content in files.items())
+
+
+def write_files(folder: str, files: dict):
+    os.makedirs(folder, exist_ok=True)
+    for name, content in files.items():
+        # Never follow a peer's file name out of the folder
+        if not name or name in (".", "..") or "/" in name or (os.altsep and os.altsep in name) or os.sep in name:
+            raise ValueError(f"Invalid file name: {name!r}")
+        with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+def token_usage_dict(token_usage) -> Optional[dict]:
+    if token_usage is None:
+        return None
+    return {field: getattr(token_usage, field, 0)
+            for field in ("completion_tokens", "prompt_tokens", "total_tokens", "samples", "cached")}
+
+
+class ORThoughtJob:
+    """
+    The coordinator side of an ORThought run on one dataset: a "model" and a
+    "solve" task per problem, with results written like
+    ORThoughtPipelineAgent does.
+    """
+
+    def __init__(self, args, dataset: Dataset, save_path: str, mode: str, console: Console):
+        self.args = args
+        self.dataset = dataset
+        self.mode = mode
+        self.console = console
+        self.name = f"{dataset.dataset_name}/orthought_{mode}"
+        self.model_agent = ORThoughtModelAgent()
+        self.solve_agent = ORThoughtSolveAgent()
+        self.base_pattern = f"orthought_{mode}"
+        self.model_path = os.path.join(save_path, self.base_pattern)
+        self.initial_path, self.result_path, self.process_name = self.solve_agent.result_paths(
+            save_path, self.base_pattern, args.debug_max_try)
+        os.makedirs(self.model_path, exist_ok=True)
+        os.makedirs(self.result_path, exist_ok=True)
+        self.model_journal = ResultJournal(os.path.join(self.model_path, "results.json"))
+        self.model_manifest = CompletionManifest(self.model_path)
+        # Without debugging both stages share one results.json
+        if self.result_path == self.model_path:
+            self.solve_journal, self.solve_manifest = self.model_journal, self.model_manifest
+        else:
+            self.solve_journal = ResultJournal(os.path.join(self.result_path, "results.json"))
+            self.solve_manifest = CompletionManifest(self.result_path)
+        self.model_token_manager = TokenManager(args.llm_model)
+        self.solve_token_manager = TokenManager(args.llm_model)
+        self.execute_results = {}
+        self.model_except_keys, self.solve_except_keys = [], []
+
+        self.data_items = list(islice(dataset.data.items(), min(args.item_num, len(dataset))))
+        self.key_rank = {key: rank for rank, (key, _) in enumerate(self.data_items)}
+        previous_solve_results = load_results(os.path.join(self.result_path, "results.json"))
+        self.todo_items = pending_items(self.data_items, self.solve_manifest, "solve", previous_solve_results,
+                                        args.resume, console)
+        self.solve_agent.restore_skipped(self.data_items, self.todo_items, previous_solve_results,
+                                         self.execute_results)
+        self.modeled_keys = set()
+        if args.resume:
+            previous_model_results = load_results(os.path.join(self.model_path, "results.json"))
+            self.modeled_keys = {key for key, _ in self.todo_items
+                                 if self.model_manifest.is_complete("model", key, previous_model_results)}
+        self.model_scheduler = CostScheduler(dataset.dataset_name, f"{args.llm_model}/{self.base_pattern}/model")
+        self.solve_scheduler = CostScheduler(dataset.dataset_name, f"{args.llm_model}/{self.base_pattern}/solve")
+        self.todo_items = self.model_scheduler.order(self.todo_items, self.solve_scheduler)
+        self.total = len(self.todo_items)
+
+    def initial_tasks(self) -> List[Tuple[str, str]]:
+        # Items whose code is already generated go straight to the solve stage
+        return [("solve" if key in self.modeled_keys else "model", key) for key, _ in self.todo_items]
+
+    def task_payload(self, stage: str, key: str) -> dict:
+        payload = {"value": self.dataset.data[key], "mode": self.mode}
+        if stage == "solve":
+            payload["files"] = read_files(self.model_path, [f"{key}.txt", f"{key}.py"])
+        return payload
+
+    def on_result(self, stage: str, key: str, result: dict, seconds: Optional[float]) -> List[Tuple[str, str]]:
+        """Record a finished task and return the tasks that follow it."""
+        if stage == "model":
+            if seconds is not None:
+                self.model_scheduler.record(key, seconds)
+            item_result = result.get("item_result", {"error": result.get("error")})
+            write_files(self.model_path, result.get("files", {}))
+            if "error" in item_result:
+                self.console.print(f"Error processing {key}: {item_result['error']}", style="bold red")
+                self.model_except_keys.append(key)
+            self.model_journal.append(key, item_result)
+            if "error" not in item_result and "write_error" not in item_result:
+                self.model_manifest.mark_complete("model", key, [f"{key}.txt", f"{key}.py"])
+            if result.get("token_usage") is not None:
+                self.model_token_manager.add_usage(SimpleNamespace(**result["token_usage"]))
+            return [("solve", key)]
+
+        if seconds is not None:
+            self.solve_scheduler.record(key, seconds)
+        item_result = result.get("item_result", {"error": result.get("error")})
+        # JSON turns the objective tuple of a solved problem into a list
+        if isinstance(item_result.get("execute_result"), list):
+            item_result["execute_result"] = tuple(item_result["execute_result"])
+        write_files(self.result_path, result.get("files", {}))
+        self.solve_agent.record_item(self.console, key, item_result, self.execute_results, self.solve_except_keys)
+        self.solve_journal.append(key, item_result)
+        self.solve_agent.mark_item(self.solve_manifest, key, item_result, self.initial_path)
+        if "code_text" in item_result:
+            completion_tokens, prompt_tokens = result.get("tokens", (0, 0))
+            self.solve_token_manager.add_raw_tokens(completion_tokens, prompt_tokens)
+            self.solve_token_manager.add_debug_rounds(item_result.get("debug_tokens", {}))
+        return []
+
+    def finish(self):
+        self.model_journal.compact(self.key_rank)
+        self.solve_journal.compact(self.key_rank)
+        self.model_scheduler.save()
+        self.model_agent.finish(self.console, self.model_path, self.model_token_manager, self.model_except_keys,
+                                len(self.data_items))
+        self.solve_agent.finish(self.console, self.dataset, self.result_path, self.solve_token_manager,
+                                self.execute_results, self.solve_except_keys, self.base_pattern,
+                                len(self.data_items))
+        return [self.model_path, self.result_path]
+
+
+class BaselineJob:
+    """The coordinator side of a baseline pattern on one dataset: one task per problem."""
+
+    def __init__(self, args, dataset: Dataset, save_path: str, pattern: str, console: Console):
+        self.args = args
+        self.dataset = dataset
+        self.pattern = pattern
+        self.console = console
+        self.name = f"{dataset.dataset_name}/{pattern}"
+        self.agent = Baselines()
+        self.result_path = os.path.join(save_path, pattern)
+        os.makedirs(self.result_path, exist_ok=True)
+        results_file = os.path.join(self.result_path, "results.json")
+        self.journal = ResultJournal(results_file)
+        self.manifest = CompletionManifest(self.result_path)
+        self.token_manager = TokenManager(args.llm_model)
+        self.sample_counts = {}
+
+        data_items = list(islice(dataset.data.items(), min(args.item_num, len(dataset))))
+        self.key_rank = {key: rank for rank, (key, _) in enumerate(data_items)}
+        self.todo_items = pending_items(data_items, self.manifest, pattern, load_results(results_file),
+                                        args.resume, console)
+        self.scheduler = CostScheduler(dataset.dataset_name, f"{args.llm_model}/{pattern}")
+        self.todo_items = self.scheduler.order(self.todo_items)
+        self.total = len(self.todo_items)
+
+    def initial_tasks(self) -> List[Tuple[str, str]]:
+        return [(self.pattern, key) for key, _ in self.todo_items]
+
+    def task_payload(self, stage: str, key: str) -> dict:
+        return {"value": self.dataset.data[key]}
+
+    def on_result(self, stage: str, key: str, result: dict, seconds: Optional[float]) -> List[Tuple[str, str]]:
+        if seconds is not None:
+            self.scheduler.record(key, seconds)
+        if "error" in result:
+            self.console.print(f"Error processing {key}: {result['error']}", style="bold red")
+            return []
+        tokens = SimpleNamespace(**result["token_usage"])
+        if self.pattern == "self_consistency":
+            self.sample_counts[key] = tokens.samples
+        self.token_manager.add_usage(tokens)
+        self.journal.append(key, result["response"])
+        write_files(self.result_path, {f"{key}.txt": result["model_text"]})
+        if not str2py(result["code_text"], os.path.join(self.result_path, f"{key}.py")):
+            self.console.print(f"Failed to write code for key: {key}", style="bold red")
+        else:
+            self.manifest.mark_complete(self.pattern, key, [f"{key}.txt", f"{key}.py"])
+        return []
+
+    def finish(self):
+        self.journal.compact(self.key_rank)
+        self.scheduler.save()
+        self.agent.finish(self.console, self.dataset, self.result_path, self.token_manager, self.sample_counts)
+        return [self.result_path]
+
+
+def build_jobs(args, console: Console) -> list:
+    """The jobs of the run `args` (main.py arguments) describes, in the order main.py runs them."""
+    if args.execute_code or args.reflexion:
+        raise ValueError("Distributed runs support --or_thought and the baseline patterns, "
+                         "not --reflexion or --execute_code")
+    jobs = []
+    for dataset_name in args.dataset_name:
+        results_root = f"result/{args.llm_model}/temp{args.temperature}/round{args.round_mark}"
+        if args.shard:
+            results_root = os.path.join(results_root, shard_dir_name(args.shard))
+        dataset = Dataset(dataset_name=dataset_name, item_range=tuple(args.item_range) if args.item_range else None,
+                          problems=args.problems, shard=args.shard)
+        save_path = os.path.join(results_root, dataset.dataset_name)
+        os.makedirs(save_path, exist_ok=True)
+        if args.or_thought:
+            jobs.extend(ORThoughtJob(args, dataset, save_path, mode, console) for mode in args.mode)
+            continue
+        patterns = [pattern for pattern in ["standard", "zero-shot_cot", "self_consistency"]
+                    if pattern in args.patterns]
+        if not patterns:
+            raise ValueError("No valid patterns specified. Please check your input.")
+        jobs.extend(BaselineJob(args, dataset, save_path, pattern, console) for pattern in patterns)
+    return jobs
+
+
+class Coordinator:
+    """
+    Holds the task queue of a run and hands tasks to workers under leases.
+
+    Tasks are dispatched in CostScheduler order, longest first, and a task
+    that follows a finished one (the solve stage after modeling) goes to the
+    front of the queue so problems are completed as they start. Results are
+    written by the coordinator into the same result layout as a
+    single-machine run, so --resume and the analysis tools work unchanged.
+    A task whose lease is lost `max_attempts` times is recorded as an error.
+    """
+
+    def __init__(self, args, jobs: list, lease_timeout: float = 60.0, max_attempts: int = 3,
+                 console: Optional[Console] = None):
+        self.args = args
+        self.jobs = jobs
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.console = console or Console()
+        self.lock = threading.Lock()
+        self.queue = deque((job_index, stage, key) for job_index, job in enumerate(jobs)
+                           for stage, key in job.initial_tasks())
+        self.attempts = {}
+        self.leases = {}
+        # Leases taken back from a worker, whose result is still accepted if it comes first
+        self.lost_leases = {}
+        self.lease_ids = itertools.count(1)
+        self.finished = set()
+        self.remaining = [job.total for job in jobs]
+        self.worker_stats = {}
+        self.workers = set()
+        self.stats = {"leased": 0, "completed": 0, "requeued": 0, "failed": 0, "duplicates": 0, "rejected": 0}
+
+    @property
+    def done(self) -> bool:
+        with self.lock:
+            return not any(self.remaining)
+
+    def handle(self, message: dict, connection_leases: set) -> dict:
+        op = message.get("op")
+        if op == "hello":
+            with self.lock:
+                self.workers.add(message.get("worker"))
+            return {"args": vars(self.args), "lease_timeout": self.lease_timeout}
+        if op == "lease":
+            return self.lease(message.get("worker"), connection_leases)
+        if op == "heartbeat":
+            with self.lock:
+                lease = self.leases.get(message.get("lease"))
+                if lease is None:
+                    return {"ok": False}
+                lease["expires"] = time.time() + self.lease_timeout
+                return {"ok": True}
+        if op == "result":
+            connection_leases.discard(message.get("lease"))
+            return {"ok": self.complete(message)}
+        return {"error": f"Unknown op: {op}"}
+
+    def lease(self, worker: str, connection_leases: set) -> dict:
+        with self.lock:
+            if not any(self.remaining):
+                return {"done": True}
+            if not self.queue:
+                # Everything is leased; a lost lease may still come back
+                return {"wait": 1.0}
+            job_index, stage, key = task = self.queue.popleft()
+            lease_id = next(self.lease_ids)
+            self.leases[lease_id] = {"task": task, "worker": worker, "expires": time.time() + self.lease_timeout}
+            self.stats["leased"] += 1
+        connection_leases.add(lease_id)
+        job = self.jobs[job_index]
+        return {"task": dict(job.task_payload(stage, key), lease=lease_id, stage=stage, key=key,
+                             dataset=job.dataset.dataset_name)}
+
+    def complete(self, message: dict) -> bool:
+        lease_id = message.get("lease")
+        with self.lock:
+            lease = self.leases.pop(lease_id, None) or self.lost_leases.pop(lease_id, None)
+            if lease is None:
+                self.stats["duplicates"] += 1
+                return False
+            task = lease["task"]
+            if task in self.finished:
+                self.stats["duplicates"] += 1
+                return False
+            result = message.get("result")
+            if not isinstance(result, dict) or not valid_files(result.get("files", {}), task[2]):
+                self.stats["rejected"] += 1
+                # Back under its lease so that requeue counts the attempt
+                self.leases[lease_id] = lease
+            else:
+                if message.get("llm_stats") is not None:
+                    # Cumulative per process: the latest report of each process replaces its earlier ones
+                    self.worker_stats[message.get("process", lease["worker"])] = message["llm_stats"]
+                self.record(task, result, message.get("seconds"))
+                return True
+        self.console.print(f"Rejected a result for {task[1]} of {task[2]} from {lease['worker']}: unexpected files",
+                           style="bold red")
+        self.requeue([lease_id], "invalid result")
+        return False
+
+    def record(self, task: tuple, result: dict, seconds: Optional[float]):
+        """Write a task's result and queue its follow-up tasks (called with the lock held)."""
+        job_index, stage, key = task
+        self.finished.add(task)
+        self.stats["completed"] += 1
+        if task in self.queue:
+            # Finished by a worker whose lease had already expired
+            self.queue.remove(task)
+        follow_ups = self.jobs[job_index].on_result(stage, key, result, seconds)
+        for follow_stage, follow_key in reversed(follow_ups):
+            self.queue.appendleft((job_index, follow_stage, follow_key))
+        if not follow_ups:
+            self.remaining[job_index] -= 1
+
+    def requeue(self, lease_ids, reason: str):
+        with self.lock:
+            for lease_id in lease_ids:
+                lease = self.leases.pop(lease_id, None)
+                if lease is None or lease["task"] in self.finished:
+                    continue
+                self.lost_leases[lease_id] = lease
+                task = lease["task"]
+                self.attempts[task] = self.attempts.get(task, 0) + 1
+                if self.attempts[task] >= self.max_attempts:
+                    self.console.print(f"Giving up on {task[1]} of {task[2]} after {self.attempts[task]} lost leases",
+                                       style="bold red")
+                    self.stats["failed"] += 1
+                    self.record(task, {"error": f"Task lost {self.attempts[task]} times ({reason})"}, None)
+                else:
+                    self.console.print(f"Re-queueing {task[1]} of {task[2]} ({reason})", style="bold yellow")
+                    self.stats["requeued"] += 1
+                    self.queue.appendleft(task)
+
+    def expire_leases(self):
+        while not self.done:
+            now = time.time()
+            with self.lock:
+                expired = [lease_id for lease_id, lease in self.leases.items() if lease["expires"] < now]
+            if expired:
+                self.requeue(expired, "lease expired")
+            time.sleep(min(1.0, self.lease_timeout / 4))
+
+    def serve(self, host: str, port: int):
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                connection_leases = set()
+                try:
+                    while True:
+                        message = receive_message(self.rfile)
+                        if message is None:
+                            break
+                        send_message(self.wfile, coordinator.handle(message, connection_leases))
+                except (ConnectionError, OSError, json.JSONDecodeError):
+                    pass
+                finally:
+                    # A dropped connection loses the worker's tasks right away
+                    if connection_leases:
+                        coordinator.requeue(list(connection_leases), "worker disconnected")
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        server = Server((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        threading.Thread(target=self.expire_leases, daemon=True).start()
+        self.console.print(f"Coordinator listening on {host}:{server.server_address[1]}", style="bold green")
+
+        with Progress(
+            TextColumn("[bold blue]{task.description}"),
+            BarColumn(bar_width=None),
+            TextColumn("[bold green]{task.completed}/{task.total}"),
+            "•",
+            TextColumn("workers: {task.fields[workers]}"),
+            "•",
+            TextColumn("leased: {task.fields[leased]}"),
+            "•",
+            TimeElapsedColumn(),
+            console=self.console,
+            expand=True
+        ) as progress:
+            tasks = [progress.add_task(f"🦊 |Distributed| -{job.name}-", total=job.total, workers=0, leased=0)
+                     for job in self.jobs]
+            while not self.done:
+                with self.lock:
+                    leased = len(self.leases)
+                    workers = len(self.workers)
+                    remaining = list(self.remaining)
+                for job, task, left in zip(self.jobs, tasks, remaining):
+                    progress.update(task, completed=job.total - left, workers=workers, leased=leased)
+                time.sleep(0.5)
+            for job, task in zip(self.jobs, tasks):
+                progress.update(task, completed=job.total)
+
+        for job in self.jobs:
+            result_paths = job.finish()
+            # LLM calls were made by the workers; their statistics replace the coordinator's
+            with self.lock:
+                worker_stats = list(self.worker_stats.values())
+            if worker_stats:
+                for result_path in result_paths:
+                    with open(os.path.join(result_path, "llm_stats.json"), "w", encoding="utf-8") as f:
+                        json.dump(merge_llm_stats(worker_stats), f, indent=2, ensure_ascii=False)
+        self.console.print(f"Distributed run: {self.stats}, workers: {sorted(self.workers)}", style="bold green")
+        # Give polling workers a moment to be told the run is done
+        time.sleep(1.0)
+        server.shutdown()
+        server.server_close()
+
+
+class Worker:
+    """
+    Pulls tasks from a coordinator and runs their agent stage locally,
+    renewing the lease with heartbeats while the task runs.
+    """
+
+    def __init__(self, address: Tuple[str, int], name: str, process: Optional[str] = None,
+                 console: Optional[Console] = None):
+        self.address = address
+        self.name = name
+        # Slots of one process share its LLM statistics
+        self.process = process or name
+        self.console = console or Console()
+        self.lock = threading.Lock()
+        self.datasets = {}
+
+    def request(self, stream, message: dict) -> dict:
+        with self.lock:
+            send_message(stream, message)
+            reply = receive_message(stream)
+        if reply is None:
+            raise ConnectionError("Coordinator closed the connection")
+        return reply
+
+    def dataset(self, dataset_name: str) -> Dataset:
+        if dataset_name not in self.datasets:
+            self.datasets[dataset_name] = Dataset(dataset_name=dataset_name)
+        return self.datasets[dataset_name]
+
+    def run_task(self, args, task: dict) -> dict:
+        stage, key, value = task["stage"], task["key"], task["value"]
+        dataset = self.dataset(task["dataset"])
+        work_path = tempfile.mkdtemp(prefix="orthought_worker_")
+        try:
+            if stage == "model":
+                item_result, token_usage = ORThoughtModelAgent().model_item(
+                    key, value, dataset, work_path, llm_model=args.llm_model, temperature=args.temperature,
+                    mode=task["mode"])
+                return {"item_result": item_result, "token_usage": token_usage_dict(token_usage),
+                        "files": read_files(work_path, [f"{key}.txt", f"{key}.py"])}
+            if stage == "solve":
+                solve_agent = ORThoughtSolveAgent()
+                initial_path, result_path, _ = solve_agent.result_paths(work_path, "initial", args.debug_max_try)
+                write_files(initial_path, task.get("files", {}))
+                os.makedirs(result_path, exist_ok=True)
+                item_result, tokens = solve_agent.solve_item(
+                    key, value, dataset, initial_path, result_path,
+                    llm_model=args.llm_model, temperature=args.temperature, debug_max_try=args.debug_max_try,
+                    debug_candidates=args.debug_candidates, candidate_temperature=args.debug_candidate_temperature,
+                    autofix=args.autofix, compact_debug=args.compact_debug)
+                return {"item_result": item_result, "tokens": tokens,
+                        "files": read_files(result_path, [f"{key}.py"])}
+            response, model_text, code_text, tokens = Baselines.generate_item(
+                key, value, dataset, stage, llm_model=args.llm_model, temperature=args.temperature,
+                self_consistency=dict(num=args.sc_samples, adaptive=args.sc_adaptive,
+                                      max_samples=args.sc_max_samples, threshold=args.sc_threshold))
+            return {"response": response, "model_text": model_text, "code_text": code_text,
+                    "token_usage": token_usage_dict(tokens)}
+        except Exception as e:
+            return {"error": str(e)}
+        finally:
+            shutil.rmtree(work_path, ignore_errors=True)
+
+    def heartbeat(self, stream, lease_id: int, interval: float, stop: threading.Event):
+        while not stop.wait(interval):
+            try:
+                if not self.request(stream, {"op": "heartbeat", "lease": lease_id}).get("ok"):
+                    self.console.print(f"Lease {lease_id} was taken back by the coordinator", style="bold yellow")
+            except (ConnectionError, OSError):
+                return
+
+    def run(self):
+        """Work until the coordinator reports the run as done."""
+        with socket.create_connection(self.address) as connection:
+            stream = connection.makefile("rwb")
+            hello = self.request(stream, {"op": "hello", "worker": self.name})
+            args = argparse.Namespace(**hello["args"])
+            configure_run(args)
+            interval = max(hello["lease_timeout"] / 3, 0.1)
+            completed = 0
+            while True:
+                reply = self.request(stream, {"op": "lease", "worker": self.name})
+                if reply.get("done"):
+                    break
+                if "wait" in reply:
+                    time.sleep(reply["wait"])
+                    continue
+                task = reply["task"]
+                self.console.print(f"{self.name}: {task['stage']} {task['dataset']}/{task['key']}")
+                stop = threading.Event()
+                beat = threading.Thread(target=self.heartbeat, args=(stream, task["lease"], interval, stop),
+                                        daemon=True)
+                beat.start()
+                start_time = time.time()
+                try:
+                    result = self.run_task(args, task)
+                finally:
+                    stop.set()
+                    beat.join()
+                self.request(stream, {"op": "result", "lease": task["lease"], "result": result,
+                                      "seconds": time.time() - start_time, "process": self.process,
+                                      "llm_stats": get_llm_stats()})
+                completed += 1
+        self.console.print(f"{self.name}: run done, {completed} tasks completed", style="bold green")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Distribute a main.py run over several machines')
+    subparsers = parser.add_subparsers(dest='role', required=True)
+
+    coordinator = subparsers.add_parser('coordinator',
+                                        parents=[build_parser(add_help=False)],
+                                        help='Hold the problem queue of a run and write its results')
+    coordinator.add_argument('--listen',
+                             type=str,
+                             default=f"127.0.0.1:{DEFAULT_PORT}",
+                             help=f'Address to accept workers on (default: 127.0.0.1:{DEFAULT_PORT}). The protocol '
+                                  f'has no authentication; only listen on networks whose machines you trust')
+    coordinator.add_argument('--lease_timeout',
+                             type=float,
+                             default=60.0,
+                             help='Seconds without a heartbeat after which a task is re-queued (default: 60)')
+    coordinator.add_argument('--max_attempts',
+                             type=int,
+                             default=3,
+                             help='Lost leases after which a task is recorded as an error (default: 3)')
+
+    worker = subparsers.add_parser('worker', help='Run tasks of a coordinator')
+    worker.add_argument('--connect',
+                        type=str,
+                        default=f"127.0.0.1:{DEFAULT_PORT}",
+                        help=f'Coordinator address (default: 127.0.0.1:{DEFAULT_PORT})')
+    worker.add_argument('--slots',
+                        type=int,
+                        default=1,
+                        help='Tasks run at once by this worker (default: 1)')
+    worker.add_argument('--name',
+                        type=str,
+                        default=None,
+                        help='Worker name shown by the coordinator (default: host and process id)')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    console = Console()
+    if args.role == "coordinator":
+        role_options = ("role", "listen", "lease_timeout", "max_attempts")
+        run_args = argparse.Namespace(**{name: value for name, value in vars(args).items() if name not in role_options})
+        configure_run(run_args)
+        console.print(Panel.fit(f"Distributed run: {' '.join(run_args.dataset_name)} |LLM Model: {run_args.llm_model}"),
+                      style="bold blue")
+        coordinator = Coordinator(run_args, build_jobs(run_args, console), lease_timeout=args.lease_timeout,
+                                  max_attempts=args.max_attempts, console=console)
+        coordinator.serve(*parse_address(args.listen))
+    else:
+        name = args.name or f"{socket.gethostname()}-{os.getpid()}"
+        workers = [Worker(parse_address(args.connect), f"{name}/{slot}" if args.slots > 1 else name, name, console)
+                   for slot in range(max(1, args.slots))]
+        threads = [threading.Thread(target=worker.run) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
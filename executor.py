@@ -0,0 +1,880 @@
+import ast
+import atexit
+import base64
+import hashlib
+import os
+import pickle
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from multiprocessing.connection import Connection
+from typing import Any, Optional
+
+from cache import ResponseCache, make_cache_key
+from utils import load_config_section
+
+
+DEFAULT_EXECUTION_CONFIG = {
+    "timeout": 300,
+    "memory_limit_mb": 8192,
+    "pool_size": 4,
+    "max_tasks_per_worker": 100,
+    "max_memory_growth_mb": 1024,
+    "cores": None,
+    "threads_by_size": {"Toy": 1, "Small": 1, "Medium": 2, "Large": 4},
+}
+
+
+DEFAULT_EXECUTION_CACHE_CONFIG = {
+    "mode": "on",
+    "backend": "sqlite",
+    "path": "cache/execution_cache.sqlite",
+    "max_size_mb": 256,
+    "ttl_days": 30,
+}
+
+
+execution_config = load_config_section("execution", DEFAULT_EXECUTION_CONFIG)
+
+# Seconds between checks of a cancel event while waiting for a child
+CANCEL_POLL_INTERVAL = 0.1
+
+
+class ExecutionResult:
+    """
+    Outcome of running one piece of generated code in a child process.
+
+    error_kind is None on success, otherwise one of "timeout", "memory",
+    "exception", "no_function", "crash" (the process died without
+    reporting, e.g. killed by a signal) or "cancelled" (stopped through the
+    caller's cancel event). `message` is str() of the exception raised by
+    the generated code and `exception_type` its class name; `unpicklable`
+    marks a value that could not be sent back from the child and was
+    replaced by its float() or str().
+    """
+
+    def __init__(self,
+                 value: Any = None,
+                 error_kind: Optional[str] = None,
+                 error: Optional[str] = None,
+                 traceback: Optional[str] = None,
+                 runtime: float = 0.0,
+                 peak_rss_mb: Optional[float] = None,
+                 cached: bool = False,
+                 message: Optional[str] = None,
+                 exception_type: Optional[str] = None,
+                 unpicklable: bool = False):
+        self.value = value
+        self.error_kind = error_kind
+        self.error = error
+        self.traceback = traceback
+        self.runtime = runtime
+        self.peak_rss_mb = peak_rss_mb
+        self.cached = cached
+        self.message = message
+        self.exception_type = exception_type
+        self.unpicklable = unpicklable
+
+    @property
+    def ok(self) -> bool:
+        return self.error_kind is None
+
+    @property
+    def output(self) -> Any:
+        """
+        The value `execute_str_function` has always returned: the function's
+        return value, or an error string (with the user-code traceback for
+        exceptions) that is fed back to the LLM when debugging.
+        """
+        if self.ok:
+            return self.value
+        if self.error_kind == "exception" and self.traceback:
+            return self.traceback
+        return f"Error: {self.error}"
+
+    def summary(self) -> dict:
+        """JSON-friendly execution metadata, without the value itself."""
+        return {
+            "error_kind": self.error_kind,
+            "error": self.error,
+            "runtime": round(self.runtime, 3),
+            "peak_rss_mb": self.peak_rss_mb,
+            "cached": self.cached,
+        }
+
+    def __repr__(self) -> str:
+        return (f"ExecutionResult(value={self.value!r}, error_kind={self.error_kind!r}, "
+                f"runtime={self.runtime:.3f}, peak_rss_mb={self.peak_rss_mb})")
+
+
+def _read_status_mb(pid, field: str = "VmHWM") -> Optional[float]:
+    """A memory field (VmHWM = peak RSS, VmRSS = current RSS) from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _kill(process: subprocess.Popen):
+    try:
+        # The child leads its own session, so helper processes die with it
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        process.kill()
+    process.wait()
+
+
+def _wait_interval(deadline: Optional[float], cancel: Optional[threading.Event]) -> Optional[float]:
+    """How long to block before checking `cancel` and the deadline again (None: until done)."""
+    remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+    if cancel is None:
+        return remaining
+    return CANCEL_POLL_INTERVAL if remaining is None else min(remaining, CANCEL_POLL_INTERVAL)
+
+
+def _cancelled_result(runtime: float) -> ExecutionResult:
+    return ExecutionResult(error_kind="cancelled", error="Execution was cancelled", runtime=runtime)
+
+
+def _timeout_result(timeout: float, runtime: float, peak_rss_mb: Optional[float]) -> ExecutionResult:
+    return ExecutionResult(error_kind="timeout",
+                           error=f"Execution timed out after {timeout:g} seconds. "
+                                 f"The model may be too hard to solve or the code may not terminate.",
+                           runtime=runtime,
+                           peak_rss_mb=peak_rss_mb)
+
+
+def _crash_result(returncode: Optional[int], stderr: str, runtime: float) -> ExecutionResult:
+    if returncode is not None and returncode < 0:
+        error = f"Execution process was killed by signal {-returncode}"
+    else:
+        error = f"Execution process exited with code {returncode}"
+    stderr_tail = stderr.strip()[-2000:]
+    if stderr_tail:
+        error += f"\n{stderr_tail}"
+    return ExecutionResult(error_kind="crash", error=error, runtime=runtime)
+
+
+def _report_result(report: dict, runtime: float) -> ExecutionResult:
+    return ExecutionResult(value=report["value"],
+                           error_kind=report["error_kind"],
+                           error=report["error"],
+                           traceback=report["traceback"],
+                           runtime=runtime,
+                           peak_rss_mb=report["peak_rss_mb"],
+                           message=report.get("message"),
+                           exception_type=report.get("exception_type"),
+                           unpicklable=report.get("unpicklable", False))
+
+
+class ExecutionWorker:
+    """
+    A long-lived `python executor.py --worker` process that has imported
+    gurobipy and checked out its default (licensed) environment once, and
+    then runs generated files sent to it over a socket, one at a time.
+    """
+
+    def __init__(self, memory_limit_mb: Optional[float] = None):
+        parent_sock, child_sock = socket.socketpair()
+        # A file rather than a pipe: nobody reads stderr until the worker dies,
+        # and a full pipe would block a chatty worker
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker",
+             str(child_sock.fileno()), str(memory_limit_mb or 0)],
+            pass_fds=(child_sock.fileno(),),
+            stdout=subprocess.DEVNULL,
+            stderr=self.stderr,
+            start_new_session=True)
+        child_sock.close()
+        self.conn = Connection(parent_sock.detach())
+        self.tasks = 0
+        self.baseline_rss_mb: Optional[float] = None
+        self.rss_mb: Optional[float] = None
+
+    def wait_ready(self, timeout: float = 120.0):
+        """Block until the worker has finished warming up."""
+        if self.baseline_rss_mb is not None:
+            return
+        if not self.conn.poll(timeout):
+            raise RuntimeError(f"Execution worker did not start within {timeout:g} seconds")
+        _, self.baseline_rss_mb = self.conn.recv()
+        self.rss_mb = self.baseline_rss_mb
+
+    def run(self, file_path: str, timeout: Optional[float], function_order: str, threads: int = 0,
+            cancel: Optional[threading.Event] = None) -> ExecutionResult:
+        """Run one file; the worker is killed on timeout or when `cancel` is set."""
+        start = time.perf_counter()
+        deadline = start + timeout if timeout else None
+        try:
+            self.conn.send((os.path.abspath(file_path), function_order, threads))
+            while not self.conn.poll(_wait_interval(deadline, cancel)):
+                if cancel is not None and cancel.is_set():
+                    self.close()
+                    return _cancelled_result(time.perf_counter() - start)
+                if deadline is not None and time.perf_counter() >= deadline:
+                    peak_rss_mb = _read_status_mb(self.process.pid)
+                    self.close()
+                    return _timeout_result(timeout, time.perf_counter() - start, peak_rss_mb)  # type: ignore
+            report = self.conn.recv()
+        except (EOFError, OSError):
+            self.process.wait()
+            self.stderr.seek(0)
+            stderr = self.stderr.read().decode("utf-8", errors="replace")
+            self.close()
+            return _crash_result(self.process.returncode, stderr, time.perf_counter() - start)
+        self.tasks += 1
+        self.rss_mb = report["rss_mb"]
+        return _report_result(report, time.perf_counter() - start)
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def close(self):
+        if self.alive:
+            _kill(self.process)
+        self.conn.close()
+        self.stderr.close()
+
+
+class ExecutionPool:
+    """
+    Fixed-size pool of pre-warmed execution workers.
+
+    A worker is replaced after `max_tasks_per_worker` tasks, when its RSS has
+    grown by more than `max_memory_growth_mb` since warm-up (leaked Gurobi
+    models), and after a timeout, crash or out-of-memory error.
+    """
+
+    def __init__(self,
+                 size: int = 4,
+                 memory_limit_mb: Optional[float] = None,
+                 max_tasks_per_worker: Optional[int] = None,
+                 max_memory_growth_mb: Optional[float] = None):
+        self.size = max(1, size)
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_memory_growth_mb = max_memory_growth_mb
+        self.idle: "queue.Queue[ExecutionWorker]" = queue.Queue()
+        self.lock = threading.Lock()
+        self.workers = 0
+        self.closed = False
+        self.stats = {"tasks": 0, "spawned": 0}
+        self.recycled = Counter()
+
+    @classmethod
+    def from_config(cls, execution_config: dict) -> "ExecutionPool":
+        return cls(size=execution_config["pool_size"],
+                   memory_limit_mb=execution_config["memory_limit_mb"],
+                   max_tasks_per_worker=execution_config.get("max_tasks_per_worker"),
+                   max_memory_growth_mb=execution_config.get("max_memory_growth_mb"))
+
+    def _spawn(self) -> ExecutionWorker:
+        with self.lock:
+            self.stats["spawned"] += 1
+        return ExecutionWorker(self.memory_limit_mb)
+
+    def acquire(self, cancel: Optional[threading.Event] = None) -> Optional[ExecutionWorker]:
+        """An idle (or new) worker; None if `cancel` is set while waiting for one."""
+        with self.lock:
+            spawn = self.idle.empty() and self.workers < self.size
+            if spawn:
+                self.workers += 1
+        if spawn:
+            return self._spawn()
+        while True:
+            try:
+                return self.idle.get(timeout=_wait_interval(None, cancel))
+            except queue.Empty:
+                if cancel is not None and cancel.is_set():
+                    return None
+
+    def release(self, worker: ExecutionWorker, result: ExecutionResult):
+        reason = None
+        if not worker.alive:
+            reason = result.error_kind or "crash"
+        elif result.error_kind == "memory":
+            reason = "memory"
+        elif self.max_tasks_per_worker and worker.tasks >= self.max_tasks_per_worker:
+            reason = "max_tasks"
+        elif (self.max_memory_growth_mb and worker.rss_mb is not None and worker.baseline_rss_mb is not None
+              and worker.rss_mb - worker.baseline_rss_mb > self.max_memory_growth_mb):
+            reason = "memory_growth"
+        if reason is not None:
+            worker.close()
+            with self.lock:
+                self.recycled[reason] += 1
+            # The replacement warms up in the background until its first task
+            worker = self._spawn()
+        if self.closed:
+            worker.close()
+        else:
+            self.idle.put(worker)
+
+    def execute(self, file_path: str, timeout: Optional[float], function_order: str = "name", threads: int = 0,
+                cancel: Optional[threading.Event] = None) -> ExecutionResult:
+        worker = self.acquire(cancel)
+        if worker is None:
+            return _cancelled_result(0.0)
+        try:
+            worker.wait_ready()
+            if cancel is not None and cancel.is_set():
+                # Cancelled during warm-up: the worker is still clean and goes back to the pool
+                result = _cancelled_result(0.0)
+                self.release(worker, result)
+                return result
+            result = worker.run(file_path, timeout, function_order, threads, cancel)
+        except Exception as e:
+            worker.close()
+            result = ExecutionResult(error_kind="crash", error=str(e))
+        with self.lock:
+            self.stats["tasks"] += 1
+        self.release(worker, result)
+        return result
+
+    def grow(self, size: int):
+        """Allow at least `size` workers, e.g. to match a caller's thread count."""
+        with self.lock:
+            self.size = max(self.size, size)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+            stats["recycled"] = dict(self.recycled)
+        return stats
+
+    def close(self):
+        self.closed = True
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class CoreBudget:
+    """
+    Shares a fixed number of cores between concurrent Gurobi solves.
+
+    Each execution is given a Gurobi `Threads` value from its problem's size
+    (see `threads_for`) and waits until that many cores are free, so the
+    threads of all running solves never exceed `cores`. Small models gain
+    nothing from parallel solving, so giving them one thread each and more
+    only to large models gives the best total throughput.
+
+    `Threads` is set on the default environment only. Code that creates its
+    own `gp.Env()` (or passes `env=`) does not see it and may use every
+    core, so such code is given all cores instead. Cores are granted in
+    arrival order, so a solve waiting for all of them is not starved by
+    smaller solves that keep taking cores as they are released.
+    """
+
+    def __init__(self, cores: Optional[int] = None, threads_by_size: Optional[dict] = None):
+        self.cores = max(1, cores or os.cpu_count() or 1)
+        self.threads_by_size = threads_by_size or DEFAULT_EXECUTION_CONFIG["threads_by_size"]
+        self.free = self.cores
+        self.condition = threading.Condition()
+        self.waiting = deque()
+        self.stats = {"waits": 0, "wait_time": 0.0, "explicit_env": 0}
+        self.allocations = Counter()
+
+    @classmethod
+    def from_config(cls, execution_config: dict) -> "CoreBudget":
+        return cls(cores=execution_config.get("cores"),
+                   threads_by_size=execution_config.get("threads_by_size"))
+
+    def threads_for(self, problem: Optional[dict], code_str: Optional[str] = None) -> int:
+        """
+        Threads for one problem from the dataset summary: the `problem_size`
+        class sets the base value, and very large models (by `details`
+        nonzeros_num, variables_num and constraints_num) get more. Code with
+        an explicit Gurobi environment gets all cores.
+        """
+        if code_str is not None and uses_explicit_env(code_str):
+            with self.condition:
+                self.stats["explicit_env"] += 1
+            return self.cores
+        if not problem:
+            return 1
+        threads = self.threads_by_size.get(problem.get("problem_size"), 1)
+        details = problem.get("details") or {}
+        nonzeros = details.get("nonzeros_num") or 0
+        size = max(details.get("variables_num") or 0, details.get("constraints_num") or 0)
+        if nonzeros >= 100000 or size >= 50000:
+            threads = max(threads, 8)
+        elif nonzeros >= 10000 or size >= 5000:
+            threads = max(threads, 4)
+        return max(1, min(threads, self.cores))
+
+    def acquire(self, threads: int, cancel: Optional[threading.Event] = None) -> int:
+        """Reserve cores for one solve; returns the threads granted, or 0 if `cancel` is set while waiting."""
+        threads = max(1, min(threads, self.cores))
+        start = time.perf_counter()
+        ticket = object()
+        with self.condition:
+            waited = bool(self.waiting) or self.free < threads
+            self.waiting.append(ticket)
+            try:
+                while self.waiting[0] is not ticket or self.free < threads:
+                    if cancel is not None and cancel.is_set():
+                        return 0
+                    self.condition.wait(_wait_interval(None, cancel))
+            finally:
+                self.waiting.remove(ticket)
+                self.condition.notify_all()
+            self.free -= threads
+            self.allocations[threads] += 1
+            if waited:
+                self.stats["waits"] += 1
+                self.stats["wait_time"] += time.perf_counter() - start
+        return threads
+
+    def release(self, threads: int):
+        with self.condition:
+            self.free += threads
+            self.condition.notify_all()
+
+    def get_stats(self) -> dict:
+        with self.condition:
+            stats = dict(self.stats)
+            stats["cores"] = self.cores
+            stats["threads"] = dict(self.allocations)
+        return stats
+
+
+def uses_explicit_env(code_str: str) -> bool:
+    """Whether the code creates its own Gurobi environment (`Env(...)`, or `Model`/`read` with `env=`)."""
+    try:
+        tree = ast.parse(code_str)
+    except SyntaxError:
+        return False
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+        if name == "Env" or (name in ("Model", "read") and any(keyword.arg == "env" for keyword in node.keywords)):
+            return True
+    return False
+
+
+core_budget = CoreBudget.from_config(execution_config)
+
+_pool: Optional[ExecutionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_execution_pool() -> Optional[ExecutionPool]:
+    """The shared worker pool, started on first use; None when "pool_size" is 0."""
+    global _pool
+    if not execution_config["pool_size"]:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExecutionPool.from_config(execution_config)
+            atexit.register(_pool.close)
+        return _pool
+
+
+def get_execution_stats() -> dict:
+    stats = _pool.get_stats() if _pool is not None else {}
+    stats["core_budget"] = core_budget.get_stats()
+    if _execution_cache is not None:
+        stats["cache"] = _execution_cache.get_stats()
+    return stats
+
+
+_execution_cache = None
+_execution_cache_mode: Optional[str] = None
+_cache_lock = threading.Lock()
+
+# Only outcomes that depend on the code alone are cached; timeouts, crashes
+# and out-of-memory errors depend on the machine and its load
+CACHEABLE_ERROR_KINDS = (None, "exception", "no_function")
+# Exceptions that may come from the environment rather than the code (license
+# checkout, size-limited license, token server outage) are not cached either
+UNCACHEABLE_EXCEPTION_TYPES = ("GurobiError",)
+
+
+def is_cacheable(result: ExecutionResult) -> bool:
+    return result.error_kind in CACHEABLE_ERROR_KINDS and result.exception_type not in UNCACHEABLE_EXCEPTION_TYPES
+
+
+def get_execution_cache():
+    """The execution result cache (config.json "execution_cache"), opened on first use."""
+    global _execution_cache
+    with _cache_lock:
+        if _execution_cache is None:
+            cache_config = load_config_section("execution_cache", DEFAULT_EXECUTION_CACHE_CONFIG)
+            _execution_cache = ResponseCache.from_config(cache_config, mode=_execution_cache_mode)
+        return _execution_cache
+
+
+def configure_execution_cache(mode: str):
+    """Override the cache mode ("on", "off" or "refresh") before the first execution."""
+    global _execution_cache, _execution_cache_mode
+    with _cache_lock:
+        _execution_cache_mode = mode
+        _execution_cache = None
+
+
+def _strip_docstrings(tree: ast.AST) -> ast.AST:
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                    and isinstance(body[0].value.value, str):
+                node.body = body[1:] or [ast.Pass()]
+    return tree
+
+
+def code_fingerprint(code_str: str) -> str:
+    """
+    Hash of the code's AST with docstrings removed, so comments, whitespace
+    and docstrings do not change it. Code that does not parse is hashed as is.
+    """
+    try:
+        normalized = ast.dump(_strip_docstrings(ast.parse(code_str)), include_attributes=False)
+    except (SyntaxError, ValueError):
+        normalized = code_str
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _gurobipy_version() -> str:
+    from importlib import metadata
+
+    try:
+        return metadata.version("gurobipy")
+    except metadata.PackageNotFoundError:
+        return "none"
+
+
+_solver_version = None
+
+
+def execution_cache_key(code_str: str, function_order: str, threads: int) -> str:
+    """Entries are invalidated by a new gurobipy version or different solver parameters."""
+    global _solver_version
+    if _solver_version is None:
+        _solver_version = _gurobipy_version()
+    return make_cache_key("execution", code_fingerprint(code_str), function_order,
+                          {"gurobipy": _solver_version, "params": {"Threads": threads}})
+
+
+def _source_hash(code_str: str) -> str:
+    return hashlib.sha256(code_str.encode("utf-8")).hexdigest()
+
+
+def _cache_entry(result: ExecutionResult, code_str: str) -> dict:
+    return {
+        "value": base64.b64encode(pickle.dumps(result.value)).decode("ascii"),
+        "error_kind": result.error_kind,
+        "error": result.error,
+        "traceback": result.traceback,
+        "runtime": result.runtime,
+        "peak_rss_mb": result.peak_rss_mb,
+        "message": result.message,
+        "exception_type": result.exception_type,
+        "unpicklable": result.unpicklable,
+        "source_hash": _source_hash(code_str),
+    }
+
+
+def _cached_result(entry: dict, code_str: str) -> Optional[ExecutionResult]:
+    # Tracebacks quote line numbers and source lines, so they are only reused
+    # for the exact same source text
+    if entry["error_kind"] == "exception" and entry["source_hash"] != _source_hash(code_str):
+        return None
+    # Entries stored before solver errors were excluded
+    if "GurobiError" in (entry["traceback"] or ""):
+        return None
+    return ExecutionResult(value=pickle.loads(base64.b64decode(entry["value"])),
+                           error_kind=entry["error_kind"],
+                           error=entry["error"],
+                           traceback=entry["traceback"],
+                           runtime=entry["runtime"],
+                           peak_rss_mb=entry["peak_rss_mb"],
+                           cached=True,
+                           message=entry.get("message"),
+                           exception_type=entry.get("exception_type"),
+                           unpicklable=entry.get("unpicklable", False))
+
+
+def _execute_once(file_path: str, timeout: Optional[float], memory_limit_mb: Optional[float], function_order: str,
+                  threads: int = 0, cancel: Optional[threading.Event] = None) -> ExecutionResult:
+    """Run one file in a fresh, throwaway Python process."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        result_file = os.path.join(tmpdir, "result.pkl")
+        command = [sys.executable, os.path.abspath(__file__),
+                   os.path.abspath(file_path), result_file, str(memory_limit_mb or 0), function_order, str(threads)]
+        start = time.perf_counter()
+        process = subprocess.Popen(command,
+                                   stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE,
+                                   start_new_session=True)
+        deadline = start + timeout if timeout else None
+        while True:
+            try:
+                _, stderr = process.communicate(timeout=_wait_interval(deadline, cancel))
+                break
+            except subprocess.TimeoutExpired:
+                if cancel is not None and cancel.is_set():
+                    _kill(process)
+                    return _cancelled_result(time.perf_counter() - start)
+                if deadline is not None and time.perf_counter() >= deadline:
+                    peak_rss_mb = _read_status_mb(process.pid)
+                    _kill(process)
+                    return _timeout_result(timeout, time.perf_counter() - start, peak_rss_mb)  # type: ignore
+        runtime = time.perf_counter() - start
+
+        try:
+            with open(result_file, "rb") as f:
+                report = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return _crash_result(process.returncode, stderr.decode("utf-8", errors="replace"), runtime)
+
+    return _report_result(report, runtime)
+
+
+def execute_file(file_path: str,
+                 timeout: Optional[float] = None,
+                 memory_limit_mb: Optional[float] = None,
+                 function_order: str = "name",
+                 problem: Optional[dict] = None,
+                 cancel: Optional[threading.Event] = None) -> ExecutionResult:
+    """
+    Run the first plain function defined in `file_path` outside this process
+    and return its result. Calls go to the shared worker pool; a memory limit
+    different from the pool's runs in a one-off process instead. The solve
+    gets a Gurobi `Threads` share of the core budget based on `problem`
+    (all cores if the code creates its own Gurobi environment).
+    Results are cached by `code_fingerprint`, so re-running the same program
+    (even reformatted) returns the stored result.
+
+    Args:
+        file_path (str): Python file containing the generated code
+        timeout (float): Wall-clock limit in seconds (default: config.json "execution")
+        memory_limit_mb (float): Address-space limit of the child (default: config.json "execution")
+        function_order (str): "name" picks the alphabetically first function
+            (as `execute_str_function` did), "definition" the first one defined
+            (as `execute_matching_files` did)
+        problem (dict): Dataset entry of the problem, used for its
+            `problem_size` and `details` (default: one thread)
+        cancel (threading.Event): When set, a waiting call gives up and a
+            running one is killed (its pool worker is replaced and its
+            cores are released); the result's error_kind is "cancelled"
+
+    Returns:
+        ExecutionResult: value or error kind, traceback, runtime and peak RSS
+    """
+    timeout = execution_config["timeout"] if timeout is None else timeout
+    memory_limit_mb = execution_config["memory_limit_mb"] if memory_limit_mb is None else memory_limit_mb
+
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        code_str = f.read()
+    threads = core_budget.threads_for(problem, code_str)
+    cache = get_execution_cache()
+    if cache.enabled:
+        cache_key = execution_cache_key(code_str, function_order, threads)
+        entry = cache.get(cache_key)
+        if entry is not None:
+            result = _cached_result(entry, code_str)
+            if result is not None:
+                return result
+
+    if cancel is not None and cancel.is_set():
+        return _cancelled_result(0.0)
+    threads = core_budget.acquire(threads, cancel)
+    if not threads:
+        return _cancelled_result(0.0)
+    try:
+        pool = get_execution_pool()
+        if pool is not None and memory_limit_mb == pool.memory_limit_mb:
+            result = pool.execute(file_path, timeout, function_order, threads, cancel)
+        else:
+            result = _execute_once(file_path, timeout, memory_limit_mb, function_order, threads, cancel)
+    finally:
+        core_budget.release(threads)
+
+    if cache.enabled and is_cacheable(result):
+        cache.put(cache_key, _cache_entry(result, code_str))
+    return result
+
+
+def execute_code(code_str: str,
+                 timeout: Optional[float] = None,
+                 memory_limit_mb: Optional[float] = None,
+                 problem: Optional[dict] = None,
+                 cancel: Optional[threading.Event] = None) -> ExecutionResult:
+    """Write `code_str` to a temporary module and run it with `execute_file`."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        module_path = os.path.join(tmpdir, "temp_module.py")
+        with open(module_path, "w", encoding="utf-8") as f:
+            f.write(code_str)
+        return execute_file(module_path, timeout=timeout, memory_limit_mb=memory_limit_mb, problem=problem,
+                            cancel=cancel)
+
+
+# Child process side: `python executor.py <file> <result file> <memory limit> <order>`
+# for one-off runs, `python executor.py --worker <fd> <memory limit>` for pool workers.
+
+def _is_memory_error(exception: BaseException) -> bool:
+    if isinstance(exception, MemoryError):
+        return True
+    # gurobipy.GurobiError with GRB.Error.OUT_OF_MEMORY
+    return type(exception).__name__ == "GurobiError" and getattr(exception, "errno", None) == 10001
+
+
+def _set_memory_limit(memory_limit_mb: float):
+    import resource
+
+    if memory_limit_mb:
+        limit = int(memory_limit_mb * 1024 * 1024)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _set_threads(threads: int):
+    """
+    Set Gurobi's Threads on the default environment, which models created by
+    the generated code copy. Environments the code creates itself do not
+    inherit it (see `CoreBudget`).
+    """
+    if not threads:
+        return
+    try:
+        import gurobipy as gp
+        gp.setParam("Threads", threads)
+    except Exception:
+        pass
+
+
+def _run_child(module_path: str, memory_limit_mb: float, function_order: str) -> dict:
+    """Load the module and call its function."""
+    import importlib.util
+    import linecache
+    import types
+
+    from utils import format_user_traceback
+
+    # Workers may see a changed file under a path they have executed before
+    linecache.checkcache()
+    report = {"value": None, "error_kind": None, "error": None, "traceback": None, "message": None,
+              "exception_type": None}
+    try:
+        spec = importlib.util.spec_from_file_location("temp_module", module_path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Could not load module from {module_path}")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        names = sorted(vars(module)) if function_order == "name" else list(vars(module))
+        found_func = None
+        for name in names:
+            item = vars(module)[name]
+            if not name.startswith("__") and isinstance(item, types.FunctionType):
+                found_func = item
+                break
+
+        if found_func is None:
+            report["error_kind"] = "no_function"
+            report["error"] = "No callable function found in the code."
+        else:
+            report["value"] = found_func()
+    except BaseException as e:
+        report["message"] = str(e)
+        report["exception_type"] = type(e).__name__
+        if _is_memory_error(e):
+            report["error_kind"] = "memory"
+            report["error"] = f"Out of memory (limit {memory_limit_mb:g} MB): {type(e).__name__} {e}".rstrip()
+        else:
+            report["error_kind"] = "exception"
+            report["error"] = str(e)
+        report["traceback"] = format_user_traceback(e, module_path)
+    return report
+
+
+def _picklable(report: dict) -> dict:
+    try:
+        pickle.dumps(report["value"])
+    except Exception:
+        # Return values such as Gurobi objects cannot cross the process boundary,
+        # so they are sent back as a number when they convert to one
+        value = report["value"]
+        try:
+            report["value"] = float(value)
+        except Exception:
+            try:
+                report["value"] = str(value)
+            except Exception:
+                report["value"] = repr(value)
+        report["unpicklable"] = True
+    return report
+
+
+def _one_shot_main(module_path: str, result_file: str, memory_limit_mb: float, function_order: str, threads: int):
+    import resource
+
+    _set_memory_limit(memory_limit_mb)
+    _set_threads(threads)
+    report = _run_child(module_path, memory_limit_mb, function_order)
+    report["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with open(result_file, "wb") as f:
+        f.write(pickle.dumps(_picklable(report)))
+
+
+def _worker_main(fd: int, memory_limit_mb: float):
+    import gc
+
+    _set_memory_limit(memory_limit_mb)
+    conn = Connection(fd)
+    try:
+        import gurobipy as gp
+        # Creating a model starts the default environment and checks out the
+        # license, so generated code calling gp.Model() reuses it
+        gp.Model().dispose()
+    except Exception:
+        gp = None
+    conn.send(("ready", _read_status_mb("self", "VmRSS")))
+
+    while True:
+        try:
+            module_path, function_order, threads = conn.recv()
+        except (EOFError, OSError):
+            break
+        try:
+            # Reset the peak RSS so VmHWM covers this task only
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+        except OSError:
+            pass
+        if gp is not None:
+            _set_threads(threads)
+        report = _run_child(module_path, memory_limit_mb, function_order)
+        if gp is not None:
+            try:
+                # Parameters set on the default environment must not leak into the next task
+                gp.resetParams()
+            except Exception:
+                pass
+        gc.collect()
+        report["peak_rss_mb"] = _read_status_mb("self", "VmHWM")
+        report["rss_mb"] = _read_status_mb("self", "VmRSS")
+        conn.send(_picklable(report))
+
+
+if __name__ == "__main__":
+    if sys.argv[1] == "--worker":
+        _worker_main(int(sys.argv[2]), float(sys.argv[3]))
+    else:
+        _one_shot_main(sys.argv[1], sys.argv[2], float(sys.argv[3]), sys.argv[4], int(sys.argv[5]))
@@ -0,0 +1,280 @@
+import builtins
+import difflib
+import io
+import keyword
+import re
+import threading
+import tokenize
+from typing import List, Optional, Tuple
+
+from autofix import KNOWN_IMPORTS, ParsedError
+from cache import ResponseCache, make_cache_key
+from utils import code_diff, load_config_section
+
+
+DEFAULT_FIX_INDEX_CONFIG = {
+    "mode": "off",
+    "backend": "sqlite",
+    "path": "cache/fix_index.sqlite",
+    "max_size_mb": 64,
+    "ttl_days": None,
+}
+
+# Fixes kept per signature, most used first
+MAX_FIXES_PER_SIGNATURE = 5
+# Diff lines kept for a hint
+MAX_HINT_LINES = 20
+
+# Names that keep their meaning across programs and so stay in signatures
+KEPT_NAMES = set(keyword.kwlist) | set(dir(builtins)) | set(KNOWN_IMPORTS)
+
+
+def _line_tokens(line: str) -> Optional[List[Tuple[bool, str, int, int]]]:
+    """
+    Tokens of one stripped source line as (abstracted, text, start column,
+    end column). Local names, numbers and strings are abstracted; keywords,
+    builtins, gurobipy names, attribute names and keyword-argument names
+    are kept.
+    """
+    try:
+        raw = [token for token in tokenize.generate_tokens(io.StringIO(line.strip() + "\n").readline)
+               if token.type not in (tokenize.NEWLINE, tokenize.NL, tokenize.ENDMARKER, tokenize.COMMENT,
+                                     tokenize.INDENT, tokenize.DEDENT)]
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return None
+    tokens = []
+    for index, token in enumerate(raw):
+        previous = raw[index - 1].string if index > 0 else None
+        following = raw[index + 1].string if index + 1 < len(raw) else None
+        if token.type == tokenize.NAME:
+            abstracted = not (token.string in KEPT_NAMES or previous == "."
+                              or (following == "=" and previous in ("(", ",")))
+        else:
+            abstracted = token.type in (tokenize.NUMBER, tokenize.STRING)
+        tokens.append((abstracted, token.string, token.start[1], token.end[1]))
+    return tokens
+
+
+def line_template(line: str) -> Optional[Tuple[Tuple[str, ...], List[str]]]:
+    """
+    Abstract a source line into a template and its bindings: abstracted
+    tokens become placeholders numbered by first appearance, so
+    `x[i][j] <= cap[i]` and `y[k][l] <= limit[k]` share one template.
+    """
+    tokens = _line_tokens(line)
+    if tokens is None:
+        return None
+    bindings, template = [], []
+    for abstracted, text, _, _ in tokens:
+        if abstracted:
+            # Repeated names share a placeholder; literals never do
+            if text not in bindings or not text.isidentifier():
+                bindings.append(text)
+            template.append(f"\x00{bindings.index(text) if text.isidentifier() else len(bindings) - 1}")
+        else:
+            template.append(text)
+    return tuple(template), bindings
+
+
+def _error_line(code_text: str, error: ParsedError) -> Optional[str]:
+    lines = code_text.splitlines()
+    if error.lineno is None or not 0 < error.lineno <= len(lines):
+        return None
+    return lines[error.lineno - 1]
+
+
+def _normalize_message(message: str) -> str:
+    """Abstract quoted names (other than well-known ones) and numbers in an exception message."""
+    message = re.sub(r"'([^']*)'", lambda match: match.group(0) if match.group(1) in KEPT_NAMES else "'_'", message)
+    return re.sub(r"\b\d+(\.\d+)?\b", "_", message)
+
+
+def error_signature(error_message: str, code_text: str) -> Optional[str]:
+    """
+    Signature of an execution error: exception type, message and failing
+    line with identifiers, numbers and strings abstracted away. Errors
+    other than exceptions in the user code (timeouts, crashes) have none.
+    """
+    error = ParsedError.parse(error_message)
+    if error is None:
+        return None
+    signature = f"{error.exc_type}: {_normalize_message(error.message)}"
+    line = _error_line(code_text, error)
+    template = line_template(line) if line is not None else None
+    if template is not None:
+        signature += " | " + " ".join("_" if token.startswith("\x00") else token for token in template[0])
+    return signature
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _line_patch(code_before: str, code_after: str, error: ParsedError) -> Optional[dict]:
+    """
+    The fix as a rewrite of the failing line alone, or None when other lines
+    changed too. Names bound by the failing line are stored as placeholders
+    so the rewrite can be replayed on a program that uses other names.
+    """
+    before_lines, after_lines = code_before.splitlines(), code_after.splitlines()
+    opcodes = [opcode for opcode in difflib.SequenceMatcher(None, before_lines, after_lines, autojunk=False).get_opcodes()
+               if opcode[0] != "equal"]
+    if len(opcodes) != 1 or error.lineno is None:
+        return None
+    tag, i1, i2, j1, j2 = opcodes[0]
+    if tag != "replace" or (i1, i2) != (error.lineno - 1, error.lineno):
+        return None
+    template = line_template(before_lines[i1])
+    if template is None:
+        return None
+    pattern, bindings = template
+    indent = _indent(before_lines[i1])
+    replacement = []
+    for line in after_lines[j1:j2]:
+        extra_indent = _indent(line)[len(indent):] if line.startswith(indent) else ""
+        line = line.strip()
+        tokens = _line_tokens(line)
+        if tokens is None:
+            return None
+        # Keep the new line's text and only swap what the failing line bound for placeholders;
+        # the n-th copy of a literal maps to its n-th occurrence in the failing line
+        positions, seen = [], {}
+        for abstracted, text, start, end in tokens:
+            if abstracted and text in bindings:
+                occurrences = [index for index, bound in enumerate(bindings) if bound == text]
+                positions.append((start, end, occurrences[min(seen.get(text, 0), len(occurrences) - 1)]))
+                seen[text] = seen.get(text, 0) + 1
+        for start, end, index in reversed(positions):
+            line = f"{line[:start]}\x00{index}\x01{line[end:]}"
+        replacement.append(extra_indent + line)
+    return {"pattern": list(pattern), "replacement": replacement}
+
+
+def _unified_diff(code_before: str, code_after: str) -> str:
+    diff = code_diff(code_before, code_after).splitlines()
+    if len(diff) > MAX_HINT_LINES:
+        diff = diff[:MAX_HINT_LINES] + ["..."]
+    return "\n".join(diff)
+
+
+class FixIndex:
+    """
+    Local index from error signatures to the code changes that fixed them in
+    earlier debug rounds, kept in a ResponseCache so it lasts across runs
+    and datasets.
+
+    A fix is stored as a diff (sent to the LLM as a short hint) and, when
+    only the failing line changed, as a line rewrite that can be replayed
+    directly on another program with the same kind of error.
+    """
+
+    def __init__(self, cache: ResponseCache):
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "known": 0, "recorded": 0, "patched": 0, "hinted": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache.enabled
+
+    def lookup(self, signature: Optional[str]) -> List[dict]:
+        if signature is None or not self.enabled:
+            return []
+        entry = self.cache.get(make_cache_key("fix_index", signature))
+        fixes = entry["fixes"] if entry is not None else []
+        with self.lock:
+            self.stats["lookups"] += 1
+            self.stats["known"] += bool(fixes)
+        return fixes
+
+    def _stored_entry(self, key: str) -> Optional[dict]:
+        """
+        The entry as stored, also in "refresh" mode, where `cache.get` returns
+        nothing so that old fixes are not reused; updates must still extend it.
+        """
+        if not self.enabled:
+            return None
+        return self.cache.backend.get(key)  # type: ignore
+
+    def record(self, error_message: str, code_before: str, code_after: str):
+        """Store the change from `code_before` to `code_after` as a fix for the error of `code_before`."""
+        signature = error_signature(error_message, code_before)
+        if signature is None or not self.enabled or code_before == code_after:
+            return
+        fix = {"diff": _unified_diff(code_before, code_after),
+               "patch": _line_patch(code_before, code_after, ParsedError.parse(error_message)),  # type: ignore
+               "uses": 0}
+        key = make_cache_key("fix_index", signature)
+        with self.lock:
+            entry = self._stored_entry(key) or {"signature": signature, "fixes": []}
+            if any(existing["diff"] == fix["diff"] for existing in entry["fixes"]):
+                return
+            entry["fixes"] = (entry["fixes"] + [fix])[-MAX_FIXES_PER_SIGNATURE:]
+            self.cache.put(key, entry)
+            self.stats["recorded"] += 1
+
+    def mark_used(self, signature: str, fix: dict, kind: str):
+        """Count a fix that resolved its error again, so it is offered first next time."""
+        key = make_cache_key("fix_index", signature)
+        with self.lock:
+            self.stats[kind] += 1
+            entry = self._stored_entry(key)
+            if entry is None:
+                return
+            for existing in entry["fixes"]:
+                if existing["diff"] == fix["diff"]:
+                    existing["uses"] += 1
+            entry["fixes"].sort(key=lambda existing: -existing["uses"])
+            self.cache.put(key, entry)
+
+    @staticmethod
+    def apply_patch(fix: dict, code_text: str, error_message: str) -> Optional[str]:
+        """Replay a stored line rewrite on `code_text`, or None if its failing line has another shape."""
+        error = ParsedError.parse(error_message)
+        patch = fix.get("patch")
+        if patch is None or error is None:
+            return None
+        line = _error_line(code_text, error)
+        template = line_template(line) if line is not None else None
+        if template is None or list(template[0]) != patch["pattern"]:
+            return None
+        bindings = template[1]
+        indent = _indent(line)  # type: ignore
+        lines = code_text.splitlines()
+        lines[error.lineno - 1:error.lineno] = [  # type: ignore
+            indent + re.sub(r"\x00(\d+)\x01", lambda match: bindings[int(match.group(1))], replacement)
+            for replacement in patch["replacement"]]
+        return "\n".join(lines) + ("\n" if code_text.endswith("\n") else "")
+
+    @staticmethod
+    def hint(fixes: List[dict]) -> Optional[str]:
+        return fixes[0]["diff"] if fixes else None
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+        stats["cache"] = self.cache.get_stats()
+        return stats
+
+
+_fix_index = None
+_fix_index_mode: Optional[str] = None
+_fix_index_lock = threading.Lock()
+
+
+def get_fix_index() -> FixIndex:
+    """The error-signature fix index (config.json "fix_index"), opened on first use."""
+    global _fix_index
+    with _fix_index_lock:
+        if _fix_index is None:
+            index_config = load_config_section("fix_index", DEFAULT_FIX_INDEX_CONFIG)
+            _fix_index = FixIndex(ResponseCache.from_config(index_config, mode=_fix_index_mode))
+        return _fix_index
+
+
+def configure_fix_index(mode: str):
+    """Override the index mode ("on", "off" or "refresh") before the first lookup."""
+    global _fix_index, _fix_index_mode
+    with _fix_index_lock:
+        _fix_index_mode = mode
+        _fix_index = None
@@ -0,0 +1,272 @@
+import argparse
+import itertools
+import json
+import os
+import shutil
+from typing import List, Optional
+
+from rich import box
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+from main import build_parser, configure_run, plan_run, print_run_stats
+from planner import run_plan
+from shards import parse_shard
+
+
+# Options that act on the whole process and so must be the same in every cell
+PROCESS_OPTIONS = ("llm_cache", "exec_cache", "fix_index", "schedule")
+# Options that change how fast a cell runs but not its results
+SPEED_OPTIONS = ("concurrency", "parallel_jobs", "exec_workers")
+
+
+def load_spec(spec_path: str) -> dict:
+    """Read a grid spec from JSON, or from YAML when PyYAML is installed."""
+    with open(spec_path, "r", encoding="utf-8") as f:
+        if spec_path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Reading a YAML grid spec requires PyYAML (pip install pyyaml); "
+                                  "JSON specs work without it")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def expand_cells(spec: dict) -> List[dict]:
+    """
+    The cells of a spec: `base` options combined with every combination of
+    the `grid` values, followed by the explicit `cells`, each merged over
+    `base`. Returns the options set per cell.
+    """
+    base = spec.get("base", {})
+    grid = spec.get("grid", {})
+    cells = []
+    for values in itertools.product(*grid.values()):
+        cells.append(dict(base, **dict(zip(grid, values))))
+    for cell in spec.get("cells", []):
+        cells.append(dict(base, **cell))
+    if not cells:
+        cells.append(dict(base))
+    for option in PROCESS_OPTIONS:
+        if len({json.dumps(cell.get(option)) for cell in cells}) > 1:
+            raise ValueError(f"--{option} applies to the whole grid; set it under 'base' only")
+    return cells
+
+
+def cell_args(options: dict) -> argparse.Namespace:
+    """main.py arguments of one cell: the parser defaults overridden by `options`."""
+    parser = build_parser()
+    args = parser.parse_args([])
+    actions = {action.dest: action for action in parser._actions}
+    for option, value in options.items():
+        if option not in actions or option == "help":
+            raise ValueError(f"Unknown option in grid spec: {option}")
+        action = actions[option]
+        if action.nargs in ("+", "*") and not isinstance(value, list):
+            value = [value]
+        if option == "shard" and isinstance(value, str):
+            value = parse_shard(value)
+        for item in (value if isinstance(value, list) else [value]):
+            if action.choices is not None and item not in action.choices:
+                raise ValueError(f"Invalid value for {option}: {item}. Options: {', '.join(action.choices)}")
+        setattr(args, option, value)
+    return args
+
+
+def is_deterministic(args: argparse.Namespace) -> bool:
+    """Whether repeating the cell gives the same results (temperature 0, no sampled debug candidates)."""
+    return args.temperature == 0 and args.debug_candidates <= 1
+
+
+def cell_key(args: argparse.Namespace) -> str:
+    """Cells with the same key produce the same results; only the first of them is run."""
+    options = {option: value for option, value in vars(args).items() if option not in SPEED_OPTIONS}
+    if is_deterministic(args):
+        # Another round at temperature 0 repeats the same requests
+        options.pop("round_mark")
+    return json.dumps(options, sort_keys=True, default=str)
+
+
+def cell_label(options: dict, varied: List[str]) -> str:
+    return ", ".join(f"{option}={options.get(option)}" for option in varied) or "base"
+
+
+def read_tokens(result_paths: List[str]) -> dict:
+    """Total tokens and cost in the token.json files of a job's result folders."""
+    totals = {"total_tokens": 0, "total_cost": 0.0}
+    for result_path in result_paths:
+        token_file = os.path.join(result_path, "token.json")
+        if os.path.exists(token_file):
+            with open(token_file, "r", encoding="utf-8") as f:
+                token_data = json.load(f)
+            totals["total_tokens"] += token_data.get("token_usage", {}).get("total_tokens", 0)
+            totals["total_cost"] += token_data.get("token_cost", {}).get("total_cost", 0.0)
+    return totals
+
+
+def read_accuracy(result_paths: List[str]) -> Optional[dict]:
+    if not result_paths:
+        return None
+    comparison_file = os.path.join(result_paths[-1], "code-gt-comparison_results.json")
+    if not os.path.exists(comparison_file):
+        return None
+    with open(comparison_file, "r", encoding="utf-8") as f:
+        return json.load(f).get("__summary__")
+
+
+def schedule_waves(jobs: list) -> List[list]:
+    """
+    Split jobs into waves that run one after another, so that jobs writing
+    the same result folder (cells that differ only in options missing from
+    the result path, e.g. --debug_max_try) never run at the same time.
+    """
+    waves = []
+    for job in jobs:
+        for wave, used_paths in waves:
+            if not used_paths & set(job.result_paths):
+                wave.append(job)
+                used_paths.update(job.result_paths)
+                break
+        else:
+            waves.append(([job], set(job.result_paths)))
+    return [wave for wave, _ in waves]
+
+
+def run_grid(spec: dict, parallel_jobs: int = 1, console: Optional[Console] = None, dry_run: bool = False) -> List[dict]:
+    """
+    Run every cell of a grid spec in this process and return one row per
+    job (cell × dataset × pattern or mode) with its accuracy, cost and time.
+
+    All cells share the LLM and execution caches, rate limits and loaded
+    datasets. Cells that would repeat another cell's work (the same options,
+    or another round of a temperature-0 cell) are not run; the results of
+    the cell they repeat are copied into their result folders instead.
+    """
+    console = console or Console()
+    cell_options = expand_cells(spec)
+    varied = list(spec.get("grid", {})) + [option for cell in spec.get("cells", []) for option in cell
+                                           if option not in spec.get("grid", {})]
+    varied = list(dict.fromkeys(varied))
+    cells = [(options, cell_args(options)) for options in cell_options]
+    configure_run(cells[0][1])
+
+    datasets = {}
+    canonical = {}
+    planned = []
+    for options, args in cells:
+        key = cell_key(args)
+        jobs = plan_run(args, console, datasets=datasets)
+        same_as = canonical.setdefault(key, len(planned))
+        planned.append({"label": cell_label(options, varied), "jobs": jobs,
+                        "same_as": same_as if same_as != len(planned) else None})
+
+    for cell in planned:
+        note = f" (same as {planned[cell['same_as']]['label']})" if cell["same_as"] is not None else ""
+        console.print(f"Cell {cell['label']}: {len(cell['jobs'])} jobs{note}", style="bold blue")
+    if dry_run:
+        return []
+
+    to_run = [job for cell in planned if cell["same_as"] is None for job in cell["jobs"]]
+    tokens_before = {id(job): read_tokens(job.result_paths) for job in to_run}
+    timings = {}
+    for wave in schedule_waves(to_run):
+        for job, duration, error in run_plan(wave, parallel_jobs=parallel_jobs, console=console):
+            timings[id(job)] = (duration, error)
+
+    rows = []
+    for cell in planned:
+        source = planned[cell["same_as"]] if cell["same_as"] is not None else None
+        for index, job in enumerate(cell["jobs"]):
+            row = {"cell": cell["label"], "job": job.name, "items": job.item_count}
+            if source is not None:
+                # Repeat of an earlier cell: reuse its output instead of running it again
+                for source_path, target_path in zip(source["jobs"][index].result_paths, job.result_paths):
+                    if os.path.abspath(source_path) != os.path.abspath(target_path) and os.path.exists(source_path):
+                        shutil.copytree(source_path, target_path, dirs_exist_ok=True)
+                row.update(time=0.0, cost=0.0, tokens=0, note=f"copied from {source['label']}")
+            else:
+                duration, error = timings[id(job)]
+                tokens = read_tokens(job.result_paths)
+                row.update(time=duration,
+                           cost=tokens["total_cost"] - tokens_before[id(job)]["total_cost"],
+                           tokens=tokens["total_tokens"] - tokens_before[id(job)]["total_tokens"],
+                           note=f"failed: {error}" if error else "")
+            summary = read_accuracy(job.result_paths)
+            row.update(accuracy=summary["accuracy"] if summary else None,
+                       matched=summary["match_count"] if summary else None,
+                       total=summary["total_count"] if summary else None)
+            rows.append(row)
+    return rows
+
+
+def print_grid(rows: List[dict], console: Console):
+    table = Table(
+        show_header=True,
+        box=box.ROUNDED,
+        header_style="bold magenta",
+        border_style="blue",
+        title="Grid Results"
+    )
+    table.add_column("Cell", style="cyan")
+    table.add_column("Job", style="yellow")
+    table.add_column("Accuracy", justify="right")
+    table.add_column("Matched", justify="right")
+    table.add_column("Cost ($)", justify="right")
+    table.add_column("Tokens", justify="right")
+    table.add_column("Time (s)", justify="right")
+    table.add_column("s/problem", justify="right")
+    table.add_column("Note")
+    for row in rows:
+        has_accuracy = row["accuracy"] is not None
+        has_time = row["time"] is not None
+        table.add_row(
+            row["cell"],
+            row["job"],
+            f"{row['accuracy']:.2f}%" if has_accuracy else "N/A",
+            f"{row['matched']}/{row['total']}" if has_accuracy else "N/A",
+            f"{row['cost']:.6f}",
+            str(row["tokens"]),
+            f"{row['time']:.2f}" if has_time else "N/A",
+            f"{row['time'] / max(row['items'], 1):.2f}" if has_time else "N/A",
+            row["note"]
+        )
+    console.print(table)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Run a grid of main.py experiments in one process')
+    parser.add_argument('spec',
+                        type=str,
+                        help='Grid spec (JSON, or YAML with PyYAML installed)')
+    parser.add_argument('--parallel_jobs',
+                        type=int,
+                        default=None,
+                        help='Number of jobs run at the same time (default: the spec\'s parallel_jobs, or 1)')
+    parser.add_argument('--output',
+                        type=str,
+                        default=None,
+                        help='File for the consolidated results (default: the spec\'s output, or result/grid_summary.json)')
+    parser.add_argument('--dry_run',
+                        action='store_true',
+                        help='Only list the cells and which of them repeat another cell')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    console = Console()
+    spec = load_spec(args.spec)
+    parallel_jobs = args.parallel_jobs or spec.get("parallel_jobs", 1)
+    console.print(Panel.fit(f"Grid {args.spec}: {parallel_jobs} parallel jobs"), style="bold blue")
+    rows = run_grid(spec, parallel_jobs=parallel_jobs, console=console, dry_run=args.dry_run)
+    if rows:
+        print_grid(rows, console)
+        output = args.output or spec.get("output", "result/grid_summary.json")
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+        console.print(f"👌 Grid results saved to {output}", style="bold green")
+        print_run_stats(console)
@@ -1,38 +1,414 @@
-import requests
+import asyncio
+import collections
+import concurrent.futures
 import json
-from openai import OpenAI
-from typing import Any, Tuple, Optional
+import os
+import threading
+import time
+import weakref
+from types import SimpleNamespace
+from typing import Any, Awaitable, Dict, Tuple, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from cache import ResponseCache, make_cache_key
+from rate_limiter import RateLimiterRegistry
+from retry import ProviderError, RetryPolicy, RetryStats, call_with_retry, parse_retry_after
 
 # Load configuration
 with open('config.json', 'r') as f:
     config = json.load(f)
 
 
-def general_call(text: Optional[str] = None,
-                 temperature: float = 0.0, 
-                 llm_model: str = "gpt-4.1-nano", 
-                 messages: Optional[list] = None) -> Tuple[str, Any]:
+# All provider calls run on one background event loop. The sync entry points
+# submit coroutines to it, so callers in any thread can fan out many requests.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the background event loop, starting it on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever,
+                             name="llm-call-loop",
+                             daemon=True).start()
+    return _loop
+
+
+def submit_coroutine(coro: Awaitable) -> concurrent.futures.Future:
+    """Schedule a coroutine on the background loop and return its future."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_event_loop())  # type: ignore
+
+
+class ConnectionStats:
+    """
+    Per-provider connection counters fed by httpcore trace events.
+
+    Every request records its connection-setup time (TCP connect plus TLS
+    handshake); a request served from a kept-alive connection records 0.
+    """
+
+    def __init__(self, history: int = 1000):
+        self.requests = 0
+        self.new_connections = 0
+        self.connect_time_total = 0.0
+        self.recent = collections.deque(maxlen=history)
+
+    def record(self, connect_time: float, new_connection: bool):
+        self.requests += 1
+        if new_connection:
+            self.new_connections += 1
+            self.connect_time_total += connect_time
+        self.recent.append(connect_time)
+
+    def summary(self) -> dict:
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.requests - self.new_connections,
+            "connect_time_total": self.connect_time_total,
+            "connect_time_avg": self.connect_time_total / self.new_connections if self.new_connections else 0.0,
+            "last_connect_time": self.recent[-1] if self.recent else 0.0,
+        }
+
+
+class ProviderClientRegistry:
+    """
+    Keep one keep-alive HTTP connection pool per (provider, base_url).
+
+    Pool size, timeouts and HTTP/2 come from the top-level "http" section of
+    config.json and can be overridden per provider with an "http" entry under
+    `api_providers.<provider>`. Clients are bound to the background event loop,
+    so they must only be requested from coroutines running on it.
+    """
+
+    DEFAULT_HTTP_CONFIG = {
+        "max_connections": 100,
+        "max_keepalive_connections": 20,
+        "keepalive_expiry": 30.0,
+        "timeout": 600.0,
+        "connect_timeout": 10.0,
+        "http2": False,
+    }
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.http_clients: Dict[Tuple[str, str], httpx.AsyncClient] = {}
+        self.openai_clients: Dict[Tuple[str, str], AsyncOpenAI] = {}
+        self.connection_stats: Dict[str, ConnectionStats] = {}
+
+    def provider_config(self, provider: str) -> dict:
+        return self.config["api_providers"][provider]
+
+    def http_config(self, provider: str) -> dict:
+        http_config = dict(self.DEFAULT_HTTP_CONFIG)
+        http_config.update(self.config.get("http", {}))
+        http_config.update(self.provider_config(provider).get("http", {}))
+        return http_config
+
+    def _trace_hooks(self, provider: str) -> dict:
+        stats = self.connection_stats.setdefault(provider, ConnectionStats())
+
+        async def on_request(request: httpx.Request):
+            timing = {"started": {}, "connect_time": 0.0, "new_connection": False}
+
+            async def trace(event_name: str, info: dict):
+                # e.g. "connection.connect_tcp.started" / "connection.start_tls.complete"
+                if event_name.endswith(".started"):
+                    timing["started"][event_name[:-len(".started")]] = time.perf_counter()
+                elif event_name.endswith(".complete"):
+                    step = event_name[:-len(".complete")]
+                    if step in ("connection.connect_tcp", "connection.start_tls") and step in timing["started"]:
+                        timing["new_connection"] = True
+                        timing["connect_time"] += time.perf_counter() - timing["started"][step]
+
+            request.extensions["trace"] = trace
+            request.extensions["connection_timing"] = timing
+
+        async def on_response(response: httpx.Response):
+            timing = response.request.extensions.get("connection_timing")
+            if timing is not None:
+                stats.record(timing["connect_time"], timing["new_connection"])
+
+        return {"request": [on_request], "response": [on_response]}
+
+    def get_http_client(self, provider: str) -> httpx.AsyncClient:
+        base_url = self.provider_config(provider)["base_url"]
+        client_key = (provider, base_url)
+        if client_key not in self.http_clients:
+            http_config = self.http_config(provider)
+            limits = httpx.Limits(
+                max_connections=http_config["max_connections"],
+                max_keepalive_connections=http_config["max_keepalive_connections"],
+                keepalive_expiry=http_config["keepalive_expiry"])
+            timeout = httpx.Timeout(http_config["timeout"], connect=http_config["connect_timeout"])
+            http2 = bool(http_config["http2"])
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    print(f"Warning: http2 enabled for {provider} but the 'h2' package is not installed. Using HTTP/1.1.")
+                    http2 = False
+            self.http_clients[client_key] = httpx.AsyncClient(
+                limits=limits,
+                timeout=timeout,
+                http2=http2,
+                event_hooks=self._trace_hooks(provider))
+        return self.http_clients[client_key]
+
+    def get_openai_client(self, provider: str) -> AsyncOpenAI:
+        provider_config = self.provider_config(provider)
+        client_key = (provider, provider_config["base_url"])
+        if client_key not in self.openai_clients:
+            self.openai_clients[client_key] = AsyncOpenAI(
+                api_key=provider_config["api_key"],
+                base_url=provider_config["base_url"],
+                http_client=self.get_http_client(provider),
+                # Retries are handled by `call_with_retry` in general_call
+                max_retries=0,
+            )
+        return self.openai_clients[client_key]
+
+    def get_connection_stats(self) -> dict:
+        return {provider: stats.summary() for provider, stats in self.connection_stats.items()}
+
+    async def aclose(self):
+        for client in self.http_clients.values():
+            await client.aclose()
+        self.http_clients.clear()
+        self.openai_clients.clear()
+
+
+client_registry = ProviderClientRegistry(config)
+
+
+def get_connection_stats() -> dict:
+    """Connection-setup statistics per provider, see `ConnectionStats`."""
+    return client_registry.get_connection_stats()
+
+
+# Response cache for deterministic (temperature 0) requests, see cache.py
+llm_cache = ResponseCache.from_config(config.get("cache", {"mode": "off"}))
+
+
+def configure_llm_cache(mode: str):
+    """Rebuild the response cache with a mode from the CLI ("on", "off" or "refresh")."""
+    global llm_cache
+    llm_cache = ResponseCache.from_config(config.get("cache", {"mode": "off"}), mode=mode)
+
+
+def get_cache_stats() -> dict:
+    return llm_cache.get_stats()
+
+
+def _is_cacheable(temperature: float) -> bool:
+    # Sampling at temperature > 0 (e.g. self-consistency) must stay random
+    return temperature == 0 or config.get("cache", {}).get("cache_nonzero_temperature", False)
+
+
+# Shared per-provider RPM/TPM budgets, see rate_limiter.py
+rate_limiters = RateLimiterRegistry(config)
+
+
+def get_rate_limit_stats() -> dict:
+    return rate_limiters.get_stats()
+
+
+# Retry policy and statistics per provider, see retry.py
+retry_stats: Dict[str, RetryStats] = collections.defaultdict(RetryStats)
+
+
+def get_retry_policy(provider: str) -> RetryPolicy:
+    retry_config = dict(config.get("retry", {}))
+    retry_config.update(config["api_providers"][provider].get("retry", {}))
+    return RetryPolicy.from_config(retry_config)
+
+
+def get_retry_stats() -> dict:
+    return {provider: stats.summary() for provider, stats in list(retry_stats.items())}
+
+
+def get_llm_stats() -> dict:
+    """Process-wide provider statistics: retries, rate limiting, connections and cache."""
+    return {
+        "retry": get_retry_stats(),
+        "rate_limit": get_rate_limit_stats(),
+        "connection": get_connection_stats(),
+        "cache": get_cache_stats(),
+    }
+
+
+def diff_llm_stats(after: dict, before: dict) -> dict:
+    """The counters of `after` minus those of `before` (two `get_llm_stats()` snapshots), with ratios recomputed."""
+    diff = {}
+    for key, value in after.items():
+        previous = before.get(key) if isinstance(before, dict) else None
+        if isinstance(value, dict):
+            diff[key] = diff_llm_stats(value, previous or {})
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and not key.startswith("last_") \
+                and isinstance(previous, (int, float)):
+            diff[key] = value - previous
+        else:
+            diff[key] = value
+    if "hit_rate" in diff:
+        lookups = diff.get("hits", 0) + diff.get("misses", 0)
+        diff["hit_rate"] = diff.get("hits", 0) / lookups if lookups else 0.0
+    if "connect_time_avg" in diff:
+        new_connections = diff.get("new_connections", 0)
+        diff["connect_time_avg"] = diff.get("connect_time_total", 0.0) / new_connections if new_connections else 0.0
+    return diff
 
+
+class LLMStatsWindow:
+    """
+    The provider statistics of one run: `get_llm_stats()` at `save` minus
+    their value when the window was opened. Runs at the same time (e.g.
+    jobs under --parallel_jobs) share the process-wide counters and cannot
+    tell their calls apart, so their files are marked "concurrent_runs".
+    A `spanning` window (a whole plan) does not mark the runs inside it.
+    """
+
+    _open = weakref.WeakSet()
+    _lock = threading.Lock()
+
+    def __init__(self, spanning: bool = False):
+        self.start = get_llm_stats()
+        self.spanning = spanning
+        self.concurrent = False
+        if not spanning:
+            with self._lock:
+                for window in self._open:
+                    window.concurrent = True
+                self.concurrent = len(self._open) > 0
+                self._open.add(self)
+
+    def stats(self) -> dict:
+        stats = diff_llm_stats(get_llm_stats(), self.start)
+        if self.concurrent:
+            stats["concurrent_runs"] = True
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._open.discard(self)
+
+
+def save_llm_stats(stats_file_path: str, window: Optional[LLMStatsWindow] = None):
+    """Save the statistics of `window` (default: the whole process so far) next to a run's token.json."""
+    stats = window.stats() if window is not None else get_llm_stats()
+    os.makedirs(os.path.dirname(stats_file_path), exist_ok=True)
+    with open(stats_file_path, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2, ensure_ascii=False)
+
+
+def resolve_provider(llm_model: str) -> str:
+    """Map a model name to the provider key used in config.json."""
     if "gpt" in llm_model:
-        return link_ai_call(text, temperature=temperature, llm_model=llm_model, messages=messages)
+        return "link_ai"
     elif "qwen" in llm_model:
-        return qwen_call(text, temperature=temperature, llm_model=llm_model, messages=messages)
+        return "qwen"
     elif "deepseek" in llm_model:
-        return deepseek_call(text, temperature=temperature, llm_model=llm_model, messages=messages)
+        return "deepseek"
     else:
         raise ValueError(f"Unsupported: {llm_model}\nYou need to configure the model and provider yourself")
 
 
-def link_ai_call(text: Optional[str] = None,
+def _build_messages(text: Optional[str], messages: Optional[list]) -> list:
+    return [{
+        "role": "user",
+        "content": text
+    }] if messages is None else messages
+
+
+async def async_general_call(text: Optional[str] = None,
+                             temperature: float = 0.0,
+                             llm_model: str = "gpt-4.1-nano",
+                             messages: Optional[list] = None,
+                             sample: int = 0) -> Tuple[str, Any]:
+    """
+    `sample` tells apart repeated draws of the same request (e.g. the samples
+    of self-consistency), which are cached separately instead of all
+    returning the first draw's response.
+    """
+    provider = resolve_provider(llm_model)
+    provider_call = ASYNC_PROVIDER_CALLS[provider]
+
+    cache_key = None
+    if llm_cache.enabled and _is_cacheable(temperature):
+        key_parts = (provider, llm_model, temperature, _build_messages(text, messages))
+        cache_key = make_cache_key(*key_parts, sample) if sample else make_cache_key(*key_parts)
+        # SQLite or file I/O; off the event loop so a slow disk does not stall other requests
+        cached = await asyncio.to_thread(llm_cache.get, cache_key)
+        if cached is not None:
+            # A cache hit costs nothing; TokenManager counts it under "cached_num"
+            token_usage = SimpleNamespace(prompt_tokens=0, completion_tokens=0, total_tokens=0, cached=True)
+            return cached["response"], token_usage
+
+    rate_limiter = rate_limiters.get(provider)
+    estimated_tokens = rate_limiter.estimate(_build_messages(text, messages))
+
+    async def attempt():
+        # Every attempt, including retries, counts against the provider budget
+        await rate_limiter.acquire(estimated_tokens)
+        try:
+            result = await provider_call(text, temperature=temperature, llm_model=llm_model, messages=messages)
+        except Exception:
+            rate_limiter.settle(estimated_tokens, 0)
+            raise
+        rate_limiter.settle(estimated_tokens, getattr(result[1], "total_tokens", 0) or 0)
+        return result
+
+    response, token_usage = await call_with_retry(attempt, get_retry_policy(provider), retry_stats[provider])
+
+    if cache_key is not None:
+        await asyncio.to_thread(llm_cache.put, cache_key, {
+            "response": response,
+            "usage": {
+                "prompt_tokens": getattr(token_usage, "prompt_tokens", 0),
+                "completion_tokens": getattr(token_usage, "completion_tokens", 0),
+                "total_tokens": getattr(token_usage, "total_tokens", 0),
+            }
+        })
+    return response, token_usage
+
+
+def submit_general_call(text: Optional[str] = None,
+                        temperature: float = 0.0,
+                        llm_model: str = "gpt-4.1-nano",
+                        messages: Optional[list] = None,
+                        sample: int = 0) -> concurrent.futures.Future:
+    """
+    Non-blocking variant of `general_call`.
+
+    Returns a future resolving to `(response, token_usage)`, so an agent can
+    submit hundreds of requests and collect them as they complete.
+    """
+    return submit_coroutine(
+        async_general_call(text, temperature=temperature, llm_model=llm_model, messages=messages, sample=sample))
+
+
+def general_call(text: Optional[str] = None,
                  temperature: float = 0.0, 
                  llm_model: str = "gpt-4.1-nano", 
                  messages: Optional[list] = None) -> Tuple[str, Any]:
-    
+
+    return submit_general_call(text, temperature=temperature, llm_model=llm_model, messages=messages).result()
+
+
+async def async_link_ai_call(text: Optional[str] = None,
+                             temperature: float = 0.0,
+                             llm_model: str = "gpt-4.1-nano",
+                             messages: Optional[list] = None) -> Tuple[str, Any]:
+
     # Get configuration from config.json
-    link_ai_config = config["api_providers"]["link_ai"]
+    link_ai_config = client_registry.provider_config("link_ai")
     base_url = link_ai_config["base_url"]
     api_key = link_ai_config["api_key"]
-    
+
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {api_key}"
@@ -40,48 +416,37 @@ def link_ai_call(text: Optional[str] = None,
     body = {
         "app_code": "",
         "model": llm_model,
-        "messages": [{
-            "role": "user",
-            "content": text
-        }] if messages is None else messages,
+        "messages": _build_messages(text, messages),
         "temperature": temperature
     }
-    res = requests.post(base_url, json=body, headers=headers)
+    client = client_registry.get_http_client("link_ai")
+    res = await client.post(base_url, json=body, headers=headers)
     if res.status_code == 200:
         reply_text = res.json().get("choices")[0]['message']['content']
         results = reply_text
         token_usage = res.json().get("usage")
-        from types import SimpleNamespace
         token_usage = SimpleNamespace(**token_usage)
     else:
-        error = res.json()
+        try:
+            error = res.json()
+        except ValueError:
+            error = {"code": res.status_code, "message": res.text[:200]}
         results = f"Request exception, error code={error.get('code')}, error message={error.get('message')}"
-        raise Exception(results)
+        raise ProviderError(results,
+                            status_code=res.status_code,
+                            retry_after=parse_retry_after(res.headers.get("retry-after")))
     return results, token_usage
 
 
-def qwen_call(text: Optional[str] = None, 
-              temperature: float = 0.0, 
-              llm_model: str = "qwen3-32b",
-              messages: Optional[list] = None) -> Tuple[str, Any]:
-    
-    # Get configuration from config.json
-    qwen_config = config["api_providers"]["qwen"]
-    base_url = qwen_config["base_url"]
-    api_key = qwen_config["api_key"]
-    
-    client = OpenAI(
-        api_key=api_key,
-        base_url=base_url,
-    )
-    completion = client.chat.completions.create(
+async def async_qwen_call(text: Optional[str] = None,
+                          temperature: float = 0.0,
+                          llm_model: str = "qwen3-32b",
+                          messages: Optional[list] = None) -> Tuple[str, Any]:
+
+    client = client_registry.get_openai_client("qwen")
+    completion = await client.chat.completions.create(
         model=llm_model,
-        messages=[
-            {
-                "role": "user",
-                "content": text
-            },
-        ] if messages is None else messages,  # type: ignore
+        messages=_build_messages(text, messages),  # type: ignore
         temperature=temperature,
         stream=True,
         stream_options={"include_usage": True},
@@ -90,7 +455,7 @@ def qwen_call(text: Optional[str] = None,
 
     full_content = ""
     usage = None
-    for chunk in completion:
+    async for chunk in completion:
         if chunk.choices and chunk.choices[0].delta.content is not None:
             full_content += chunk.choices[0].delta.content
         if chunk.usage is not None:
@@ -98,30 +463,47 @@ def qwen_call(text: Optional[str] = None,
     return full_content, usage
 
 
+async def async_deepseek_call(text: Optional[str] = None,
+                              temperature: float = 0.0,
+                              llm_model: str = "deepseek-chat",
+                              messages: Optional[list] = None) -> Tuple[str, Any]:
 
-def deepseek_call(text: Optional[str] = None,
-                  temperature: float = 0.0,
-                  llm_model: str = "deepseek-chat",
-                  messages: Optional[list] = None) -> Tuple[str, Any]:
-    
-    # Get configuration from config.json
-    deepseek_config = config["api_providers"]["deepseek"]
-    base_url = deepseek_config["base_url"]
-    api_key = deepseek_config["api_key"]
-    
-    client = OpenAI(
-        base_url=base_url,
-        api_key=api_key,
-    )
-    completion = client.chat.completions.create(
+    client = client_registry.get_openai_client("deepseek")
+    completion = await client.chat.completions.create(
         model=llm_model,
-        messages=[
-            {
-                "role": "user",
-                "content": text
-            },
-        ] if messages is None else messages, # type: ignore
+        messages=_build_messages(text, messages),  # type: ignore
         temperature=temperature)
 
     full_content = completion.choices[0].message.content or ""
     return full_content, completion.usage
+
+
+ASYNC_PROVIDER_CALLS = {
+    "link_ai": async_link_ai_call,
+    "qwen": async_qwen_call,
+    "deepseek": async_deepseek_call,
+}
+
+
+def link_ai_call(text: Optional[str] = None,
+                 temperature: float = 0.0, 
+                 llm_model: str = "gpt-4.1-nano", 
+                 messages: Optional[list] = None) -> Tuple[str, Any]:
+    return submit_coroutine(
+        async_link_ai_call(text, temperature=temperature, llm_model=llm_model, messages=messages)).result()
+
+
+def qwen_call(text: Optional[str] = None, 
+              temperature: float = 0.0, 
+              llm_model: str = "qwen3-32b",
+              messages: Optional[list] = None) -> Tuple[str, Any]:
+    return submit_coroutine(
+        async_qwen_call(text, temperature=temperature, llm_model=llm_model, messages=messages)).result()
+
+
+def deepseek_call(text: Optional[str] = None,
+                  temperature: float = 0.0,
+                  llm_model: str = "deepseek-chat",
+                  messages: Optional[list] = None) -> Tuple[str, Any]:
+    return submit_coroutine(
+        async_deepseek_call(text, temperature=temperature, llm_model=llm_model, messages=messages)).result()
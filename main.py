@@ -1,16 +1,25 @@
 
 import os
 import argparse
-from workflow import Dataset, Baselines, Reflexion, ORThoughtModelAgent, ORThoughtSolveAgent
+import json
+from functools import partial
+from typing import Optional
+from workflow import Dataset, Baselines, Reflexion, ORThoughtModelAgent, ORThoughtSolveAgent, ORThoughtPipelineAgent
 from analyze import execute_matching_files, compare_results
-import time
+from llm_call import configure_llm_cache, get_cache_stats
+from executor import configure_execution_cache, get_execution_stats
+from fix_index import configure_fix_index, get_fix_index
+from scheduler import configure_scheduler
+from planner import PlannedJob, run_plan, print_timings
+from shards import parse_shard, shard_dir_name
 from rich.console import Console
 from rich.panel import Panel
 
 
-def parse_arguments():
+def build_parser(add_help: bool = True) -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
-        description='Automated Solving of Optimization Problems Described in Natural Language')
+        description='Automated Solving of Optimization Problems Described in Natural Language',
+        add_help=add_help)
 
     parser.add_argument('--dataset_name',
                         type=str,
@@ -37,6 +46,11 @@ def parse_arguments():
         default=[],
         help='List of problems to address (optional)')
 
+    parser.add_argument('--shard',
+                        type=parse_shard,
+                        default=None,
+                        help='Run only shard i of N of the selected problems, given as i/N; a problem\'s shard depends only on its key (optional)')
+
     parser.add_argument('--round_mark',
                         type=int,
                         default=0,
@@ -61,19 +75,49 @@ def parse_arguments():
                         type=int,
                         default=3,
                         help='Start round number for peer reflection (default: 3)')
+    parser.add_argument('--debug_candidates',
+                        type=int,
+                        default=1,
+                        help='Candidate fixes requested and executed in parallel per debug round (default: 1)')
+    parser.add_argument('--debug_candidate_temperature',
+                        type=float,
+                        default=0.7,
+                        help='Sampling temperature of the extra debug candidates (default: 0.7)')
+    parser.add_argument('--compact_debug',
+                        action='store_true',
+                        help='Debug in one conversation answered with patches instead of resending the full prompt each round')
+    parser.add_argument('--autofix',
+                        action='store_true',
+                        help='Repair common gurobipy errors with local rules before asking the LLM to debug')
     parser.add_argument('--mode',
                         type=str,
-                        default='formalized',
+                        nargs='+',
+                        default=['formalized'],
                         choices=[
                             'formalized', 'wo_understanding', 'formalized_understanding_simplified', 'formalized_build_simplified'
                         ],
-                        help='Ablation experiment: ORThought mode (default: formalized)')
+                        help='Ablation experiment: ORThought mode(s) (default: formalized)')
 
     parser.add_argument('--patterns',
                         type=str,
                         nargs='+',
                         default=['standard'],
                         help='Baseline patterns to run (default: standard)')
+    parser.add_argument('--sc_samples',
+                        type=int,
+                        default=3,
+                        help='Number of samples drawn by self_consistency (default: 3)')
+    parser.add_argument('--sc_adaptive',
+                        action='store_true',
+                        help='Let self_consistency stop sampling once the samples agree')
+    parser.add_argument('--sc_max_samples',
+                        type=int,
+                        default=10,
+                        help='Maximum samples per problem with --sc_adaptive (default: 10)')
+    parser.add_argument('--sc_threshold',
+                        type=float,
+                        default=0.7,
+                        help='Share of samples that must agree to stop with --sc_adaptive (default: 0.7)')
     parser.add_argument('--reflexion',
                         action='store_true')
     parser.add_argument('--reflection_round',
@@ -88,202 +132,329 @@ def parse_arguments():
     parser.add_argument('--execute_code',
                         action='store_true',
                         help='Execute generated code and compare results')
-    
-    return parser.parse_args()
 
+    parser.add_argument('--exec_workers',
+                        type=int,
+                        default=1,
+                        help='Number of code files executed in parallel with --execute_code (default: 1)')
 
-if __name__ == "__main__":
-    args = parse_arguments()
+    parser.add_argument('--exec_timeout',
+                        type=float,
+                        default=None,
+                        help='Per-file execution time limit in seconds (default: config.json)')
 
-    console = Console()
-    dataset_names = args.dataset_name
-    item_num = args.item_num
-    item_range = tuple(
-        args.item_range
-    ) if args.item_range else None  # Use range if provided, else None
-    problems = args.problems
-    round_mark = args.round_mark
-    temperature = args.temperature
-    llm_model = args.llm_model
-    patterns_to_run = args.patterns
-
-    for dataset_name in dataset_names:
+    parser.add_argument('--parallel_jobs',
+                        type=int,
+                        default=1,
+                        help='Number of dataset/pattern/mode runs executed at the same time (default: 1)')
+
+    parser.add_argument('--concurrency',
+                        type=int,
+                        default=1,
+                        help='Number of problems processed concurrently (default: 1)')
+
+    parser.add_argument('--pipeline',
+                        action='store_true',
+                        help='Run ORThought modeling and solving as one streaming pipeline')
+
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Skip items already completed by a previous (interrupted) run')
+
+    parser.add_argument('--exec_cache',
+                        type=str,
+                        default=None,
+                        choices=['on', 'off', 'refresh'],
+                        help='Execution result cache: on (read/write), off (bypass) or refresh (overwrite) (default: config.json)')
+
+    parser.add_argument('--fix_index',
+                        type=str,
+                        default=None,
+                        choices=['on', 'off', 'refresh'],
+                        help='Error-signature index of past debug fixes: on (reuse/record), off or refresh (record only; new fixes are added to the stored ones) (default: config.json)')
+
+    parser.add_argument('--schedule',
+                        type=str,
+                        default=None,
+                        choices=['cost', 'dataset'],
+                        help='Order problems are dispatched in: cost (longest expected first) or dataset (default: config.json)')
+
+    parser.add_argument('--llm_cache',
+                        type=str,
+                        default=None,
+                        choices=['on', 'off', 'refresh'],
+                        help='LLM response cache: on (read/write), off (bypass) or refresh (overwrite) (default: config.json)')
+    
+    return parser
+
+
+def parse_arguments():
+    return build_parser().parse_args()
+
+
+def configure_run(args):
+    """Apply the cache, fix index and scheduling options of a run to this process."""
+    if args.llm_cache:
+        configure_llm_cache(args.llm_cache)
+    if args.exec_cache:
+        configure_execution_cache(args.exec_cache)
+    if args.fix_index:
+        configure_fix_index(args.fix_index)
+    if args.schedule:
+        configure_scheduler(args.schedule)
+
+
+def results_root_of(args) -> str:
+    results_root = f"result/{args.llm_model}/temp{args.temperature}/round{args.round_mark}"
+    if args.shard:
+        results_root = os.path.join(results_root, shard_dir_name(args.shard))
+    return results_root
+
+
+def run_orthought(args, dataset: Dataset, save_path: str, mode: str, console: Console):
+    base_pattern = f"orthought_{mode}"
+    console.print(f"ORThought mode: {base_pattern}", style="bold yellow")
+    if args.pipeline:
+        console.print(
+            Panel.fit(
+                f" |Dataset: {dataset.dataset_name}  |Base pattern: {base_pattern}  |LLM Model: {args.llm_model}  |Round {args.round_mark}",
+                style="bold blue",
+                title="ORTHOUGHT PIPELINE AGENT",
+            ))
+        pipeline_agent = ORThoughtPipelineAgent()
+        pipeline_agent(dataset=dataset,
+                       item_num=args.item_num,
+                       save_path=save_path,
+                       llm_model=args.llm_model,
+                       temperature=args.temperature,
+                       mode=mode,
+                       debug_max_try=args.debug_max_try,
+                       debug_candidates=args.debug_candidates,
+                       candidate_temperature=args.debug_candidate_temperature,
+                       autofix=args.autofix,
+                       compact_debug=args.compact_debug,
+                       concurrency=args.concurrency,
+                       resume=args.resume)
+        return
+
+    console.print(
+        Panel.fit(
+            f" |Dataset: {dataset.dataset_name}  |Base pattern: {base_pattern}  |LLM Model: {args.llm_model}  |Round {args.round_mark}",
+            style="bold blue",
+            title=f"ORTHOUGHT MODEL AGENT",
+        ))
+    model_agent = ORThoughtModelAgent()
+    model_agent(dataset=dataset,
+                item_num=args.item_num,
+                save_path=save_path,
+                llm_model=args.llm_model,
+                temperature=args.temperature,
+                mode=mode,
+                concurrency=args.concurrency,
+                resume=args.resume)
+
+    console.print(f"Call Solve Agent. Debugging max try: {args.debug_max_try}", style="bold yellow")
+    console.print(
+        Panel.fit(
+            f" |Dataset: {dataset.dataset_name}  |Base pattern: {base_pattern}  |LLM Model: {args.llm_model}  |Round {args.round_mark}",
+            style="bold blue",
+            title="ORTHOUGHT SOLVE AGENT",
+        ))
+    solve_agent = ORThoughtSolveAgent()
+    solve_agent(dataset=dataset,
+                item_num=args.item_num,
+                save_path=save_path,
+                llm_model=args.llm_model,
+                temperature=args.temperature,
+                debug_max_try=args.debug_max_try,
+                debug_candidates=args.debug_candidates,
+                candidate_temperature=args.debug_candidate_temperature,
+                autofix=args.autofix,
+                compact_debug=args.compact_debug,
+                base_pattern=base_pattern,
+                resume=args.resume)
+
+
+def run_baseline(args, dataset: Dataset, save_path: str, pattern: str, console: Console):
+    console.print(
+        Panel(
+            f"  |Dataset:{dataset.dataset_name}  |Running pattern:{pattern}  |LLM Model:{args.llm_model}  |Round {args.round_mark}",
+            style="bold blue",
+        ))
+    console.print(f"results_root: {os.path.dirname(save_path)}", style="bold green")
+    agent = Baselines()
+    agent(dataset=dataset,
+          item_num=args.item_num,
+          save_path=save_path,
+          pattern=pattern,
+          llm_model=args.llm_model,
+          temperature=args.temperature,
+          resume=args.resume,
+          self_consistency=dict(num=args.sc_samples,
+                                adaptive=args.sc_adaptive,
+                                max_samples=args.sc_max_samples,
+                                threshold=args.sc_threshold))
+
+
+def run_reflexion(args, dataset: Dataset, save_path: str, console: Console):
+    console.print(
+            Panel.fit(
+                f"  |Dataset:{dataset.dataset_name}  |Base pattern:standard  |LLM Model:{args.llm_model}  |Round {args.round_mark}",
+                style="bold blue",
+                title="REFLEXION",
+            ))
+    console.print(f"results_root: {save_path}", style="bold green")
+    reflexion = Reflexion()
+    reflexion(dataset=dataset,
+              item_num=args.item_num,
+              save_path=save_path,
+              pattern="standard",
+              llm_model=args.llm_model,
+              temperature=args.temperature,
+              round_num=args.reflection_round,
+              start_round=args.start_round,
+              resume=args.resume
+              )
+
+
+def run_execution(args, dataset: Dataset, save_path: str, pattern: str, console: Console):
+    """Execute the code generated by `pattern` (an ORThought mode with --or_thought) and compare it with the ground truth."""
+    execute_options = dict(timeout=args.exec_timeout, workers=args.exec_workers, resume=args.resume,
+                           problems=dataset.data)
+    console.print(" Executing code generated...")
+    pattern_path = os.path.join(save_path, pattern)
+
+    for i in range(args.start_round,
+                args.start_round+args.reflection_round):
+        
+        if args.or_thought:
+            pattern_path = os.path.join(save_path, f"orthought_{pattern}")
+            if args.debug_max_try>0:
+                pattern_path = os.path.join(pattern_path, "debug")
+            execution_results = execute_matching_files(
+                pattern_path, "*.py", True, **execute_options)
         
-        results_root = f"result/{llm_model}/temp{temperature}/round{round_mark}"
+        elif args.reflexion:
+            pattern_path = os.path.join(save_path, "reflexion")
+            round_save_path = os.path.join(pattern_path, f"round_{i+1}")
+            execution_results = execute_matching_files(
+                round_save_path, f"*.py", **execute_options)
+            compare_results(execution_results,
+                        dataset.ground_truth,
+                        round_save_path,
+                        f"code-gt-comparison_results_{i}.json",
+                        is_ground_truth=True,
+                        prob_type=dataset.prob_type,
+                        prob_size=dataset.prob_size)
+
+            print(
+                f"👌 All code files have been executed and results saved in {save_path} directory"
+            )
+            continue
 
+        else:
+            if i == 0:
+                execution_results = execute_matching_files(
+                    pattern_path, "*.py", True, **execute_options)
+            else:
+                execution_results = execute_matching_files(
+                    pattern_path, f"*_{i}.py", **execute_options)
+
+        compare_results(execution_results,
+                        dataset.ground_truth,
+                        pattern_path,
+                        f"code-gt-comparison_results.json",
+                        is_ground_truth=True,
+                        prob_type=dataset.prob_type,
+                        prob_size=dataset.prob_size)
+
+        print(
+            f"👌 All code files have been executed and results saved in {pattern_path} directory"
+        )
+
+
+def plan_run(args, console: Console, datasets: Optional[dict] = None) -> list:
+    """
+    Expand the run described by `args` into independent jobs: one per
+    dataset and baseline pattern, ORThought mode or Reflexion run.
+    `datasets` caches loaded datasets between calls.
+    """
+    # Define all available baselines (except for 'reflexion')
+    all_patterns = [
+        "standard",
+        "zero-shot_cot",
+        "self_consistency",
+    ]
+
+    # Filter patterns to run based on input
+    patterns = [p for p in all_patterns if p in args.patterns]
+    if not patterns:
+        raise ValueError(
+            "No valid patterns specified. Please check your input.")
+
+    results_root = results_root_of(args)
+    jobs = []
+    for dataset_name in args.dataset_name:
         # Initialize dataset with or without item range
-        if item_range:
-            dataset = Dataset(dataset_name=dataset_name, item_range=item_range, problems=problems)
+        item_range = tuple(args.item_range) if args.item_range else None
+        dataset_key = json.dumps([dataset_name, item_range, sorted(args.problems), args.shard])
+        if datasets is not None and dataset_key in datasets:
+            dataset = datasets[dataset_key]
         else:
-            dataset = Dataset(dataset_name=dataset_name, problems=problems)
-
-        # Define all available baselines (except for 'reflexion')
-        all_patterns = [
-            "standard",
-            "zero-shot_cot",
-            "self_consistency",
-        ]
-
-        # Filter patterns to run based on input
-        patterns = [p for p in all_patterns if p in patterns_to_run]
-        if not patterns:
-            raise ValueError(
-                "No valid patterns specified. Please check your input.")
-            
-        """ORThought"""
-        if args.or_thought and not args.execute_code:
-            base_pattern = f"orthought_{args.mode}"
-            console.print(f"ORThought mode: {base_pattern}", style="bold yellow")
-            
-            console.print(
-                Panel.fit(
-                    f" |Dataset: {dataset_name}  |Base pattern: {base_pattern}  |LLM Model: {llm_model}  |Round {round_mark}",
-                    style="bold blue",
-                    title=f"ORTHOUGHT MODEL AGENT",
-                ))
-            model_agent = ORThoughtModelAgent()
-            save_path = os.path.join(results_root, dataset.dataset_name)
-            os.makedirs(save_path, exist_ok=True)
-            model_agent(dataset=dataset,
-                        item_num=item_num,
-                        save_path=save_path,
-                        llm_model=llm_model,
-                        temperature=temperature,
-                        mode=args.mode)
-
-            console.print(f"Call Solve Agent. Debugging max try: {args.debug_max_try}", style="bold yellow")
-            console.print(
-                Panel.fit(
-                    f" |Dataset: {dataset_name}  |Base pattern: {base_pattern}  |LLM Model: {llm_model}  |Round {round_mark}",
-                    style="bold blue",
-                    title="ORTHOUGHT SOLVE AGENT",
-                ))
-            solve_agent = ORThoughtSolveAgent()
-            save_path = os.path.join(results_root, dataset.dataset_name)
-            os.makedirs(save_path, exist_ok=True)
-            solve_agent(dataset=dataset,
-                        item_num=item_num,
-                        save_path=save_path,
-                        llm_model=llm_model,
-                        temperature=temperature,
-                        debug_max_try=args.debug_max_try,
-                        base_pattern=base_pattern)
-
-
-        elif (not args.execute_code) and (not args.reflexion):
-            time_list = []
-            for pattern in patterns:
-                start_time = time.time()
-                try:
-                    print("\n\n")
-                    console.print(
-                        Panel(
-                            f"  |Dataset:{dataset_name}  |Running pattern:{pattern}  |LLM Model:{llm_model}  |Round {round_mark}",
-                            style="bold blue",
-                        ))
-                    console.print(f"results_root: {results_root}", style="bold green")
-                    agent = Baselines()
-                    save_path = os.path.join(results_root, dataset.dataset_name)
-                    os.makedirs(save_path, exist_ok=True)
-                    agent(dataset=dataset,
-                        item_num=item_num,
-                        save_path=save_path,
-                        pattern=pattern,
-                        llm_model=llm_model,
-                        temperature=temperature)
-                except Exception as e:
-                    console.print(f"Error occurred: {e}", style="bold red")
-                    continue
-                end_time = time.time()
-                duration = end_time - start_time
-                avg_time = duration / len(dataset.keys)
-                time_list.append((duration, avg_time))
-                console.print(f"Time taken for {pattern}: {duration:.2f} seconds", style="bold yellow")
-                console.print(f"Average time taken for {pattern}: {avg_time:.2f} seconds", style="bold yellow")
-
-            print("\n\n")
-            for i in range(len(time_list)):
-                duration, avg_time = time_list[i]
-                print(f"Time taken for {patterns[i]}: {duration:.2f} seconds")
-                print(
-                    f"Average time taken for {patterns[i]}: {avg_time:.2f} seconds")
-        
-        
-        elif args.reflexion and not args.execute_code:
+            dataset = Dataset(dataset_name=dataset_name, item_range=item_range, problems=args.problems, shard=args.shard)
+            if datasets is not None:
+                datasets[dataset_key] = dataset
+        save_path = os.path.join(results_root, dataset.dataset_name)
+        os.makedirs(save_path, exist_ok=True)
+        item_count = min(args.item_num, len(dataset))
+
+        def job(name, result_paths, run, *run_args):
+            return PlannedJob(f"{dataset_name}/{name}", partial(run, args, dataset, save_path, *run_args, console),
+                              item_count, [os.path.join(save_path, path) for path in result_paths])
+
+        reflexion_rounds = [os.path.join("reflexion", f"round_{r}")
+                            for r in range(args.start_round + 1, args.start_round + args.reflection_round + 1)]
+        if args.execute_code:
+            """Execution of generated code"""
+            if args.or_thought:
+                jobs.extend(job(f"orthought_{mode}", [orthought_result_path(mode, args.debug_max_try)],
+                                run_execution, mode) for mode in args.mode)
+            elif args.reflexion:
+                jobs.append(job("reflexion", reflexion_rounds, run_execution, "reflexion"))
+            else:
+                jobs.extend(job(pattern, [pattern], run_execution, pattern) for pattern in patterns)
+        elif args.or_thought:
+            """ORThought"""
+            jobs.extend(job(f"orthought_{mode}", [f"orthought_{mode}", orthought_result_path(mode, args.debug_max_try)],
+                            run_orthought, mode) for mode in args.mode)
+        elif args.reflexion:
             """Reflexion"""
-            for pattern in patterns:
-                console.print()
-                console.print(
-                        Panel.fit(
-                            f"  |Dataset:{dataset_name}  |Base pattern:{pattern}  |LLM Model:{llm_model}  |Round {round_mark}",
-                            style="bold blue",
-                            title="REFLEXION",
-                        ))
-
-                reflexion = Reflexion()
-                save_path = os.path.join(results_root, dataset.dataset_name)
-                console.print(f"results_root: {save_path}", style="bold green")
-                os.makedirs(save_path, exist_ok=True)
-                reflexion(dataset=dataset,
-                          item_num=item_num,
-                          save_path=save_path,
-                          pattern="standard",
-                          llm_model=llm_model,
-                          temperature=temperature,
-                          round_num=args.reflection_round,
-                          start_round=args.start_round
-                          )
-
-        elif args.execute_code:
-            for pattern in patterns:
-                console.print(" Executing code generated...")
-                save_path = os.path.join(results_root, dataset.dataset_name)
-                pattern_path = os.path.join(save_path, pattern)
-
-                for i in range(args.start_round,
-                            args.start_round+args.reflection_round):
-                    
-                    if args.or_thought:
-                        pattern_path = os.path.join(save_path, f"orthought_{args.mode}")
-                        if args.debug_max_try>0:
-                            pattern_path = os.path.join(pattern_path, "debug")
-                        execution_results = execute_matching_files(
-                            pattern_path, "*.py", True)
-                    
-                    elif args.reflexion:
-                        pattern_path = os.path.join(save_path, "reflexion")
-                        round_save_path = os.path.join(pattern_path, f"round_{i+1}")
-                        execution_results = execute_matching_files(
-                            round_save_path, f"*.py")
-                        compare_results(execution_results,
-                                    dataset.ground_truth,
-                                    round_save_path,
-                                    f"code-gt-comparison_results_{i}.json",
-                                    is_ground_truth=True,
-                                    prob_type=dataset.prob_type,
-                                    prob_size=dataset.prob_size)
-
-                        print(
-                            f"👌 All code files have been executed and results saved in {save_path} directory"
-                        )
-                        continue
-
-                    else:
-                        if i == 0:
-                            execution_results = execute_matching_files(
-                                pattern_path, "*.py", True)
-                        else:
-                            execution_results = execute_matching_files(
-                                pattern_path, f"*_{i}.py")
-
-                    compare_results(execution_results,
-                                    dataset.ground_truth,
-                                    pattern_path,
-                                    f"code-gt-comparison_results.json",
-                                    is_ground_truth=True,
-                                    prob_type=dataset.prob_type,
-                                    prob_size=dataset.prob_size)
-
-                    print(
-                        f"👌 All code files have been executed and results saved in {pattern_path} directory"
-                    )
+            jobs.append(job("reflexion", reflexion_rounds, run_reflexion))
+        else:
+            jobs.extend(job(pattern, [pattern], run_baseline, pattern) for pattern in patterns)
+    return jobs
+
+
+def orthought_result_path(mode: str, debug_max_try: int) -> str:
+    """Folder of the final ORThought results, relative to the dataset's result folder."""
+    if debug_max_try > 0:
+        return os.path.join(f"orthought_{mode}", "debug")
+    return f"orthought_{mode}"
+
+
+def print_run_stats(console: Console):
+    console.print(f"LLM cache: {get_cache_stats()}", style="bold green")
+    console.print(f"Execution pool: {get_execution_stats()}", style="bold green")
+    if get_fix_index().enabled:
+        console.print(f"Fix index: {get_fix_index().get_stats()}", style="bold green")
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    console = Console()
+    configure_run(args)
+
+    timings = run_plan(plan_run(args, console), parallel_jobs=args.parallel_jobs, console=console)
+    print_timings(timings)
+    print_run_stats(console)
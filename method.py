@@ -1,4 +1,4 @@
-from llm_call import qwen_call, general_call
+from llm_call import qwen_call, general_call, submit_general_call
 from typing import Optional, Tuple, Any
 
 
@@ -42,12 +42,44 @@ def debug(nlp: Optional[str] = None,
           llm_model: str = "gpt-4.1-nano",
           temperature: float = 0.0) -> Tuple[str, Any]:
 
+    response, token_usage = submit_debug(nlp=nlp, model_text=model_text, code_text=code_text,
+                                         error_message=error_message, llm_model=llm_model,
+                                         temperature=temperature).result()
+
+    return response, token_usage
+
+
+def submit_debug(nlp: Optional[str] = None,
+                 model_text: Optional[str] = None,
+                 code_text: Optional[str] = None,
+                 error_message: Optional[str] = None,
+                 llm_model: str = "gpt-4.1-nano",
+                 temperature: float = 0.0,
+                 sample: int = 0):
+    """Non-blocking variant of `debug`, returning a future of `(response, token_usage)`."""
     from prompt import debug_prompt
 
     prompt = debug_prompt.format(nlp=nlp, model_text=model_text, code_text=code_text, error_message=error_message)
-    response, token_usage = general_call(prompt, llm_model=llm_model, temperature=temperature)
+    return submit_general_call(prompt, llm_model=llm_model, temperature=temperature, sample=sample)
 
-    return response, token_usage
+
+def compact_debug(messages: list,
+                  llm_model: str = "gpt-4.1-nano",
+                  temperature: float = 0.0) -> Tuple[str, Any]:
+    """One turn of a compact debug conversation (see `compact_debug_prompt`), answered with a patch."""
+    return general_call(messages=messages, llm_model=llm_model, temperature=temperature)
+
+
+def hint_debug(code_text: str,
+               error_message: str,
+               hint: str,
+               llm_model: str = "gpt-4.1-nano",
+               temperature: float = 0.0) -> Tuple[str, Any]:
+    """Short debug request that only carries the code, the error and the diff of a known fix."""
+    from prompt import hint_debug_prompt
+
+    prompt = hint_debug_prompt.format(code_text=code_text, error_message=error_message, hint=hint)
+    return general_call(prompt, llm_model=llm_model, temperature=temperature)
 
 
 def zero_shot_cot(nlp, llm_model: str = "qwen3-8b", temperature: float = 0.0):
@@ -71,11 +103,54 @@ def zero_shot_cot(nlp, llm_model: str = "qwen3-8b", temperature: float = 0.0):
     return general_call(task, temperature=temperature, llm_model=llm_model)
 
 
+def execute_samples(codes: list, problem: Optional[dict] = None) -> list:
+    """
+    Execute sampled programs in parallel and return `str(result)` for each.
+    Programs with the same normalized AST (see `executor.code_fingerprint`)
+    are executed only once.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from executor import code_fingerprint, execute_code
+
+    fingerprints = [code_fingerprint(code) for code in codes]
+    unique_codes = dict(zip(fingerprints, codes))
+
+    def run(code):
+        try:
+            return str(execute_code(code, problem=problem).output)
+        except Exception as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=len(unique_codes) or 1) as executor:
+        outputs = dict(zip(unique_codes, executor.map(run, unique_codes.values())))
+    return [outputs[fingerprint] for fingerprint in fingerprints]
+
+
 def self_consistency_vote(nlp: str,
                           num: int = 3,
                           llm_model: str = "gpt-4.1-nano",
-                          temperature: float = 0.5):
-    from utils import extract_code, execute_str_function, get_random_index_of_most_frequent
+                          temperature: float = 0.5,
+                          problem: Optional[dict] = None,
+                          adaptive: bool = False,
+                          min_samples: int = 2,
+                          max_samples: int = 10,
+                          threshold: float = 0.7):
+    """
+    Sample `num` programs, execute them and return the response whose result
+    is most frequent.
+
+    With `adaptive`, sampling starts with `min_samples` and continues until the
+    leading (non-error) objective value is shared by at least `threshold` of
+    the samples drawn, or `max_samples` is reached. Each extra batch is the
+    smallest one that could reach the threshold if all its samples agree.
+
+    Returns:
+        tuple: (most frequent response, responses + [results], token usage
+        with the number of samples drawn in `samples`)
+    """
+    import math
+    from collections import Counter
+    from utils import extract_code, get_random_index_of_most_frequent
     task = f"""
     The problem description is as follows:
     {nlp}
@@ -89,34 +164,48 @@ def self_consistency_vote(nlp: str,
     ```
     """
     responses = []
+    results = []
     tokens = {
         "prompt_tokens": 0,
         "completion_tokens": 0,
         "total_tokens": 0
     }
-    for _ in range(num):
-        response, token_usage = general_call(task, temperature=temperature, llm_model=llm_model)
-        tokens["prompt_tokens"] += token_usage.prompt_tokens
-        tokens["completion_tokens"] += token_usage.completion_tokens
-        tokens["total_tokens"] += token_usage.total_tokens
-        responses.append(response)
-
-    # execute the code and vote for popular result
-    results = []
 
-    for response in responses:
-        try:
-            clean_code = extract_code(response)
-            result = execute_str_function(clean_code)
-            results.append(str(result))
-        except Exception as e:
-            results.append(str(e))
+    def draw(count):
+        # draw the samples concurrently; responses keep their submission order
+        # each sample has its own cache entry, so cached runs still vote over distinct draws
+        futures = [submit_general_call(task, temperature=temperature, llm_model=llm_model, sample=len(responses) + i)
+                   for i in range(count)]
+        batch = []
+        for future in futures:
+            response, token_usage = future.result()
+            tokens["prompt_tokens"] += token_usage.prompt_tokens
+            tokens["completion_tokens"] += token_usage.completion_tokens
+            tokens["total_tokens"] += token_usage.total_tokens
+            batch.append(response)
+        responses.extend(batch)
+        # execute the code and vote for popular result
+        results.extend(execute_samples([extract_code(response) for response in batch], problem=problem))
+
+    if not adaptive:
+        draw(num)
+    else:
+        max_samples = max(max_samples, min_samples)
+        draw(min_samples)
+        while len(results) < max_samples:
+            answers = Counter(result for result in results if "Error" not in result)
+            leading = answers.most_common(1)[0][1] if answers else 0
+            if leading >= threshold * len(results):
+                break
+            needed = math.ceil((threshold * len(results) - leading) / (1 - threshold)) if threshold < 1 else 1
+            draw(max(1, min(needed, max_samples - len(results))))
+
     most_frequent_answer_index = get_random_index_of_most_frequent(results)
     most_frequent_answer = responses[most_frequent_answer_index]
     responses.append(results)
 
     from types import SimpleNamespace
-    tokens = SimpleNamespace(**tokens)
+    tokens = SimpleNamespace(**tokens, samples=len(results))
 
     return most_frequent_answer, responses, tokens
 
@@ -0,0 +1,86 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from rich.console import Console
+
+from llm_call import LLMStatsWindow, save_llm_stats
+from workflow import shared_progress
+
+
+class PlannedJob:
+    """
+    One independent run of a plan, e.g. one baseline pattern or ORThought
+    mode on one dataset. `run` takes no arguments; `item_count` is used for
+    the average time per problem. `result_paths` are the directories the
+    run writes, in stage order (the last one holds the final comparison).
+    """
+
+    def __init__(self, name: str, run: Callable[[], None], item_count: int, result_paths: Optional[List[str]] = None):
+        self.name = name
+        self.run = run
+        self.item_count = item_count
+        self.result_paths = result_paths or []
+
+
+def run_job(job: PlannedJob, console: Console) -> Tuple[PlannedJob, Optional[float], Optional[str]]:
+    start_time = time.time()
+    try:
+        job.run()
+    except Exception as e:
+        console.print(f"Error occurred in {job.name}: {e}", style="bold red")
+        return job, None, str(e)
+    duration = time.time() - start_time
+    console.print(f"Time taken for {job.name}: {duration:.2f} seconds", style="bold yellow")
+    console.print(f"Average time taken for {job.name}: {duration / max(job.item_count, 1):.2f} seconds",
+                  style="bold yellow")
+    return job, duration, None
+
+
+def run_plan(jobs: List[PlannedJob], parallel_jobs: int = 1,
+             console: Optional[Console] = None) -> List[Tuple[PlannedJob, Optional[float], Optional[str]]]:
+    """
+    Run `jobs`, up to `parallel_jobs` at a time, and return (job, seconds,
+    error) for each in plan order; seconds is None for a failed job.
+
+    The jobs run as threads of this process. They share its LLM rate limits,
+    caches and execution pool, and their progress bars are drawn in one
+    combined view. Their provider statistics cannot be told apart, so the
+    statistics of the whole plan are also saved to llm_stats.json in the
+    jobs' common result directory.
+    """
+    console = console or Console()
+    if parallel_jobs <= 1 or len(jobs) <= 1:
+        return [run_job(job, console) for job in jobs]
+    stats_window = LLMStatsWindow(spanning=True)
+    with shared_progress(console), ThreadPoolExecutor(max_workers=parallel_jobs) as executor:
+        futures = [executor.submit(run_job, job, console) for job in jobs]
+        timings = [future.result() for future in futures]
+    stats_path = plan_stats_path(jobs)
+    if stats_path is not None:
+        save_llm_stats(stats_path, stats_window)
+        console.print(f"LLM statistics of all {len(jobs)} jobs saved to {stats_path}", style="bold green")
+    return timings
+
+
+def plan_stats_path(jobs: List[PlannedJob]) -> Optional[str]:
+    """llm_stats.json in the common parent of the jobs' result directories, unless that is a job's own directory."""
+    result_paths = [os.path.abspath(path) for job in jobs for path in job.result_paths]
+    if not result_paths:
+        return None
+    common = os.path.commonpath(result_paths)
+    if common in result_paths:
+        return None
+    return os.path.join(common, "llm_stats.json")
+
+
+def print_timings(timings: List[Tuple[PlannedJob, Optional[float], Optional[str]]]):
+    """Print the time taken per job, as main.py has always done for the baseline patterns."""
+    print("\n\n")
+    for job, duration, error in timings:
+        if duration is None:
+            print(f"{job.name} failed: {error}")
+            continue
+        print(f"Time taken for {job.name}: {duration:.2f} seconds")
+        print(f"Average time taken for {job.name}: {duration / max(job.item_count, 1):.2f} seconds")
@@ -96,6 +96,90 @@ Output Format:
 """
 
 
+compact_debug_prompt = r"""
+You are an expert Gurobipy developer and debugger. Your task is to analyze the provided mathematical model, Gurobipy code, and error message to identify and fix the bug in the Gurobipy code. The corrected code must accurately implement the given mathematical model.
+
+The problem description:
+
+```text
+{nlp}
+```
+
+The mathematical model:
+
+```model
+{model_text}
+```
+
+The Gurobipy code:
+
+```python
+{code_text}
+```
+
+The error message during code execution:
+
+```text
+{error_message}
+```
+
+Your Task:
+
+1. Identify the Bug.
+2. Provide the Fix as a Patch: Give a brief explanation of the changes, then the edits to the Gurobipy code as search/replace blocks.
+3. Ensure Model Adherence: The corrected code must accurately reflect the provided mathematical model.
+
+Output Format:
+1. A brief explanation of fixes.
+2. The edits enclosed within **<patch>** and **</patch>** tags, one block per edit:
+
+<patch>
+<<<<<<< SEARCH
+[lines copied exactly from the current code]
+=======
+[the lines that replace them]
+>>>>>>> REPLACE
+</patch>
+
+  - Each SEARCH part must be copied exactly from the current code, including indentation, and match only one place. To add lines, include a neighbouring line in SEARCH and REPLACE.
+  - Keep the blocks small; do not repeat unchanged code.
+"""
+
+
+compact_debug_followup_prompt = r"""
+{patch_note}The error message during code execution is now:
+
+```text
+{error_message}
+```
+{changes}
+Fix the remaining bug with a new patch in the same format.
+"""
+
+
+hint_debug_prompt = r"""
+You are an expert Gurobipy developer and debugger. The following Gurobipy code fails with the error below.
+
+```python
+{code_text}
+```
+
+The error message during code execution:
+
+```text
+{error_message}
+```
+
+The same kind of error was fixed in another program with this change:
+
+```diff
+{hint}
+```
+
+Apply the corresponding fix to this code without changing what it models. Enclose the complete corrected code within **<code>** and **</code>** tags.
+"""
+
+
 formalized_solution_path_build_simplified_prompt = r"""
 You are an expert in optimization modeling and programming. Please carefully analyze the following optimization problem:
 
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `capacity` units per `period` seconds.
+
+    `reserve` debits the bucket immediately (it may go negative) and returns
+    how long the caller has to wait before the reservation is covered. Callers
+    therefore queue up in arrival order without holding a lock while waiting.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        # A single request larger than the whole budget would never fit
+        amount = min(amount, self.capacity)
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def refund(self, amount: float):
+        """Return (or, with a negative amount, further debit) tokens after the fact."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class ProviderRateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budget for one provider.
+
+    The token cost of a request is only known after it returns, so `acquire`
+    reserves an estimate and `settle` corrects the bucket with the real usage.
+    """
+
+    def __init__(self,
+                 rpm: Optional[float] = None,
+                 tpm: Optional[float] = None,
+                 expected_completion_tokens: int = 0):
+        self.expected_completion_tokens = expected_completion_tokens
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "waits": 0, "wait_time": 0.0}
+
+    def estimate(self, messages: list) -> int:
+        return estimate_tokens(messages, self.expected_completion_tokens)
+
+    async def acquire(self, estimated_tokens: int = 0):
+        wait = 0.0
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket is not None and estimated_tokens:
+            wait = max(wait, self.token_bucket.reserve(estimated_tokens))
+        with self.lock:
+            self.stats["requests"] += 1
+            if wait > 0:
+                self.stats["waits"] += 1
+                self.stats["wait_time"] += wait
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        if self.token_bucket is not None:
+            self.token_bucket.refund(estimated_tokens - actual_tokens)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats)
+
+
+class RateLimiterRegistry:
+    """
+    Shared rate limiters keyed by provider, configured from the "rate_limit"
+    entry ({"rpm": ..., "tpm": ...}) of each provider in config.json.
+    Providers without a limit are not throttled.
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.limiters: Dict[str, ProviderRateLimiter] = {}
+        self.lock = threading.Lock()
+
+    def get(self, provider: str) -> ProviderRateLimiter:
+        with self.lock:
+            if provider not in self.limiters:
+                limit_config = self.config["api_providers"][provider].get("rate_limit", {})
+                self.limiters[provider] = ProviderRateLimiter(
+                    rpm=limit_config.get("rpm"),
+                    tpm=limit_config.get("tpm"),
+                    expected_completion_tokens=limit_config.get("expected_completion_tokens", 0))
+            return self.limiters[provider]
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {provider: limiter.get_stats() for provider, limiter in self.limiters.items()}
+
+
+def estimate_tokens(messages: list, expected_completion_tokens: int = 0) -> int:
+    """Rough token estimate (~4 characters per token) used before a request is sent."""
+    chars = sum(len(str(message.get("content", ""))) for message in messages)
+    return chars // 4 + expected_completion_tokens
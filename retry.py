@@ -0,0 +1,157 @@
+import asyncio
+import random
+import threading
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+import httpx
+import openai
+
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class ProviderError(Exception):
+    """Non-200 response from a provider that is called without an SDK."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def classify_error(exception: BaseException) -> Tuple[bool, str, Optional[float]]:
+    """
+    Classify a provider exception.
+
+    Returns:
+        tuple: (retryable, error kind, retry-after seconds or None)
+    """
+    if isinstance(exception, ProviderError):
+        kind = f"http_{exception.status_code}" if exception.status_code else "provider_error"
+        return exception.status_code in RETRYABLE_STATUS_CODES, kind, exception.retry_after
+    if isinstance(exception, openai.APIStatusError):
+        retry_after = parse_retry_after(exception.response.headers.get("retry-after"))
+        return exception.status_code in RETRYABLE_STATUS_CODES, f"http_{exception.status_code}", retry_after
+    if isinstance(exception, openai.APITimeoutError):
+        return True, "timeout", None
+    if isinstance(exception, openai.APIConnectionError):
+        return True, "connection", None
+    if isinstance(exception, httpx.TimeoutException):
+        return True, "timeout", None
+    if isinstance(exception, httpx.TransportError):
+        return True, "connection", None
+    if isinstance(exception, (ConnectionError, asyncio.TimeoutError)):
+        return True, "connection", None
+    return False, type(exception).__name__, None
+
+
+class RetryPolicy:
+    """
+    Capped exponential backoff with full jitter.
+
+    The n-th retry waits a random time in [0, min(max_delay, base_delay * 2**n)],
+    or at least the provider's Retry-After when one was sent. No wait is
+    longer than max_delay, whatever Retry-After asks for.
+    """
+
+    def __init__(self, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_config(cls, retry_config: dict) -> "RetryPolicy":
+        return cls(max_retries=retry_config.get("max_retries", 5),
+                   base_delay=retry_config.get("base_delay", 1.0),
+                   max_delay=retry_config.get("max_delay", 60.0))
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = min(max(delay, retry_after), self.max_delay)
+        return delay
+
+
+class RetryStats:
+    """Per-provider retry counters, reported in llm_stats.json."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.succeeded_after_retry = 0
+        self.gave_up = 0
+        self.fatal = 0
+        self.backoff_time = 0.0
+        self.errors = Counter()
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "succeeded_after_retry": self.succeeded_after_retry,
+                "gave_up": self.gave_up,
+                "fatal": self.fatal,
+                "backoff_time": self.backoff_time,
+                "errors": dict(self.errors),
+            }
+
+
+async def call_with_retry(call: Callable[[], Awaitable[Any]], policy: RetryPolicy, stats: RetryStats) -> Any:
+    """
+    Await `call()` until it succeeds, a fatal error occurs or the policy's
+    retries are used up; the last exception is re-raised in the latter cases.
+    """
+    with stats.lock:
+        stats.calls += 1
+    attempt = 0
+    while True:
+        with stats.lock:
+            stats.attempts += 1
+        try:
+            result = await call()
+        except Exception as e:
+            retryable, kind, retry_after = classify_error(e)
+            with stats.lock:
+                stats.errors[kind] += 1
+                if not retryable:
+                    stats.fatal += 1
+                elif attempt >= policy.max_retries:
+                    stats.gave_up += 1
+            if not retryable or attempt >= policy.max_retries:
+                raise
+            delay = policy.backoff(attempt, retry_after)
+            with stats.lock:
+                stats.retries += 1
+                stats.backoff_time += delay
+            attempt += 1
+            await asyncio.sleep(delay)
+            continue
+        if attempt > 0:
+            with stats.lock:
+                stats.succeeded_after_retry += 1
+        return result
@@ -0,0 +1,179 @@
+import json
+import math
+import os
+import statistics
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+from utils import load_config_section
+
+
+DEFAULT_SCHEDULER_CONFIG = {
+    "order": "cost",
+    "timings_path": "cache/stage_timings.json",
+    "smoothing": 0.5,
+}
+
+SIZE_WEIGHTS = {"Toy": 1.0, "Small": 2.0, "Medium": 4.0, "Large": 8.0}
+# IndustryOR grades difficulty as Easy/Small/Hard
+DIFFICULTY_WEIGHTS = {"Easy": 1.0, "Small": 1.5, "Medium": 1.5, "Hard": 2.5}
+
+scheduler_config = load_config_section("scheduler", DEFAULT_SCHEDULER_CONFIG)
+
+
+def configure_scheduler(order: str):
+    """Override the dispatch order ("cost" or "dataset") for agents created afterwards."""
+    if order not in ("cost", "dataset"):
+        raise ValueError(f"Unknown schedule: {order}. Supported schedules are: cost, dataset")
+    scheduler_config["order"] = order
+
+
+def static_cost(value: dict) -> float:
+    """
+    Relative cost of a problem from its metadata: `problem_size`,
+    `difficulty`, `details.nonzeros_num` and the length of its description.
+    """
+    size = SIZE_WEIGHTS.get(value.get("problem_size"), 2.0)
+    difficulty = DIFFICULTY_WEIGHTS.get(value.get("difficulty"), 1.0)
+    nonzeros = (value.get("details") or {}).get("nonzeros_num") or 0
+    description = len(value.get("description") or "")
+    return size * difficulty * (1 + math.log10(1 + nonzeros)) * (1 + description / 4000)
+
+
+class StageTimings:
+    """
+    Wall-clock seconds per problem and stage from earlier runs, kept in one
+    JSON file ({dataset: {stage: {key: seconds}}}). New measurements are
+    smoothed into the stored value, and the file is re-read before saving
+    so that concurrent runs do not drop each other's entries.
+    """
+
+    def __init__(self, path: str, smoothing: float = 0.5):
+        self.path = path
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        self.timings = self._load()
+        self.updates = {}
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def get(self, dataset: str, stage: str) -> dict:
+        with self.lock:
+            return dict(self.timings.get(dataset, {}).get(stage, {}))
+
+    def record(self, dataset: str, stage: str, key: str, seconds: float):
+        with self.lock:
+            stage_timings = self.timings.setdefault(dataset, {}).setdefault(stage, {})
+            previous = stage_timings.get(key)
+            if previous is not None:
+                seconds = self.smoothing * seconds + (1 - self.smoothing) * previous
+            stage_timings[key] = seconds
+            self.updates.setdefault(dataset, {}).setdefault(stage, {})[key] = seconds
+
+    def save(self):
+        with self.lock:
+            if not self.updates:
+                return
+            timings = self._load()
+            for dataset, stages in self.updates.items():
+                for stage, keys in stages.items():
+                    timings.setdefault(dataset, {}).setdefault(stage, {}).update(keys)
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(timings, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.timings = timings
+            self.updates = {}
+
+
+_stage_timings = None
+_timings_lock = threading.Lock()
+
+
+def get_stage_timings() -> StageTimings:
+    global _stage_timings
+    with _timings_lock:
+        if _stage_timings is None:
+            _stage_timings = StageTimings(scheduler_config["timings_path"], scheduler_config.get("smoothing", 0.5))
+        return _stage_timings
+
+
+class CostScheduler:
+    """
+    Orders the problems of one agent stage longest first, so that with
+    several workers the expensive problems do not end up as the tail of
+    the run.
+
+    A problem's expected cost is its measured time from earlier runs of the
+    same dataset and stage. Problems without a measurement get their
+    `static_cost`, scaled to seconds by the median time/cost ratio of the
+    measured ones. With the "dataset" order, items keep their dataset order
+    but timings are still recorded.
+    """
+
+    def __init__(self, dataset_name: str, stage: str, order: Optional[str] = None):
+        self.dataset_name = dataset_name
+        self.stage = stage
+        self.order_by = order or scheduler_config["order"]
+        self.timings = get_stage_timings()
+        self.past = self.timings.get(dataset_name, stage)
+        self.scale = 1.0
+        self.static = {}
+
+    def _fit(self, items: list):
+        self.static = {key: static_cost(value) for key, value in items}
+        ratios = [self.past[key] / cost for key, cost in self.static.items() if key in self.past and cost > 0]
+        self.scale = statistics.median(ratios) if ratios else 1.0
+
+    def estimate(self, key: str, value: dict) -> float:
+        """Expected seconds for `key` (relative units when nothing has been measured yet)."""
+        if key in self.past:
+            return self.past[key]
+        cost = self.static[key] if key in self.static else static_cost(value)
+        return cost * self.scale
+
+    def order(self, items: list, *others: "CostScheduler") -> list:
+        """
+        `items` sorted by expected cost, longest first (ties keep dataset
+        order). Estimates of `others` are added, e.g. the solve stage when
+        ordering the model stage of a pipeline.
+        """
+        schedulers = (self,) + others
+        for scheduler in schedulers:
+            scheduler._fit(items)
+        if self.order_by != "cost":
+            return list(items)
+        rank = {key: index for index, (key, _) in enumerate(items)}
+        return sorted(items, key=lambda item: (-sum(scheduler.estimate(*item) for scheduler in schedulers),
+                                               rank[item[0]]))
+
+    def record(self, key: str, seconds: float):
+        self.timings.record(self.dataset_name, self.stage, key, seconds)
+
+    def timed(self, worker: Callable) -> Callable:
+        """Wrap `worker(key, ...)` so that each call's duration is recorded under `key`."""
+        def timed_worker(key, *args, **kwargs):
+            start_time = time.time()
+            try:
+                return worker(key, *args, **kwargs)
+            finally:
+                self.record(key, time.time() - start_time)
+        return timed_worker
+
+    def timed_items(self, items: list) -> Iterator[Tuple[str, Any]]:
+        """Yield `items`, recording the time the caller spends on each one."""
+        for key, value in items:
+            start_time = time.time()
+            yield key, value
+            self.record(key, time.time() - start_time)
+
+    def save(self):
+        self.timings.save()
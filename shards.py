@@ -0,0 +1,324 @@
+import argparse
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+from typing import List, Optional, Tuple
+
+from rich.console import Console
+from rich.panel import Panel
+
+from analyze import comparison_summary
+from utils import TokenManager, load_results
+
+
+# Files rebuilt from the shards instead of copied
+RESULT_FILES = ("results.json", "execution_results.json")
+MERGED_FILES = RESULT_FILES + ("results.jsonl", "execution_results.jsonl", "token.json", "llm_stats.json",
+                               "samples.json", "manifest.jsonl")
+COMPARISON_PATTERN = "code-gt-comparison_results*.json"
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Parse "i/N" (1 <= i <= N) into (i, N)."""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard: {text}. Expected i/N, e.g. 1/4")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard: {text}. The shard index must be between 1 and {max(count, 1)}")
+    return index, count
+
+
+def stable_hash(key: str) -> int:
+    """Hash of a problem key that is the same on every machine and Python process."""
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:16], 16)
+
+
+def shard_of(key: str, count: int) -> int:
+    """
+    The shard (1..count) of one problem key, by rendezvous hashing: the
+    shard whose hash with the key is highest. It depends on the key and
+    `count` alone, so a problem stays in its shard whatever else is selected.
+    """
+    return max(range(1, count + 1), key=lambda index: stable_hash(f"{index}/{count}:{key}"))
+
+
+def assign_shards(data: dict, count: int) -> dict:
+    """
+    Assign each problem key to a shard (1..count) with `shard_of`.
+
+    A problem's shard does not depend on the other problems, so machines
+    whose datasets or filters differ still agree on where a problem runs,
+    and no problem is run twice or skipped because of it. Shards get about
+    the same number of problems; within a shard, the scheduler still starts
+    the expensive ones first.
+    """
+    return {key: shard_of(key, count) for key in data}
+
+
+def shard_data(data: dict, shard: Tuple[int, int]) -> dict:
+    """The entries of `data` that belong to `shard` (i, N), in dataset order."""
+    index, count = shard
+    assignment = assign_shards(data, count)
+    return {key: value for key, value in data.items() if assignment[key] == index}
+
+
+def shard_dir_name(shard: Tuple[int, int]) -> str:
+    return f"shard_{shard[0]}_of_{shard[1]}"
+
+
+def _dataset_order(relative_dir: str) -> dict:
+    """Rank of each key in the dataset a result directory belongs to (first path component)."""
+    dataset_name = relative_dir.split(os.sep)[0]
+    data_path = f"datasets/summary/summary_{dataset_name}.json"
+    if not os.path.exists(data_path):
+        return {}
+    with open(data_path, "r", encoding="utf-8") as f:
+        return {key: rank for rank, key in enumerate(json.load(f))}
+
+
+def _ordered(results: dict, key_rank: dict) -> dict:
+    # Keys outside the dataset keep their order at the end
+    return {key: results[key] for key in sorted(results, key=lambda key: key_rank.get(key, len(key_rank)))}
+
+
+def _write_json(path: str, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+
+
+def _sum_stats(total: dict, stats: dict) -> dict:
+    """Add numeric leaves of `stats` into `total`; other values keep their first occurrence."""
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            total[key] = _sum_stats(total.get(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key in total:
+            total[key] = max(total[key], value) if key.startswith("last_") else total[key] + value
+        else:
+            total.setdefault(key, value)
+    return total
+
+
+def _fix_ratios(stats: dict):
+    for value in stats.values():
+        if isinstance(value, dict):
+            _fix_ratios(value)
+    if "hit_rate" in stats:
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        stats["hit_rate"] = stats.get("hits", 0) / lookups if lookups else 0.0
+    if "connect_time_avg" in stats:
+        new_connections = stats.get("new_connections", 0)
+        stats["connect_time_avg"] = stats.get("connect_time_total", 0.0) / new_connections if new_connections else 0.0
+
+
+def merge_llm_stats(stats_list: List[dict]) -> dict:
+    """Sum several llm_stats.json documents (see `llm_call.get_llm_stats`) and recompute their ratios."""
+    total = {}
+    for stats in stats_list:
+        _sum_stats(total, stats)
+    _fix_ratios(total)
+    return total
+
+
+def _merged_summary(summaries: List[dict], comparison: dict) -> dict:
+    """
+    The `__summary__` of merged comparison entries. Shards hold disjoint
+    problems, so the counts of their summaries (written by
+    `analyze.compare_results`) add up; they are turned into a summary by
+    the same `comparison_summary`. Groups are listed in the order of their
+    first problem, as `compare_results` lists them.
+    """
+    group_stats = {}
+    for stats_name, field in (("problem_type_stats", "problem_type"), ("problem_size_stats", "problem_size")):
+        if not any(stats_name in summary for summary in summaries):
+            group_stats[stats_name] = None
+            continue
+        order = list(dict.fromkeys(entry[field] for key, entry in comparison.items()
+                                   if key != "__summary__" and field in entry))
+        totals = {}
+        for summary in summaries:
+            for group_name, stats in summary.get(stats_name, {}).items():
+                total = totals.setdefault(group_name, {"total": 0, "matched": 0})
+                total["total"] += stats["total"]
+                total["matched"] += stats["matched"]
+        group_stats[stats_name] = {
+            group_name: totals[group_name]
+            for group_name in sorted(totals, key=lambda name: order.index(name) if name in order else len(order))
+        }
+    return comparison_summary(sum(summary["match_count"] for summary in summaries),
+                              sum(summary["total_count"] for summary in summaries),
+                              group_stats["problem_type_stats"], group_stats["problem_size_stats"])
+
+
+def _merge_directory(relative_dir: str, source_dirs: List[str], output_dir: str, console: Console) -> Optional[dict]:
+    """Merge one result directory (e.g. logior/orthought_formalized/debug) of several shards."""
+    key_rank = _dataset_order(relative_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    for file_name in RESULT_FILES:
+        merged = {}
+        for source_dir in source_dirs:
+            # Also picks up the journal of a shard that did not finish
+            merged.update(load_results(os.path.join(source_dir, file_name)))
+        if merged:
+            _write_json(os.path.join(output_dir, file_name), _ordered(merged, key_rank))
+
+    token_files = [os.path.join(source_dir, "token.json") for source_dir in source_dirs
+                   if os.path.exists(os.path.join(source_dir, "token.json"))]
+    if token_files:
+        with open(token_files[0], "r", encoding="utf-8") as f:
+            llm_model = json.load(f)["token_usage"]["model"]
+        token_manager = TokenManager(llm_model)
+        for token_file in token_files:
+            token_manager.load_existing_data(token_file)
+        token_manager.save_to_file(os.path.join(output_dir, "token.json"))
+
+    llm_stats = []
+    for source_dir in source_dirs:
+        stats_file = os.path.join(source_dir, "llm_stats.json")
+        if os.path.exists(stats_file):
+            with open(stats_file, "r", encoding="utf-8") as f:
+                llm_stats.append(json.load(f))
+    if llm_stats:
+        _write_json(os.path.join(output_dir, "llm_stats.json"), merge_llm_stats(llm_stats))
+
+    per_problem = {}
+    for source_dir in source_dirs:
+        samples_file = os.path.join(source_dir, "samples.json")
+        if os.path.exists(samples_file):
+            with open(samples_file, "r", encoding="utf-8") as f:
+                per_problem.update(json.load(f)["per_problem"])
+    if per_problem:
+        total = sum(per_problem.values())
+        _write_json(os.path.join(output_dir, "samples.json"),
+                    {"total": total, "mean": total / len(per_problem), "per_problem": _ordered(per_problem, key_rank)})
+
+    # Copied files keep their modification times, so the manifest entries stay valid for --resume
+    manifest_lines = []
+    for source_dir in source_dirs:
+        manifest_file = os.path.join(source_dir, "manifest.jsonl")
+        if os.path.exists(manifest_file):
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                manifest_lines.extend(line if line.endswith("\n") else line + "\n" for line in f if line.strip())
+    if manifest_lines:
+        with open(os.path.join(output_dir, "manifest.jsonl"), "w", encoding="utf-8") as f:
+            f.writelines(manifest_lines)
+
+    summary = None
+    comparison_names = sorted({os.path.basename(path) for source_dir in source_dirs
+                               for path in glob.glob(os.path.join(source_dir, COMPARISON_PATTERN))})
+    for comparison_name in comparison_names:
+        comparison = {}
+        shard_summaries = []
+        for source_dir in source_dirs:
+            comparison_file = os.path.join(source_dir, comparison_name)
+            if os.path.exists(comparison_file):
+                with open(comparison_file, "r", encoding="utf-8") as f:
+                    shard_comparison = json.load(f)
+                shard_summaries.append(shard_comparison.pop("__summary__"))
+                comparison.update(shard_comparison)
+        comparison = _ordered(comparison, key_rank)
+        comparison["__summary__"] = _merged_summary(shard_summaries, comparison)
+        _write_json(os.path.join(output_dir, comparison_name), comparison)
+        if comparison_name == "code-gt-comparison_results.json":
+            summary = comparison["__summary__"]
+
+    # Per-problem outputs (code, models) are disjoint between shards
+    for source_dir in source_dirs:
+        for file_name in sorted(os.listdir(source_dir)):
+            source_file = os.path.join(source_dir, file_name)
+            if (not os.path.isfile(source_file) or file_name in MERGED_FILES
+                    or fnmatch.fnmatch(file_name, COMPARISON_PATTERN) or file_name.endswith(".tmp")):
+                continue
+            target_file = os.path.join(output_dir, file_name)
+            if os.path.exists(target_file):
+                with open(source_file, "rb") as source, open(target_file, "rb") as target:
+                    if source.read() != target.read():
+                        console.print(f"{os.path.join(relative_dir, file_name)} differs between shards, "
+                                      f"keeping the first copy", style="bold red")
+                continue
+            shutil.copy2(source_file, target_file)
+    return summary
+
+
+def _check_shard_set(shard_dirs: List[str], console: Console):
+    """Reject shards of different splits or the same shard twice, and warn about missing shards."""
+    shards = []
+    for shard_dir in shard_dirs:
+        match = re.fullmatch(r"shard_(\d+)_of_(\d+)", os.path.basename(os.path.normpath(shard_dir)))
+        if match:
+            shards.append((int(match.group(1)), int(match.group(2))))
+    if not shards:
+        return
+    counts = {count for _, count in shards}
+    if len(counts) > 1:
+        raise ValueError(f"The shard directories come from splits into different numbers of shards: "
+                         f"{', '.join(map(str, sorted(counts)))}")
+    indexes = [index for index, _ in shards]
+    if len(set(indexes)) < len(indexes):
+        raise ValueError("The same shard is given more than once")
+    missing = sorted(set(range(1, counts.pop() + 1)) - set(indexes))
+    if missing:
+        console.print(f"Missing shards: {', '.join(map(str, missing))}; their problems are not in the merged run",
+                      style="bold red")
+
+
+def merge_shards(shard_dirs: List[str], output_dir: str, console: Optional[Console] = None) -> dict:
+    """
+    Combine the result directories of a sharded run (one per `--shard i/N`)
+    into `output_dir`, with the layout of a single-machine run.
+
+    results.json and execution_results.json are merged in dataset order,
+    token.json and llm_stats.json are summed, and the accuracy summaries of
+    the code-gt-comparison files are combined over all problems. Returns
+    the accuracy summary per result directory.
+    """
+    console = console or Console()
+    _check_shard_set(shard_dirs, console)
+    relative_dirs = {}
+    for shard_dir in shard_dirs:
+        if not os.path.isdir(shard_dir):
+            raise FileNotFoundError(f"Shard result directory not found: {shard_dir}")
+        for root, _, _ in os.walk(shard_dir):
+            relative_dir = os.path.relpath(root, shard_dir)
+            if relative_dir != ".":
+                relative_dirs.setdefault(relative_dir, []).append(root)
+
+    summaries = {}
+    for relative_dir in sorted(relative_dirs):
+        summary = _merge_directory(relative_dir, relative_dirs[relative_dir],
+                                   os.path.join(output_dir, relative_dir), console)
+        if summary is not None:
+            summaries[relative_dir] = summary
+            console.print(f"{relative_dir}: {summary['match_count']}/{summary['total_count']} "
+                          f"({summary['accuracy']:.2f}%) from {len(relative_dirs[relative_dir])} shards",
+                          style="bold green")
+    console.print(f"👌 {len(shard_dirs)} shards merged into {output_dir}", style="bold green")
+    return summaries
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Merge the result directories of a sharded run')
+    parser.add_argument('shard_dirs',
+                        type=str,
+                        nargs='+',
+                        help='Result roots of the shards, e.g. result/gpt-4.1-nano/temp0.0/round0/shard_1_of_4')
+    parser.add_argument('--output',
+                        type=str,
+                        default=None,
+                        help='Directory for the merged run (default: the common parent of the shard directories)')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    console = Console()
+    output_dir = args.output or os.path.commonpath([os.path.abspath(shard_dir) for shard_dir in args.shard_dirs])
+    if os.path.abspath(output_dir) in [os.path.abspath(shard_dir) for shard_dir in args.shard_dirs]:
+        raise ValueError("The output directory must differ from the shard directories")
+    console.print(Panel.fit(f"Merging {len(args.shard_dirs)} shards into {output_dir}"), style="bold blue")
+    merge_shards(args.shard_dirs, output_dir, console)
@@ -0,0 +1,114 @@
+import glob
+import os
+import sys
+import time
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import executor
+from analyze import execute_matching_files
+
+
+def baseline_execute_matching_files(folder_path, file_pattern="*.py", exclude_mark=False):
+    """The in-process implementation `execute_matching_files` replaced."""
+    results = {}
+    matching_files = glob.glob(os.path.join(folder_path, file_pattern))
+    if exclude_mark:
+        for i in range(1, 5):
+            exclude_files = glob.glob(os.path.join(folder_path, f"*_{i}.py"))
+            matching_files = [f for f in matching_files if f not in exclude_files]
+    for file_path in matching_files:
+        file_name_key = os.path.basename(file_path).split('.')[0]
+        file_namespace = {}
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                file_content = f.read()
+            exec(file_content, file_namespace)
+            found_function = False
+            for item_name, item in file_namespace.items():
+                if callable(item) and not item_name.startswith('__') and isinstance(item, types.FunctionType):
+                    results[file_name_key] = item()
+                    found_function = True
+                    break
+            if not found_function:
+                results[file_name_key] = 'Error: No callable function found'
+        except Exception as e:
+            results[file_name_key] = f'Error: {str(e)}'
+    return results
+
+
+PROGRAMS = {
+    "value": "def solve():\n    return 42.5\n",
+    "tuple": "def solve():\n    return (1, [2, 3], {'a': None})\n",
+    "second": "def b():\n    return 'first defined'\n\ndef a():\n    return 'alphabetical'\n",
+    "no_function": "x = 1\n",
+    "exception": "def solve():\n    raise ValueError('Model is infeasible')\n",
+    "syntax": "def solve(:\n    return 1\n",
+    "prob_1": "def solve():\n    return 'excluded by exclude_mark'\n",
+}
+
+
+# Return values that cannot leave the child process, and what they are converted to
+UNPICKLABLE_PROGRAMS = {
+    "unpicklable_number": ("import threading\n"
+                           "\n"
+                           "class Objective:\n"
+                           "    lock = threading.Lock()\n"
+                           "    def __float__(self):\n"
+                           "        return 12.5\n"
+                           "\n"
+                           "def solve():\n"
+                           "    obj = Objective()\n"
+                           "    obj.lock = threading.Lock()\n"
+                           "    return obj\n"),
+    "unpicklable_object": ("import threading\n"
+                           "\n"
+                           "class Point:\n"
+                           "    def __init__(self):\n"
+                           "        self.lock = threading.Lock()\n"
+                           "    def __str__(self):\n"
+                           "        return 'Point(3)'\n"
+                           "\n"
+                           "def solve():\n"
+                           "    return Point()\n"),
+}
+
+
+@pytest.fixture
+def program_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(executor, "_execution_cache", executor.ResponseCache(mode="off"))
+    for name, code in PROGRAMS.items():
+        (tmp_path / f"{name}.py").write_text(code, encoding="utf-8")
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("exclude_mark", [False, True])
+@pytest.mark.parametrize("workers", [1, 3])
+def test_results_match_baseline(program_folder, exclude_mark, workers):
+    expected = baseline_execute_matching_files(program_folder, "*.py", exclude_mark)
+    results = execute_matching_files(program_folder, "*.py", exclude_mark, workers=workers)
+    assert results == expected
+    assert list(results) == list(expected)
+
+
+def test_resume_reruns_changed_files(program_folder):
+    execute_matching_files(program_folder, "value.py")
+    assert execute_matching_files(program_folder, "value.py", resume=True) == {"value": 42.5}
+
+    file_path = os.path.join(program_folder, "value.py")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("def solve():\n    return 7\n")
+    # Make sure the modification time differs on filesystems with coarse timestamps
+    os.utime(file_path, (time.time() + 5, time.time() + 5))
+    assert execute_matching_files(program_folder, "value.py", resume=True) == {"value": 7}
+
+
+def test_unpicklable_values_are_converted_in_the_child(tmp_path, monkeypatch):
+    monkeypatch.setattr(executor, "_execution_cache", executor.ResponseCache(mode="off"))
+    for name, code in UNPICKLABLE_PROGRAMS.items():
+        (tmp_path / f"{name}.py").write_text(code, encoding="utf-8")
+    results = execute_matching_files(str(tmp_path), "*.py")
+    assert results == {"unpicklable_number": 12.5, "unpicklable_object": "Point(3)"}
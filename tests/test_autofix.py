@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autofix import ParsedError, apply_autofix, is_objective_value
+
+
+def traceback_of(line: int, error: str) -> str:
+    return ("Traceback (most recent call last):\n"
+            f'  File "/tmp/run/temp_module.py", line {line}, in solve\n'
+            "    ...\n"
+            f"{error}")
+
+
+def test_parse_error_takes_the_last_exception_and_user_line():
+    error = ParsedError.parse(traceback_of(7, "gurobipy.GurobiError: Unable to retrieve attribute 'ObjVal'"))
+    assert (error.exc_type, error.message, error.lineno) == ("GurobiError", "Unable to retrieve attribute 'ObjVal'", 7)
+    assert ParsedError.parse("Error: Execution timed out after 300 seconds.") is None
+    assert ParsedError.parse(42.0) is None
+
+
+def test_missing_import_is_added_after_the_docstring():
+    code = '"""Model."""\nimport gurobipy as gp\n\ndef solve():\n    return np.sum([1, 2])\n'
+    fixed, rule = apply_autofix(code, traceback_of(5, "NameError: name 'np' is not defined"))
+    assert rule == "missing_import"
+    assert fixed == '"""Model."""\nimport numpy as np\nimport gurobipy as gp\n\ndef solve():\n    return np.sum([1, 2])\n'
+
+
+def test_unknown_or_already_imported_names_are_left_alone():
+    code = "import numpy as np\n\ndef solve():\n    return np.sum(data)\n"
+    assert apply_autofix(code, traceback_of(4, "NameError: name 'data' is not defined")) == (None, None)
+    assert apply_autofix(code, traceback_of(4, "NameError: name 'np' is not defined")) == (None, None)
+
+
+def test_grb_constant_is_corrected():
+    pytest.importorskip("gurobipy")
+    code = ("import gurobipy as gp\nfrom gurobipy import GRB\n\ndef solve():\n    m = gp.Model()\n"
+            "    x = m.addVar(vtype=GRB.Integer)\n    m.setObjective(x, GRB.MINIMISE)\n")
+    fixed, rule = apply_autofix(code, traceback_of(6, "AttributeError: type object 'GRB' has no attribute 'Integer'"))
+    assert rule == "grb_constant"
+    assert "vtype=GRB.INTEGER" in fixed
+
+
+def test_solution_attribute_read_returns_an_error_without_an_optimal_solution():
+    code = ("import gurobipy as gp\nfrom gurobipy import GRB\n\ndef solve():\n    m = gp.Model()\n"
+            "    m.optimize()\n    return m.ObjVal\n")
+    fixed, rule = apply_autofix(code, traceback_of(7, "gurobipy.GurobiError: Unable to retrieve attribute 'ObjVal'"))
+    assert rule == "solution_attribute"
+    assert fixed.endswith('    return (m.ObjVal if m.Status == GRB.OPTIMAL '
+                          'else "Error: no optimal solution, model Status " + str(m.Status))\n')
+
+
+def test_solution_attribute_reads_under_a_status_test_are_left_alone():
+    code = ("import gurobipy as gp\n\ndef solve():\n    m = gp.Model()\n    m.optimize()\n"
+            "    if m.Status == gp.GRB.OPTIMAL:\n        return m.ObjVal\n")
+    error = traceback_of(7, "gurobipy.GurobiError: Unable to retrieve attribute 'ObjVal'")
+    assert apply_autofix(code, error) == (None, None)
+
+
+def test_constant_sum_becomes_quicksum():
+    code = ("import gurobipy as gp\n\ndef solve():\n    m = gp.Model()\n    expr = sum(c for c in [1, 2])\n"
+            "    expr.addTerms(1.0, m.addVar())\n")
+    fixed, rule = apply_autofix(code, traceback_of(6, "AttributeError: 'int' object has no attribute 'addTerms'"))
+    assert rule == "constant_sum"
+    assert "    expr = gp.quicksum(c for c in [1, 2])\n" in fixed
+
+
+def test_addvars_nested_index_becomes_a_tuple_index():
+    code = ("import gurobipy as gp\n\ndef solve():\n    m = gp.Model()\n    x = m.addVars(2, 3)\n"
+            "    m.addConstr(x[0][1] + x[1, 2] <= 1)\n")
+    fixed, rule = apply_autofix(code, traceback_of(6, "KeyError: 0"))
+    assert rule == "addvars_index"
+    assert "    m.addConstr(x[0, 1] + x[1, 2] <= 1)\n" in fixed
+
+
+def test_code_that_does_not_parse_is_not_touched():
+    assert apply_autofix("def solve(:\n", traceback_of(1, "NameError: name 'np' is not defined")) == (None, None)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (12.5, True), (3, True), ((7.0, {"x": 1}), True), ([2.0], True),
+    (None, False), (True, False), ("Error: no optimal solution, model Status 3", False), ((), False),
+])
+def test_is_objective_value(value, expected):
+    assert is_objective_value(value) is expected
@@ -0,0 +1,98 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache
+from cache import DirectoryCacheBackend, ResponseCache, SQLiteCacheBackend, make_cache_key
+
+
+@pytest.fixture(params=["sqlite", "directory"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteCacheBackend(str(tmp_path / "cache.sqlite"))
+    return DirectoryCacheBackend(str(tmp_path / "cache"))
+
+
+def test_cache_key_is_stable_and_content_addressed():
+    messages = [{"role": "user", "content": "solve"}]
+    assert make_cache_key("link_ai", "gpt-4.1-nano", 0.0, messages) == \
+        make_cache_key("link_ai", "gpt-4.1-nano", 0.0, [{"content": "solve", "role": "user"}])
+    assert make_cache_key("link_ai", "gpt-4.1-nano", 0.0, messages) != \
+        make_cache_key("link_ai", "gpt-4.1-nano", 0.5, messages)
+
+
+def test_on_mode_reads_and_writes(backend):
+    response_cache = ResponseCache(backend, mode="on")
+    assert response_cache.get("key") is None
+    response_cache.put("key", {"response": "cached"})
+    assert response_cache.get("key") == {"response": "cached"}
+    stats = response_cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["stores"], stats["hit_rate"]) == (1, 1, 1, 0.5)
+
+
+def test_refresh_mode_ignores_and_overwrites_entries(backend):
+    ResponseCache(backend, mode="on").put("key", {"response": "old"})
+    refresh = ResponseCache(backend, mode="refresh")
+    assert refresh.get("key") is None
+    refresh.put("key", {"response": "new"})
+    assert ResponseCache(backend, mode="on").get("key") == {"response": "new"}
+
+
+def test_off_mode_bypasses_the_backend(backend):
+    ResponseCache(backend, mode="on").put("key", {"response": "stored"})
+    off = ResponseCache(backend, mode="off")
+    assert not off.enabled
+    off.put("other", {"response": "dropped"})
+    assert off.get("key") is None
+    assert backend.get("other") is None
+
+
+def test_unknown_mode_is_rejected(backend):
+    with pytest.raises(ValueError):
+        ResponseCache(backend, mode="sometimes")
+
+
+def test_ttl_evicts_entries_by_creation_time(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    response_cache = ResponseCache(SQLiteCacheBackend(str(tmp_path / "cache.sqlite")), ttl_days=1)
+    response_cache.put("old", {"response": "old"})
+    now[0] += 12 * 3600
+    response_cache.put("new", {"response": "new"})
+    now[0] += 13 * 3600
+    # Reading an entry does not extend its lifetime
+    assert response_cache.get("old") is not None
+    assert response_cache.evict() == 1
+    assert response_cache.get("old") is None
+    assert response_cache.get("new") == {"response": "new"}
+
+
+def test_size_limit_evicts_least_recently_used_first(backend, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    response_cache = ResponseCache(backend)
+    for key in ("a", "b", "c"):
+        response_cache.put(key, {"response": key * 100})
+        if isinstance(backend, DirectoryCacheBackend):
+            os.utime(backend._path(key), (now[0], now[0]))
+        now[0] += 1
+    # "a" becomes the most recently used entry
+    response_cache.get("a")
+    if isinstance(backend, DirectoryCacheBackend):
+        os.utime(backend._path("a"), (now[0], now[0]))
+    entry_size = backend.size() // 3
+    response_cache.max_size_bytes = entry_size * 2
+    assert response_cache.evict() == 1
+    assert backend.get("b") is None
+    assert backend.get("a") is not None and backend.get("c") is not None
+
+
+def test_from_config_builds_the_configured_backend(tmp_path):
+    response_cache = ResponseCache.from_config({"backend": "directory", "path": str(tmp_path / "shared")})
+    assert isinstance(response_cache.backend, DirectoryCacheBackend)
+    assert ResponseCache.from_config({"path": str(tmp_path / "cache.sqlite")}, mode="off").backend is None
+    with pytest.raises(ValueError):
+        ResponseCache.from_config({"backend": "redis", "path": str(tmp_path / "redis")})
@@ -0,0 +1,113 @@
+import argparse
+import io
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from rich.console import Console
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from distributed import Coordinator
+
+
+class FakeJob:
+    """A job of "model" then "solve" tasks per key, recording the results it is given."""
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.total = len(keys)
+        self.dataset = SimpleNamespace(dataset_name="toy")
+        self.results = []
+
+    def initial_tasks(self):
+        return [("model", key) for key in self.keys]
+
+    def task_payload(self, stage, key):
+        return {"value": {}}
+
+    def on_result(self, stage, key, result, seconds):
+        self.results.append((stage, key, result))
+        return [("solve", key)] if stage == "model" else []
+
+
+def coordinator_for(keys, **kwargs):
+    job = FakeJob(keys)
+    coordinator = Coordinator(argparse.Namespace(), [job], console=Console(file=io.StringIO()), **kwargs)
+    return coordinator, job
+
+
+def lease(coordinator, worker="w1"):
+    return coordinator.handle({"op": "lease", "worker": worker}, set())
+
+
+def result(lease_id, files=None):
+    return {"op": "result", "lease": lease_id, "result": {"files": files or {}}, "seconds": 1.0}
+
+
+def test_follow_up_tasks_go_to_the_front_of_the_queue():
+    coordinator, job = coordinator_for(["prob_1", "prob_2"])
+    first = lease(coordinator)["task"]
+    assert (first["stage"], first["key"]) == ("model", "prob_1")
+    assert coordinator.handle(result(first["lease"], {"prob_1.py": "code"}), set()) == {"ok": True}
+    second = lease(coordinator)["task"]
+    assert (second["stage"], second["key"]) == ("solve", "prob_1")
+    assert lease(coordinator)["task"]["key"] == "prob_2"
+    # Everything is leased: workers wait until the run is done
+    assert lease(coordinator) == {"wait": 1.0}
+
+
+def test_expired_lease_is_requeued_and_its_late_result_still_counts_once():
+    coordinator, job = coordinator_for(["prob_1"], lease_timeout=0.1)
+    lost = lease(coordinator, "w1")["task"]["lease"]
+    expirer = threading.Thread(target=coordinator.expire_leases, daemon=True)
+    expirer.start()
+    deadline = time.time() + 5
+    while coordinator.stats["requeued"] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert coordinator.stats["requeued"] == 1
+
+    retry = lease(coordinator, "w2")["task"]
+    assert (retry["stage"], retry["key"]) == ("model", "prob_1")
+    # The first worker finishes after all: its result is taken, the retry's is a duplicate
+    assert coordinator.handle(result(lost), set()) == {"ok": True}
+    assert coordinator.handle(result(retry["lease"]), set()) == {"ok": False}
+    assert coordinator.stats["duplicates"] == 1
+    assert [stage for stage, _, _ in job.results] == ["model"]
+
+    solve = lease(coordinator)["task"]
+    assert coordinator.handle(result(solve["lease"]), set()) == {"ok": True}
+    assert coordinator.done
+    expirer.join(timeout=5)
+    assert not expirer.is_alive()
+
+
+def test_heartbeat_renews_only_a_held_lease():
+    coordinator, _ = coordinator_for(["prob_1"], lease_timeout=60.0)
+    lease_id = lease(coordinator)["task"]["lease"]
+    assert coordinator.handle({"op": "heartbeat", "lease": lease_id}, set()) == {"ok": True}
+    coordinator.requeue([lease_id], "worker disconnected")
+    assert coordinator.handle({"op": "heartbeat", "lease": lease_id}, set()) == {"ok": False}
+
+
+def test_task_lost_max_attempts_times_is_recorded_as_an_error():
+    coordinator, job = coordinator_for(["prob_1"], max_attempts=2)
+    for _ in range(2):
+        coordinator.requeue([lease(coordinator)["task"]["lease"]], "worker disconnected")
+    assert job.results == [("model", "prob_1", {"error": "Task lost 2 times (worker disconnected)"})]
+    assert (coordinator.stats["requeued"], coordinator.stats["failed"]) == (1, 1)
+    # The error still moves the problem on to its solve stage
+    assert lease(coordinator)["task"]["stage"] == "solve"
+
+
+@pytest.mark.parametrize("files", [{"prob_2.py": "code"}, {"../prob_1.py": "code"}, {"prob_1.py": 3}])
+def test_result_with_unexpected_files_is_rejected_and_requeued(files):
+    coordinator, job = coordinator_for(["prob_1"])
+    lease_id = lease(coordinator)["task"]["lease"]
+    assert coordinator.handle(result(lease_id, files), set()) == {"ok": False}
+    assert job.results == []
+    assert (coordinator.stats["rejected"], coordinator.stats["requeued"]) == (1, 1)
+    assert lease(coordinator)["task"]["key"] == "prob_1"
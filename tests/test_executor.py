@@ -0,0 +1,249 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import executor
+from cache import ResponseCache, SQLiteCacheBackend
+from executor import CoreBudget, code_fingerprint, execution_cache_key, uses_explicit_env
+
+PROGRAMS = {
+    "value": "def solve():\n    return 42.5\n",
+    "exception": "def solve():\n    raise ValueError('Model is infeasible')\n",
+    "no_function": "x = 1\n",
+    "sleep": "import time\n\ndef solve():\n    time.sleep(60)\n",
+    "crash": "import os\n\ndef solve():\n    os._exit(3)\n",
+    "memory": "def solve():\n    return len(bytearray(2 * 1024 ** 3))\n",
+    "pid": "import os\n\ndef solve():\n    return os.getpid()\n",
+}
+
+
+@pytest.fixture
+def program(tmp_path):
+    def write(name):
+        path = tmp_path / f"{name}.py"
+        path.write_text(PROGRAMS[name], encoding="utf-8")
+        return str(path)
+    return write
+
+
+@pytest.mark.parametrize("name, error_kind", [("value", None), ("exception", "exception"),
+                                              ("no_function", "no_function")])
+def test_one_shot_execution_reports_value_or_error(program, name, error_kind):
+    result = executor._execute_once(program(name), 30, None, "name")
+    assert result.error_kind == error_kind
+    if name == "value":
+        assert result.value == 42.5
+    if name == "exception":
+        assert result.exception_type == "ValueError"
+        assert "Model is infeasible" in result.traceback and "line 2" in result.traceback
+
+
+def test_one_shot_execution_is_killed_on_timeout(program):
+    start = time.perf_counter()
+    result = executor._execute_once(program("sleep"), 1, None, "name")
+    assert result.error_kind == "timeout"
+    assert time.perf_counter() - start < 10
+    assert result.output.startswith("Error: Execution timed out after 1 seconds")
+
+
+def test_one_shot_crash_is_reported(program):
+    result = executor._execute_once(program("crash"), 30, None, "name")
+    assert result.error_kind == "crash"
+    assert result.error.startswith("Execution process exited with code 3")
+
+
+def test_one_shot_memory_limit_is_enforced(program):
+    result = executor._execute_once(program("memory"), 30, 512, "name")
+    assert result.error_kind == "memory"
+    assert result.error.startswith("Out of memory (limit 512 MB)")
+
+EXPLICIT_ENV_CODE = ("import gurobipy as gp\n"
+                     "\n"
+                     "def solve():\n"
+                     "    with gp.Env() as env, gp.Model(env=env) as m:\n"
+                     "        m.optimize()\n"
+                     "        return m.ObjVal\n")
+
+
+@pytest.fixture
+def pool():
+    execution_pool = executor.ExecutionPool(size=1, max_tasks_per_worker=3)
+    yield execution_pool
+    execution_pool.close()
+
+
+def test_pool_reuses_its_worker(pool, program):
+    pids = {pool.execute(program("pid"), 30).value for _ in range(3)}
+    assert len(pids) == 1
+    assert pool.execute(program("value"), 30).value == 42.5
+    assert pool.get_stats() == {"tasks": 4, "spawned": 2, "recycled": {"max_tasks": 1}}
+
+
+@pytest.mark.parametrize("name, timeout, reason", [("sleep", 1, "timeout"), ("crash", 30, "crash")])
+def test_pool_replaces_a_worker_after_a_timeout_or_crash(pool, program, name, timeout, reason):
+    first_pid = pool.execute(program("pid"), 30).value
+    result = pool.execute(program(name), timeout)
+    assert result.error_kind == reason
+    assert pool.get_stats()["recycled"] == {reason: 1}
+    second_pid = pool.execute(program("pid"), 30).value
+    assert second_pid != first_pid
+
+
+def test_cancel_kills_a_running_execution(pool, program):
+    cancel = threading.Event()
+    threading.Timer(0.5, cancel.set).start()
+    start = time.perf_counter()
+    result = pool.execute(program("sleep"), 60, cancel=cancel)
+    assert result.error_kind == "cancelled"
+    assert time.perf_counter() - start < 5
+    assert pool.execute(program("value"), 30).value == 42.5
+
+
+@pytest.mark.parametrize("problem, threads", [
+    (None, 1),
+    ({"problem_size": "Small"}, 1),
+    ({"problem_size": "Large"}, 4),
+    ({"problem_size": "Small", "details": {"nonzeros_num": 20000}}, 4),
+    ({"problem_size": "Medium", "details": {"variables_num": 60000}}, 8),
+])
+def test_threads_follow_problem_size(problem, threads):
+    assert CoreBudget(cores=16).threads_for(problem) == threads
+
+
+def test_threads_are_capped_at_the_cores():
+    assert CoreBudget(cores=2).threads_for({"problem_size": "Large", "details": {"nonzeros_num": 10 ** 7}}) == 2
+    assert CoreBudget(cores=2).acquire(8) == 2
+
+
+@pytest.mark.parametrize("code, explicit", [
+    (EXPLICIT_ENV_CODE, True),
+    ("import gurobipy as gp\n\ndef solve(env):\n    return gp.read('model.lp', env=env)\n", True),
+    ("import gurobipy as gp\n\ndef solve():\n    return gp.Model('m')\n", False),
+    ("def solve():\n    return dict(env=1)\n", False),
+    ("def solve(:\n", False),
+])
+def test_explicit_env_detection(code, explicit):
+    assert uses_explicit_env(code) is explicit
+
+
+def test_explicit_env_reserves_every_core():
+    budget = CoreBudget(cores=4)
+    threads = budget.threads_for({"problem_size": "Small"}, EXPLICIT_ENV_CODE)
+    assert threads == 4
+    assert budget.stats["explicit_env"] == 1
+
+    one = budget.acquire(1)
+    granted = []
+    waiter = threading.Thread(target=lambda: granted.append(budget.acquire(threads)))
+    waiter.start()
+    time.sleep(0.1)
+    # Waits for the running solve although three cores are free
+    assert not granted
+    budget.release(one)
+    waiter.join(timeout=5)
+    assert granted == [4]
+    assert budget.free == 0
+    budget.release(4)
+
+
+def test_full_budget_request_is_not_starved_by_later_small_ones():
+    budget = CoreBudget(cores=2)
+    running = budget.acquire(1)
+    order = []
+
+    def acquire(threads, name):
+        budget.acquire(threads)
+        order.append(name)
+        budget.release(threads)
+
+    full = threading.Thread(target=acquire, args=(2, "full"))
+    full.start()
+    time.sleep(0.1)
+    # A free core exists, but the solve waiting for both cores came first
+    small = threading.Thread(target=acquire, args=(1, "small"))
+    small.start()
+    time.sleep(0.1)
+    assert order == []
+    budget.release(running)
+    full.join(timeout=5)
+    small.join(timeout=5)
+    assert order == ["full", "small"]
+
+
+def test_cancel_while_waiting_lets_the_next_request_through():
+    budget = CoreBudget(cores=1)
+    running = budget.acquire(1)
+    cancel = threading.Event()
+    results = []
+    cancelled = threading.Thread(target=lambda: results.append(("cancelled", budget.acquire(1, cancel))))
+    cancelled.start()
+    time.sleep(0.05)
+    later = threading.Thread(target=lambda: results.append(("later", budget.acquire(1))))
+    later.start()
+    cancel.set()
+    cancelled.join(timeout=5)
+    budget.release(running)
+    later.join(timeout=5)
+    assert results == [("cancelled", 0), ("later", 1)]
+
+
+def test_fingerprint_ignores_comments_whitespace_and_docstrings():
+    code = "def solve():\n    return 1 + 2\n"
+    reformatted = ('def solve():\n    """Objective."""\n    # the sum\n    return (1 +\n            2)\n')
+    assert code_fingerprint(code) == code_fingerprint(reformatted)
+    assert code_fingerprint(code) != code_fingerprint("def solve():\n    return 1 + 3\n")
+    assert code_fingerprint("def solve(:\n") != code_fingerprint("def solve( :\n")
+
+
+def test_cache_key_depends_on_function_order_and_threads():
+    code = PROGRAMS["value"]
+    key = execution_cache_key(code, "name", 1)
+    assert key == execution_cache_key("# comment\n" + code, "name", 1)
+    assert key != execution_cache_key(code, "definition", 1)
+    assert key != execution_cache_key(code, "name", 2)
+
+
+@pytest.fixture
+def execution_cache(tmp_path, monkeypatch):
+    cache = ResponseCache(SQLiteCacheBackend(str(tmp_path / "execution_cache.sqlite")))
+    monkeypatch.setattr(executor, "_execution_cache", cache)
+    return cache
+
+
+def test_reformatted_code_reuses_the_cached_result(execution_cache, tmp_path):
+    first = tmp_path / "first.py"
+    first.write_text("import os\n\ndef solve():\n    return os.getpid()\n", encoding="utf-8")
+    second = tmp_path / "second.py"
+    second.write_text("import os\n\n\ndef solve():\n    # the worker's pid\n    return os.getpid()\n",
+                      encoding="utf-8")
+    result = executor.execute_file(str(first), timeout=30)
+    cached = executor.execute_file(str(second), timeout=30)
+    assert cached.cached and cached.value == result.value
+
+
+def test_exception_tracebacks_are_only_reused_for_the_same_source(execution_cache, tmp_path):
+    code_file = tmp_path / "exception.py"
+    code_file.write_text(PROGRAMS["exception"], encoding="utf-8")
+    assert not executor.execute_file(str(code_file), timeout=30).cached
+    assert executor.execute_file(str(code_file), timeout=30).cached
+    # Same syntax tree, but the traceback would quote other line numbers
+    code_file.write_text("\n\n" + PROGRAMS["exception"], encoding="utf-8")
+    result = executor.execute_file(str(code_file), timeout=30)
+    assert not result.cached and "line 4" in result.traceback
+
+
+@pytest.mark.parametrize("code, timeout", [
+    (PROGRAMS["sleep"], 1),
+    ("class GurobiError(Exception):\n    pass\n\n"
+     "def solve():\n    raise GurobiError('No Gurobi license found')\n", 30),
+])
+def test_environment_dependent_outcomes_are_not_cached(execution_cache, tmp_path, code, timeout):
+    code_file = tmp_path / "program.py"
+    code_file.write_text(code, encoding="utf-8")
+    executor.execute_file(str(code_file), timeout=timeout)
+    assert execution_cache.get_stats()["stores"] == 0
@@ -0,0 +1,102 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ResponseCache, SQLiteCacheBackend
+from fix_index import MAX_FIXES_PER_SIGNATURE, FixIndex, error_signature
+
+
+def traceback_of(line: int, error: str) -> str:
+    return ("Traceback (most recent call last):\n"
+            f'  File "/tmp/run/temp_module.py", line {line}, in solve\n'
+            "    ...\n"
+            f"{error}")
+
+
+BROKEN = ("import gurobipy as gp\n"
+          "\n"
+          "def solve(cap=[3, 4]):\n"
+          "    m = gp.Model()\n"
+          "    x = m.addVars(2, 2)\n"
+          "    m.addConstr(x[0][1] <= cap[0])\n")
+FIXED = BROKEN.replace("x[0][1] <= cap[0]", "x[0, 1] <= cap[0]")
+ERROR = traceback_of(6, "KeyError: 0")
+
+# Another program with the same mistake under other names
+OTHER = ("import gurobipy as gp\n"
+         "\n"
+         "def solve(limit=[5, 6]):\n"
+         "    model = gp.Model()\n"
+         "    y = model.addVars(3, 3)\n"
+         "    model.addConstr(y[2][1] <= limit[1])\n")
+OTHER_ERROR = traceback_of(6, "KeyError: 2")
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteCacheBackend(str(tmp_path / "fix_index.sqlite"))
+
+
+def test_signature_abstracts_names_numbers_and_strings():
+    assert error_signature(ERROR, BROKEN) == error_signature(OTHER_ERROR, OTHER)
+    assert error_signature(ERROR, BROKEN) == "KeyError: _ | _ . addConstr ( _ [ _ ] [ _ ] <= _ [ _ ] )"
+    assert error_signature("Error: Execution timed out after 300 seconds.", BROKEN) is None
+
+
+def test_recorded_fix_is_found_for_the_same_kind_of_error(backend):
+    index = FixIndex(ResponseCache(backend))
+    assert index.lookup(error_signature(OTHER_ERROR, OTHER)) == []
+    index.record(ERROR, BROKEN, FIXED)
+    index.record(ERROR, BROKEN, FIXED)
+    fixes = index.lookup(error_signature(OTHER_ERROR, OTHER))
+    assert len(fixes) == 1
+    assert "+    m.addConstr(x[0, 1] <= cap[0])" in FixIndex.hint(fixes)
+    assert index.get_stats()["recorded"] == 1
+
+
+def test_line_patch_is_replayed_with_the_other_program_names(backend):
+    index = FixIndex(ResponseCache(backend))
+    index.record(ERROR, BROKEN, FIXED)
+    fix = index.lookup(error_signature(OTHER_ERROR, OTHER))[0]
+    assert FixIndex.apply_patch(fix, OTHER, OTHER_ERROR) == OTHER.replace("y[2][1] <= limit[1]", "y[2, 1] <= limit[1]")
+
+
+def test_patch_is_not_applied_to_a_line_of_another_shape(backend):
+    index = FixIndex(ResponseCache(backend))
+    index.record(ERROR, BROKEN, FIXED)
+    fix = index.lookup(error_signature(ERROR, BROKEN))[0]
+    other_shape = OTHER.replace("y[2][1] <= limit[1]", "y[2][1] + y[1][1] <= limit[1]")
+    assert FixIndex.apply_patch(fix, other_shape, OTHER_ERROR) is None
+
+
+def test_fix_changing_several_lines_is_kept_as_a_hint_only(backend):
+    index = FixIndex(ResponseCache(backend))
+    fixed = FIXED.replace("x = m.addVars(2, 2)", "x = m.addVars(2, 2, name='x')")
+    index.record(ERROR, BROKEN, fixed)
+    fix = index.lookup(error_signature(ERROR, BROKEN))[0]
+    assert fix["patch"] is None
+    assert FixIndex.apply_patch(fix, OTHER, OTHER_ERROR) is None
+    assert FixIndex.hint([fix]) is not None
+
+
+def test_used_fixes_come_first_and_old_ones_are_dropped(backend):
+    index = FixIndex(ResponseCache(backend))
+    for bound in range(MAX_FIXES_PER_SIGNATURE + 1):
+        index.record(ERROR, BROKEN, FIXED.replace("cap[0])", f"cap[0] + {bound})"))
+    signature = error_signature(ERROR, BROKEN)
+    fixes = index.lookup(signature)
+    assert len(fixes) == MAX_FIXES_PER_SIGNATURE
+    assert all("cap[0] + 0)" not in fix["diff"] for fix in fixes)
+    index.mark_used(signature, fixes[-1], "patched")
+    assert index.lookup(signature)[0]["diff"] == fixes[-1]["diff"]
+
+
+def test_refresh_mode_adds_to_the_stored_fixes_without_reusing_them(backend):
+    FixIndex(ResponseCache(backend)).record(ERROR, BROKEN, FIXED)
+    refresh = FixIndex(ResponseCache(backend, mode="refresh"))
+    assert refresh.lookup(error_signature(ERROR, BROKEN)) == []
+    refresh.record(ERROR, BROKEN, FIXED.replace("cap[0])", "cap[0] + 1)"))
+    assert len(FixIndex(ResponseCache(backend)).lookup(error_signature(ERROR, BROKEN))) == 2
@@ -0,0 +1,60 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grid import cell_args, cell_key, expand_cells, schedule_waves
+
+
+def test_cells_combine_the_grid_then_the_explicit_cells_over_base():
+    spec = {"base": {"item_num": 5, "temperature": 0.0},
+            "grid": {"round_mark": [0, 1], "mode": ["formalized", "wo_understanding"]},
+            "cells": [{"temperature": 0.7}]}
+    cells = expand_cells(spec)
+    assert [(cell["round_mark"], cell["mode"]) for cell in cells[:4]] == [
+        (0, "formalized"), (0, "wo_understanding"), (1, "formalized"), (1, "wo_understanding")]
+    assert cells[4] == {"item_num": 5, "temperature": 0.7}
+    assert all(cell["item_num"] == 5 for cell in cells)
+    assert expand_cells({"base": {"item_num": 5}}) == [{"item_num": 5}]
+
+
+def test_process_wide_options_cannot_vary_between_cells():
+    assert len(expand_cells({"base": {"llm_cache": "off"}, "grid": {"round_mark": [0, 1]}})) == 2
+    with pytest.raises(ValueError, match="--llm_cache applies to the whole grid"):
+        expand_cells({"grid": {"llm_cache": ["on", "off"]}})
+    with pytest.raises(ValueError, match="--schedule applies to the whole grid"):
+        expand_cells({"cells": [{"schedule": "dataset"}, {}]})
+
+
+def test_cell_args_override_the_parser_defaults():
+    args = cell_args({"dataset_name": "nlp4lp", "shard": "2/4", "temperature": 0.3})
+    assert (args.dataset_name, args.shard, args.temperature) == (["nlp4lp"], (2, 4), 0.3)
+    assert args.item_num == 300
+    with pytest.raises(ValueError, match="Unknown option"):
+        cell_args({"temprature": 0.3})
+    with pytest.raises(ValueError, match="Invalid value for dataset_name"):
+        cell_args({"dataset_name": ["nlp4lp", "mystery"]})
+
+
+def test_temperature_zero_rounds_share_a_cell_key():
+    assert cell_key(cell_args({"round_mark": 0})) == cell_key(cell_args({"round_mark": 1}))
+    # Sampled runs and sampled debug candidates differ between rounds
+    assert cell_key(cell_args({"round_mark": 0, "temperature": 0.7})) != cell_key(
+        cell_args({"round_mark": 1, "temperature": 0.7}))
+    assert cell_key(cell_args({"round_mark": 0, "debug_candidates": 3})) != cell_key(
+        cell_args({"round_mark": 1, "debug_candidates": 3}))
+
+
+def test_speed_options_do_not_change_the_cell_key():
+    assert cell_key(cell_args({"concurrency": 8, "exec_workers": 4})) == cell_key(cell_args({}))
+    assert cell_key(cell_args({"debug_max_try": 5})) != cell_key(cell_args({}))
+
+
+def test_jobs_writing_the_same_folder_run_in_separate_waves():
+    jobs = [SimpleNamespace(name=name, result_paths=paths) for name, paths in
+            (("a", ["r/a"]), ("b", ["r/b"]), ("a_again", ["r/a"]), ("c", ["r/c", "r/a"]))]
+    waves = schedule_waves(jobs)
+    assert [[job.name for job in wave] for wave in waves] == [["a", "b"], ["a_again"], ["c"]]
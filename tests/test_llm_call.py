@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_call
+from llm_call import LLMStatsWindow, diff_llm_stats
+from retry import RetryStats
+
+
+def test_diff_llm_stats_subtracts_counters_and_recomputes_ratios():
+    before = {"cache": {"hits": 2, "misses": 2, "hit_rate": 0.5, "mode": "on"},
+              "connection": {"link_ai": {"requests": 4, "new_connections": 1, "connect_time_total": 0.5,
+                                         "connect_time_avg": 0.5, "last_connect_time": 0.5}}}
+    after = {"cache": {"hits": 5, "misses": 3, "hit_rate": 0.625, "mode": "on"},
+             "connection": {"link_ai": {"requests": 10, "new_connections": 3, "connect_time_total": 1.5,
+                                        "connect_time_avg": 0.5, "last_connect_time": 0.7}},
+             "retry": {"qwen": {"calls": 1, "errors": {"http_429": 1}}}}
+    assert diff_llm_stats(after, before) == {
+        "cache": {"hits": 3, "misses": 1, "hit_rate": 0.75, "mode": "on"},
+        "connection": {"link_ai": {"requests": 6, "new_connections": 2, "connect_time_total": 1.0,
+                                   "connect_time_avg": 0.5, "last_connect_time": 0.7}},
+        "retry": {"qwen": {"calls": 1, "errors": {"http_429": 1}}},
+    }
+
+
+def test_stats_window_counts_only_its_own_run(monkeypatch):
+    monkeypatch.setattr(llm_call, "retry_stats", llm_call.collections.defaultdict(RetryStats))
+    llm_call.retry_stats["link_ai"].calls = 5
+    first = LLMStatsWindow()
+    llm_call.retry_stats["link_ai"].calls += 2
+    assert first.stats()["retry"]["link_ai"]["calls"] == 2
+    assert "concurrent_runs" not in first.stats()
+    first.close()
+
+    second = LLMStatsWindow()
+    third = LLMStatsWindow()
+    assert second.stats()["concurrent_runs"] and third.stats()["concurrent_runs"]
+    second.close()
+    third.close()
+    plan = LLMStatsWindow(spanning=True)
+    fourth = LLMStatsWindow()
+    assert "concurrent_runs" not in fourth.stats()
+    fourth.close()
+    plan.close()
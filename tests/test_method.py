@@ -0,0 +1,108 @@
+import concurrent.futures
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import executor
+import llm_call
+import method
+from cache import ResponseCache, SQLiteCacheBackend
+
+
+@pytest.fixture
+def fake_provider(tmp_path, monkeypatch):
+    """Route gpt-* calls to a fake provider whose n-th call returns a program returning n."""
+    calls = []
+    lock = threading.Lock()
+
+    async def fake_call(text=None, temperature=0.0, llm_model="gpt-4.1-nano", messages=None):
+        with lock:
+            calls.append(text)
+            number = len(calls)
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        return f"```python\ndef solve():\n    return {number}\n```", usage
+
+    monkeypatch.setitem(llm_call.ASYNC_PROVIDER_CALLS, "link_ai", fake_call)
+    cache = ResponseCache(SQLiteCacheBackend(str(tmp_path / "llm_cache.sqlite")), mode="on")
+    monkeypatch.setattr(llm_call, "llm_cache", cache)
+    # The programs are told apart by their source; running them is not needed here
+    monkeypatch.setattr(method, "execute_samples", lambda codes, problem=None: list(codes))
+    return calls
+
+
+def test_self_consistency_draws_are_independent_with_the_cache_on(fake_provider):
+    _, responses, tokens = method.self_consistency_vote("nlp", num=4, temperature=0.0)
+    assert len(fake_provider) == 4
+    assert len(set(responses[:4])) == 4
+    assert tokens.samples == 4
+
+    # A repeated run is served from the cache sample by sample
+    _, cached_responses, _ = method.self_consistency_vote("nlp", num=4, temperature=0.0)
+    assert len(fake_provider) == 4
+    assert cached_responses[:4] == responses[:4]
+
+
+def test_samples_with_the_same_syntax_tree_are_executed_once(monkeypatch):
+    executed = []
+
+    def fake_execute_code(code, problem=None):
+        executed.append(code)
+        return SimpleNamespace(output=len(executed) * 10.0)
+
+    monkeypatch.setattr(executor, "execute_code", fake_execute_code)
+    codes = ["def solve():\n    return 1\n",
+             "def solve():\n    # same model\n    return 1\n",
+             "def solve():\n    return 2\n",
+             "def solve():\n    return 1\n"]
+    results = method.execute_samples(codes)
+    assert len(executed) == 2
+    assert results[0] == results[1] == results[3]
+    assert results[2] != results[0]
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    """Make the n-th self-consistency sample return the n-th of the answers given to the fixture."""
+    queue = []
+
+    def fake_submit(task, temperature=0.0, llm_model="gpt-4.1-nano", sample=0):
+        future = concurrent.futures.Future()
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+        future.set_result((f"```python\ndef solve():\n    return {queue.pop(0)!r}\n```", usage))
+        return future
+
+    monkeypatch.setattr(method, "submit_general_call", fake_submit)
+    monkeypatch.setattr(method, "execute_samples",
+                        lambda codes, problem=None: [code.split("return ")[1].strip().strip("'") for code in codes])
+    return queue
+
+
+@pytest.mark.parametrize("sequence, drawn", [
+    # The first two samples agree
+    (["1", "1"], 2),
+    # 1 of 2 agree; two more samples could reach 70% (3 of 4)
+    (["1", "2", "1", "1"], 4),
+    # Identical errors do not count as agreement
+    (["Error: x", "Error: x", "1", "1", "1", "1"], 6),
+    # No majority before max_samples
+    (["1", "2", "3", "4", "5", "6"], 6),
+])
+def test_adaptive_sampling_stops_once_the_answers_agree(answers, sequence, drawn):
+    answers.extend(sequence)
+    _, responses, tokens = method.self_consistency_vote("nlp", adaptive=True, min_samples=2, max_samples=6,
+                                                        threshold=0.7)
+    assert tokens.samples == drawn
+    assert len(responses) == drawn + 1
+    assert tokens.total_tokens == 15 * drawn
+    assert responses[-1] == sequence[:drawn]
+
+
+def test_fixed_sampling_draws_num_samples(answers):
+    answers.extend(["1", "1", "1", "2"])
+    _, _, tokens = method.self_consistency_vote("nlp", num=4)
+    assert tokens.samples == 4
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_limiter
+from rate_limiter import ProviderRateLimiter, RateLimiterRegistry, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_reserve_is_free_within_the_budget_and_waits_beyond_it(clock):
+    bucket = TokenBucket(60, period=60.0)
+    assert bucket.reserve(59) == 0.0
+    assert bucket.reserve(1) == 0.0
+    # One token per second: the next reservations queue up behind each other
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    assert bucket.reserve(2) == pytest.approx(3.0)
+
+
+def test_bucket_refills_with_time_up_to_capacity(clock):
+    bucket = TokenBucket(60, period=60.0)
+    bucket.reserve(60)
+    clock[0] += 30
+    assert bucket.reserve(30) == 0.0
+    clock[0] += 1000
+    bucket.reserve(0)
+    assert bucket.tokens == pytest.approx(60)
+
+
+def test_request_larger_than_the_budget_is_capped(clock):
+    bucket = TokenBucket(10, period=60.0)
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.tokens == pytest.approx(0)
+
+
+def test_refund_returns_overestimated_tokens_and_debits_underestimates(clock):
+    bucket = TokenBucket(100, period=60.0)
+    bucket.reserve(80)
+    bucket.refund(30)
+    assert bucket.tokens == pytest.approx(50)
+    bucket.refund(-70)
+    assert bucket.tokens == pytest.approx(-20)
+    bucket.refund(1000)
+    assert bucket.tokens == pytest.approx(100)
+
+
+def test_settle_corrects_the_estimate_with_the_real_usage(clock):
+    limiter = ProviderRateLimiter(tpm=1000)
+    asyncio.run(limiter.acquire(400))
+    limiter.settle(400, 100)
+    assert limiter.token_bucket.tokens == pytest.approx(900)
+
+
+def test_acquire_sleeps_for_the_wait_and_counts_it(clock, monkeypatch):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake_sleep)
+    limiter = ProviderRateLimiter(rpm=2)
+    for _ in range(3):
+        asyncio.run(limiter.acquire())
+    assert slept == [pytest.approx(30.0)]
+    assert limiter.get_stats() == {"requests": 3, "waits": 1, "wait_time": pytest.approx(30.0)}
+
+
+def test_registry_shares_one_limiter_per_provider():
+    registry = RateLimiterRegistry({"api_providers": {"qwen": {"rate_limit": {"rpm": 10}}, "deepseek": {}}})
+    assert registry.get("qwen") is registry.get("qwen")
+    assert registry.get("qwen").request_bucket.capacity == 10
+    assert registry.get("deepseek").request_bucket is None
+    assert set(registry.get_stats()) == {"qwen", "deepseek"}
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import openai
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import retry
+from retry import ProviderError, RetryPolicy, RetryStats, call_with_retry, classify_error, parse_retry_after
+
+
+def status_error(status_code: int, headers=None) -> openai.APIStatusError:
+    request = httpx.Request("POST", "https://provider.test/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers or {}, request=request)
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+@pytest.mark.parametrize("exception, expected", [
+    (ProviderError("busy", status_code=429, retry_after=2.0), (True, "http_429", 2.0)),
+    (ProviderError("bad request", status_code=400), (False, "http_400", None)),
+    (ProviderError("no status"), (False, "provider_error", None)),
+    (status_error(503, {"retry-after": "7"}), (True, "http_503", 7.0)),
+    (status_error(401), (False, "http_401", None)),
+    (httpx.ReadTimeout("slow"), (True, "timeout", None)),
+    (httpx.ConnectError("refused"), (True, "connection", None)),
+    (ConnectionResetError(), (True, "connection", None)),
+    (ValueError("bug"), (False, "ValueError", None)),
+])
+def test_classify_error(exception, expected):
+    assert classify_error(exception) == expected
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= parse_retry_after(retry_at) <= 30
+
+
+def test_backoff_grows_exponentially_up_to_max_delay(monkeypatch):
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: high)
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+    assert [policy.backoff(attempt) for attempt in range(5)] == [1.0, 2.0, 4.0, 8.0, 10.0]
+
+
+def test_backoff_follows_retry_after_but_never_beyond_max_delay(monkeypatch):
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: low)
+    policy = RetryPolicy(base_delay=1.0, max_delay=60.0)
+    assert policy.backoff(0, retry_after=5.0) == 5.0
+    assert policy.backoff(0, retry_after=3600.0) == 60.0
+
+
+def run_with_retry(outcomes, policy, monkeypatch):
+    """Run call_with_retry over a call raising or returning `outcomes` in turn."""
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(retry.asyncio, "sleep", fake_sleep)
+    outcomes = list(outcomes)
+    stats = RetryStats()
+
+    async def call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    try:
+        result = asyncio.run(call_with_retry(call, policy, stats))
+    except Exception as e:
+        result = e
+    return result, stats.summary(), slept
+
+
+def test_retryable_errors_are_retried_until_success(monkeypatch):
+    result, stats, slept = run_with_retry(
+        [ProviderError("busy", 429, retry_after=3.0), httpx.ConnectError("refused"), "response"],
+        RetryPolicy(max_retries=5, base_delay=0.0, max_delay=60.0), monkeypatch)
+    assert result == "response"
+    assert slept == [3.0, 0.0]
+    assert (stats["calls"], stats["attempts"], stats["retries"], stats["succeeded_after_retry"]) == (1, 3, 2, 1)
+    assert stats["errors"] == {"http_429": 1, "connection": 1}
+
+
+def test_fatal_errors_are_raised_at_once(monkeypatch):
+    error = ProviderError("bad request", 400)
+    result, stats, slept = run_with_retry([error, "response"], RetryPolicy(), monkeypatch)
+    assert result is error
+    assert slept == []
+    assert (stats["fatal"], stats["retries"]) == (1, 0)
+
+
+def test_retries_are_bounded(monkeypatch):
+    errors = [ProviderError("busy", 503) for _ in range(3)]
+    result, stats, slept = run_with_retry(errors, RetryPolicy(max_retries=2, base_delay=0.0), monkeypatch)
+    assert result is errors[-1]
+    assert len(slept) == 2
+    assert (stats["attempts"], stats["gave_up"]) == (3, 1)
@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scheduler
+from scheduler import CostScheduler, StageTimings, static_cost
+
+ITEMS = [
+    ("prob_1", {"problem_size": "Toy", "description": "a"}),
+    ("prob_2", {"problem_size": "Large", "difficulty": "Hard", "description": "a"}),
+    ("prob_3", {"problem_size": "Small", "description": "a"}),
+    ("prob_4", {"problem_size": "Small", "description": "a"}),
+]
+
+
+@pytest.fixture
+def timings(tmp_path, monkeypatch):
+    stage_timings = StageTimings(str(tmp_path / "stage_timings.json"))
+    monkeypatch.setattr(scheduler, "_stage_timings", stage_timings)
+    return stage_timings
+
+
+def keys(items):
+    return [key for key, _ in items]
+
+
+def test_static_cost_grows_with_size_difficulty_and_nonzeros():
+    small = {"problem_size": "Small"}
+    assert static_cost({"problem_size": "Large"}) > static_cost(small)
+    assert static_cost({**small, "difficulty": "Hard"}) > static_cost(small)
+    assert static_cost({**small, "details": {"nonzeros_num": 1000}}) > static_cost(small)
+    assert static_cost({**small, "description": "x" * 4000}) == 2 * static_cost(small)
+
+
+def test_without_timings_problems_are_ordered_by_static_cost(timings):
+    ordered = CostScheduler("dataset", "solve", order="cost").order(ITEMS)
+    # Equal costs keep their dataset order
+    assert keys(ordered) == ["prob_2", "prob_3", "prob_4", "prob_1"]
+
+
+def test_measured_times_take_precedence_and_scale_the_static_costs(timings):
+    # Small problems took 100 s for a static cost of about 2: unmeasured costs are scaled by ~50
+    timings.record("dataset", "solve", "prob_1", 5000.0)
+    timings.record("dataset", "solve", "prob_3", 100.0)
+    timings.record("dataset", "solve", "prob_4", 100.0)
+    cost_scheduler = CostScheduler("dataset", "solve", order="cost")
+    assert keys(cost_scheduler.order(ITEMS)) == ["prob_1", "prob_2", "prob_3", "prob_4"]
+    scale = 100.0 / static_cost(dict(ITEMS)["prob_3"])
+    assert cost_scheduler.estimate("prob_2", dict(ITEMS)["prob_2"]) == pytest.approx(
+        static_cost(dict(ITEMS)["prob_2"]) * scale)
+
+
+def test_estimates_of_later_stages_are_added(timings):
+    timings.record("dataset", "model", "prob_1", 10.0)
+    timings.record("dataset", "model", "prob_3", 20.0)
+    timings.record("dataset", "solve", "prob_1", 50.0)
+    timings.record("dataset", "solve", "prob_3", 20.0)
+    items = [item for item in ITEMS if item[0] in ("prob_1", "prob_3")]
+    model = CostScheduler("dataset", "model", order="cost")
+    assert keys(model.order(items)) == ["prob_3", "prob_1"]
+    assert keys(model.order(items, CostScheduler("dataset", "solve"))) == ["prob_1", "prob_3"]
+
+
+def test_dataset_order_keeps_the_items_but_still_records_timings(timings):
+    cost_scheduler = CostScheduler("dataset", "solve", order="dataset")
+    assert cost_scheduler.order(ITEMS) == ITEMS
+    assert cost_scheduler.timed(lambda key: key.upper())("prob_1") == "PROB_1"
+    assert "prob_1" in timings.get("dataset", "solve")
+
+
+def test_unknown_order_is_rejected():
+    with pytest.raises(ValueError):
+        scheduler.configure_scheduler("random")
+
+
+def test_timings_are_smoothed_and_saves_keep_other_runs_entries(tmp_path):
+    path = str(tmp_path / "stage_timings.json")
+    first = StageTimings(path, smoothing=0.5)
+    second = StageTimings(path, smoothing=0.5)
+    first.record("dataset", "solve", "prob_1", 10.0)
+    first.record("dataset", "solve", "prob_1", 20.0)
+    assert first.get("dataset", "solve") == {"prob_1": 15.0}
+
+    second.record("dataset", "solve", "prob_2", 4.0)
+    first.save()
+    second.save()
+    with open(path, "r", encoding="utf-8") as f:
+        assert json.load(f) == {"dataset": {"solve": {"prob_1": 15.0, "prob_2": 4.0}}}
@@ -0,0 +1,105 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyze import comparison_summary
+from shards import assign_shards, merge_llm_stats, merge_shards, parse_shard, shard_data, shard_dir_name
+
+DATA = {f"prob_{i}": {"description": str(i)} for i in range(1, 401)}
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    for text in ("0/4", "5/4", "1/0", "two/4", "1"):
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+
+def test_shards_split_the_data_evenly_and_completely():
+    shards = [shard_data(DATA, (index, 4)) for index in range(1, 5)]
+    assert sorted(key for shard in shards for key in shard) == sorted(DATA)
+    assert all(70 <= len(shard) <= 130 for shard in shards)
+    # Each shard keeps the dataset order
+    assert all(list(shard) == [key for key in DATA if key in shard] for shard in shards)
+
+
+def test_a_problem_keeps_its_shard_whatever_else_is_selected():
+    assignment = assign_shards(DATA, 4)
+    subset = {key: DATA[key] for key in list(DATA)[::7]}
+    assert assign_shards(subset, 4) == {key: assignment[key] for key in subset}
+    assert assign_shards({"prob_1": {"other": "metadata"}}, 4) == {"prob_1": assignment["prob_1"]}
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_shard(root, shard, results, matched, llm_stats):
+    """One shard's run of the "toy" dataset: results, comparison and llm_stats."""
+    run_dir = os.path.join(root, shard_dir_name(shard), "toy", "method")
+    write_json(os.path.join(run_dir, "results.json"), {key: {"result": value} for key, value in results.items()})
+    comparison = {key: {"problem_type": "LP", "match": key in matched} for key in results}
+    comparison["__summary__"] = comparison_summary(len(matched), len(results), {"LP": {"total": len(results),
+                                                                                   "matched": len(matched)}})
+    write_json(os.path.join(run_dir, "code-gt-comparison_results.json"), comparison)
+    write_json(os.path.join(run_dir, "llm_stats.json"), llm_stats)
+    with open(os.path.join(run_dir, "prob_code.py"), "w", encoding="utf-8") as f:
+        f.write(f"# shard {shard[0]}\n")
+    return os.path.join(root, shard_dir_name(shard))
+
+
+@pytest.fixture
+def shard_dirs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_json("datasets/summary/summary_toy.json", {f"prob_{i}": {} for i in range(1, 5)})
+    first = write_shard("run", (1, 2), {"prob_3": 3, "prob_1": 1}, ["prob_1"],
+                        {"cache": {"hits": 1, "misses": 3, "hit_rate": 0.25}, "model": "m"})
+    second = write_shard("run", (2, 2), {"prob_4": 4, "prob_2": 2}, ["prob_2", "prob_4"],
+                         {"cache": {"hits": 3, "misses": 1, "hit_rate": 0.75}, "model": "m"})
+    return [first, second]
+
+
+def test_merged_results_follow_the_dataset_order(shard_dirs):
+    summaries = merge_shards(shard_dirs, "merged")
+    merged_dir = os.path.join("merged", "toy", "method")
+    assert list(read_json(os.path.join(merged_dir, "results.json"))) == ["prob_1", "prob_2", "prob_3", "prob_4"]
+
+    comparison = read_json(os.path.join(merged_dir, "code-gt-comparison_results.json"))
+    assert list(comparison) == ["prob_1", "prob_2", "prob_3", "prob_4", "__summary__"]
+    assert comparison["__summary__"] == comparison_summary(3, 4, {"LP": {"total": 4, "matched": 3}})
+    assert summaries == {os.path.join("toy", "method"): comparison["__summary__"]}
+
+    assert read_json(os.path.join(merged_dir, "llm_stats.json")) == {
+        "cache": {"hits": 4, "misses": 4, "hit_rate": 0.5}, "model": "m"}
+    # A per-problem output in both shards keeps its first copy
+    with open(os.path.join(merged_dir, "prob_code.py"), "r", encoding="utf-8") as f:
+        assert f.read() == "# shard 1\n"
+
+
+def test_merge_llm_stats_keeps_the_largest_last_value():
+    assert merge_llm_stats([{"calls": 2, "last_status": 200}, {"calls": 3, "last_status": 429}]) == {
+        "calls": 5, "last_status": 429}
+
+
+def test_shards_of_different_splits_or_repeated_shards_are_rejected(shard_dirs):
+    other_split = write_shard("run", (1, 3), {"prob_1": 1}, [], {})
+    with pytest.raises(ValueError, match="different numbers of shards"):
+        merge_shards(shard_dirs + [other_split], "merged")
+    with pytest.raises(ValueError, match="more than once"):
+        merge_shards(shard_dirs + [shard_dirs[0]], "merged")
+
+
+def test_missing_shards_are_reported(shard_dirs, capsys):
+    merge_shards(shard_dirs[:1], "merged")
+    assert "Missing shards: 2" in capsys.readouterr().out
@@ -0,0 +1,125 @@
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import CompletionManifest, ResultJournal, apply_code_patch, error_window, journal_path, load_results
+
+
+def test_journal_results_are_readable_before_compaction(tmp_path):
+    results_file = str(tmp_path / "results.json")
+    journal = ResultJournal(results_file)
+    journal.append("prob_2", {"result": 2})
+    journal.append("prob_1", {"result": 1})
+    journal.append("prob_2", {"result": 22})
+    assert not os.path.exists(results_file)
+    assert load_results(results_file) == {"prob_2": {"result": 22}, "prob_1": {"result": 1}}
+    journal.close()
+
+
+def test_compact_folds_the_journal_into_results_in_dataset_order(tmp_path):
+    results_file = str(tmp_path / "results.json")
+    with open(results_file, "w", encoding="utf-8") as f:
+        json.dump({"prob_1": {"result": "old"}, "prob_3": {"result": 3}}, f)
+    journal = ResultJournal(results_file)
+    journal.update({"extra": {"result": 0}, "prob_2": {"result": 2}, "prob_1": {"result": 1}})
+
+    results = journal.compact(key_rank={"prob_1": 0, "prob_2": 1, "prob_3": 2})
+    assert list(results) == ["prob_1", "prob_2", "prob_3", "extra"]
+    assert results["prob_1"] == {"result": 1}
+    assert not os.path.exists(journal_path(results_file))
+    with open(results_file, "r", encoding="utf-8") as f:
+        assert json.load(f) == results
+
+
+def test_truncated_journal_line_is_skipped_and_the_next_append_starts_a_new_line(tmp_path):
+    results_file = str(tmp_path / "results.json")
+    with open(journal_path(results_file), "w", encoding="utf-8") as f:
+        f.write(json.dumps({"key": "prob_1", "value": 1}) + "\n" + '{"key": "prob_2", "va')
+    assert load_results(results_file) == {"prob_1": 1}
+
+    journal = ResultJournal(results_file)
+    journal.append("prob_3", 3)
+    journal.close()
+    assert load_results(results_file) == {"prob_1": 1, "prob_3": 3}
+
+
+def test_manifest_entry_needs_its_outputs(tmp_path):
+    (tmp_path / "prob_1.py").write_text("def solve():\n    return 1\n", encoding="utf-8")
+    manifest = CompletionManifest(str(tmp_path))
+    manifest.mark_complete("model", "prob_1", ["prob_1.py"])
+    assert manifest.is_complete("model", "prob_1")
+    assert not manifest.is_complete("solve", "prob_1")
+
+    # Entries survive a restart, but not the loss or truncation of an output
+    assert CompletionManifest(str(tmp_path)).is_complete("model", "prob_1")
+    (tmp_path / "prob_1.py").write_text("", encoding="utf-8")
+    assert not CompletionManifest(str(tmp_path)).is_complete("model", "prob_1")
+    os.remove(tmp_path / "prob_1.py")
+    assert not CompletionManifest(str(tmp_path)).is_complete("model", "prob_1")
+
+
+def test_manifest_entry_goes_stale_when_an_input_changes(tmp_path):
+    code_file = tmp_path / "prob_1.py"
+    code_file.write_text("def solve():\n    return 1\n", encoding="utf-8")
+    manifest = CompletionManifest(str(tmp_path))
+    manifest.mark_complete("execution", "prob_1", [], inputs=[str(code_file)])
+    assert manifest.is_complete("execution", "prob_1")
+
+    code_file.write_text("def solve():\n    return 2\n", encoding="utf-8")
+    os.utime(code_file, (time.time() + 5, time.time() + 5))
+    assert not CompletionManifest(str(tmp_path)).is_complete("execution", "prob_1")
+
+
+def test_manifest_entry_needs_an_error_free_result_when_results_are_given(tmp_path):
+    manifest = CompletionManifest(str(tmp_path))
+    manifest.mark_complete("solve", "prob_1", [])
+    assert manifest.is_complete("solve", "prob_1", {"prob_1": {"result": 1}})
+    assert not manifest.is_complete("solve", "prob_1", {})
+    assert not manifest.is_complete("solve", "prob_1", {"prob_1": {"error": "timeout"}})
+
+
+PATCHED_CODE = ("def solve(cap=3):\n"
+                "    x = cap\n"
+                "    return x\n")
+
+
+def patch_response(*blocks):
+    return "\n".join(f"<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE" for search, replace in blocks)
+
+
+def test_patch_blocks_are_applied_in_turn():
+    response = patch_response(("    x = cap", "    x = 2 * cap"), ("    return x", "    return float(x)"))
+    assert apply_code_patch(PATCHED_CODE, "Fixed:\n" + response) == (
+        "def solve(cap=3):\n    x = 2 * cap\n    return float(x)\n", "applied")
+
+
+def test_patch_search_ignores_trailing_whitespace():
+    # The model echoed the lines with trailing spaces the program does not have
+    response = patch_response(("def solve(cap=3):  \n    x = cap ", "def solve(cap=3):\n    x = cap + 1"))
+    assert apply_code_patch(PATCHED_CODE, response) == (
+        "def solve(cap=3):\n    x = cap + 1\n    return x\n", "applied")
+
+
+def test_patch_with_an_empty_replacement_deletes_the_lines():
+    response = "<<<<<<< SEARCH\n    x = cap\n=======\n>>>>>>> REPLACE"
+    patched, reason = apply_code_patch(PATCHED_CODE, response)
+    assert reason == "applied"
+    assert "x = cap" not in patched
+
+
+def test_patch_is_refused_when_a_search_block_is_ambiguous_or_missing():
+    assert apply_code_patch(PATCHED_CODE, "```python\ndef solve():\n    return 1\n```") == (
+        None, "no SEARCH/REPLACE block found")
+    assert apply_code_patch(PATCHED_CODE, patch_response(("    x = cap", "    x = 1"), ("x", "y"))) == (
+        None, "SEARCH block 2 matches several places")
+    assert apply_code_patch(PATCHED_CODE, patch_response(("    y = cap", "    y = 1"))) == (
+        None, "SEARCH block 1 was not found")
+
+
+def test_error_window_keeps_the_end_of_long_errors():
+    assert error_window("Error: short") == "Error: short"
+    long_error = "\n".join(f"line {i}" for i in range(20))
+    assert error_window(long_error, max_lines=3) == "...\nline 17\nline 18\nline 19"
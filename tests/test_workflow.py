@@ -0,0 +1,79 @@
+import concurrent.futures
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import executor
+import workflow
+from workflow import ORThoughtSolveAgent
+
+CANDIDATE_CODE = {
+    "slow": "import time\n\ndef solve():\n    time.sleep(60)\n    return 1\n",
+    "good": "def solve():\n    return 42.0\n",
+    "bad": "def solve():\n    raise ValueError('still wrong')\n",
+}
+
+
+@pytest.fixture
+def candidates(monkeypatch):
+    """
+    Answer debug request i with the program named by the i-th entry given to
+    the fixture, after its delay in seconds; None never answers.
+    """
+    plan = []
+    timers = []
+
+    def fake_submit_debug(nlp=None, model_text=None, code_text=None, error_message=None, llm_model="gpt-4.1-nano",
+                          temperature=0.0, sample=0):
+        future = concurrent.futures.Future()
+        name, delay = plan[sample]
+        if name is not None:
+            usage = SimpleNamespace(prompt_tokens=100, completion_tokens=10, total_tokens=110)
+            timer = threading.Timer(delay, future.set_result,
+                                    [(f"```python\n{CANDIDATE_CODE[name]}```", usage)])
+            timers.append(timer)
+            timer.start()
+        return future
+
+    monkeypatch.setattr(workflow, "submit_debug", fake_submit_debug)
+    monkeypatch.setattr(executor, "_execution_cache", executor.ResponseCache(mode="off"))
+    # Candidates run side by side whatever the number of cores of the machine
+    monkeypatch.setattr(executor, "core_budget", executor.CoreBudget(cores=4))
+    yield plan
+    for timer in timers:
+        timer.cancel()
+
+
+def debug_round(k):
+    return ORThoughtSolveAgent.debug_candidates({}, "nlp", "model", "code", "error", "gpt-4.1-nano", 0.0, k, 0.7)
+
+
+def test_first_clean_candidate_wins_and_the_rest_are_cancelled(candidates):
+    candidates.extend([("slow", 0.0), ("good", 0.3), (None, 0.0)])
+    start = time.perf_counter()
+    round_result, (completion_tokens, prompt_tokens) = debug_round(3)
+    assert time.perf_counter() - start < 10
+
+    assert round_result["execution"].value == 42.0
+    assert round_result["code_text"] == CANDIDATE_CODE["good"].strip()
+    statuses = [candidate["status"] for candidate in round_result["candidates"]]
+    assert statuses == ["cancelled", "winner", "cancelled"]
+    # The running execution was killed, the unanswered request never ran
+    assert round_result["candidates"][0]["execution"]["error_kind"] == "cancelled"
+    assert "execution" not in round_result["candidates"][2]
+    assert (completion_tokens, prompt_tokens) == (20, 200)
+
+
+def test_without_a_clean_candidate_the_lowest_numbered_one_carries_on(candidates):
+    candidates.extend([("bad", 0.2), ("bad", 0.0)])
+    round_result, _ = debug_round(2)
+    assert [candidate["status"] for candidate in round_result["candidates"]] == ["failed", "failed"]
+    assert round_result["execution"].error_kind == "exception"
+    assert round_result["response"] is not None
+    assert round_result["error"] is None
@@ -2,6 +2,7 @@ import os
 import random
 import re
 from collections import Counter
+from typing import Optional
 
 
 def get_random_index_of_most_frequent(results: list) -> int:
@@ -164,6 +165,66 @@ def extract_target_text(string: str, target_mark: str) -> str:
     return target_text
 
 
+PATCH_BLOCK_PATTERN = re.compile(r"<<<<<<< SEARCH\n(.*?)\n=======\n(.*?)\n?>>>>>>> REPLACE", re.DOTALL)
+
+
+def apply_code_patch(code_text: str, response: str):
+    """
+    Apply the SEARCH/REPLACE blocks of an LLM response to `code_text`.
+    Each SEARCH part has to match exactly one place, either verbatim or
+    line by line ignoring trailing whitespace.
+
+    Returns:
+        tuple: (patched code or None, "applied" or the reason it failed)
+    """
+    blocks = PATCH_BLOCK_PATTERN.findall(response)
+    if not blocks:
+        return None, "no SEARCH/REPLACE block found"
+    for number, (search, replace) in enumerate(blocks, start=1):
+        count = code_text.count(search)
+        if count == 1:
+            code_text = code_text.replace(search, replace)
+            continue
+        lines = code_text.split("\n")
+        search_lines = [line.rstrip() for line in search.split("\n")]
+        starts = [i for i in range(len(lines) - len(search_lines) + 1)
+                  if [line.rstrip() for line in lines[i:i + len(search_lines)]] == search_lines]
+        if len(starts) != 1:
+            return None, f"SEARCH block {number} {'matches several places' if count or starts else 'was not found'}"
+        lines[starts[0]:starts[0] + len(search_lines)] = replace.split("\n")
+        code_text = "\n".join(lines)
+    return code_text, "applied"
+
+
+def cached_prompt_tokens(token_usage) -> int:
+    """Prompt tokens served from the provider's prefix cache (OpenAI or DeepSeek style usage)."""
+    details = getattr(token_usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        cached = details.get("cached_tokens")
+    else:
+        cached = getattr(details, "cached_tokens", None)
+    return cached or getattr(token_usage, "prompt_cache_hit_tokens", 0) or 0
+
+
+def code_diff(before: str, after: str, context: int = 1) -> str:
+    """Unified diff between two versions of a program, without the file header."""
+    import difflib
+
+    return "\n".join(list(difflib.unified_diff(before.splitlines(), after.splitlines(), lineterm="", n=context))[2:])
+
+
+def error_window(error_message: str, max_lines: int = 12) -> str:
+    """
+    The part of an execution error worth resending: the output of
+    `format_user_traceback` is short already, full tracebacks keep their
+    last `max_lines` lines.
+    """
+    lines = error_message.splitlines()
+    if len(lines) <= max_lines:
+        return error_message
+    return "\n".join(["..."] + lines[-max_lines:])
+
+
 def str2py(string, output_filename):
     """
     Writes a given string containing Python code to a .py file.
@@ -213,47 +274,16 @@ def str2py(string, output_filename):
         return False
 
 
-def execute_str_function(code_str: str):
-    import tempfile
-    import os
-    import importlib.util
-
-    with tempfile.TemporaryDirectory() as tmpdir:
-        module_path = os.path.join(tmpdir, "temp_module.py")
-
-        # Write code to temporary file
-        with open(module_path, "w", encoding="utf-8") as f:
-            f.write(code_str)
-
-        # Load module
-        spec = importlib.util.spec_from_file_location("temp_module",
-                                                      module_path)
-        if spec is None or spec.loader is None:
-            return f"Error: Could not load module from {module_path}"
-        module = importlib.util.module_from_spec(spec)
-        try:
-            spec.loader.exec_module(module)
-        except Exception as e:
-            return format_user_traceback(e, module_path)
-
-        # Find the first non-built-in, non-private function
-        found_func = None
-        for name in dir(module):
-            if name.startswith('__'):
-                continue
-            func = getattr(module, name)
-            if callable(func) and isinstance(func, type(lambda: None)):
-                found_func = func
-                break
-
-        if found_func is None:
-            return "Error: No callable function found in the code."
-
-        # Call function
-        try:
-            return found_func()
-        except Exception as e:
-            return format_user_traceback(e, module_path)
+def execute_str_function(code_str: str, timeout: Optional[float] = None, memory_limit_mb: Optional[float] = None,
+                         problem: Optional[dict] = None):
+    """
+    Run generated code in a separate process (see `executor.execute_code`)
+    and return the function's value, or an error string on failure.
+    `problem` is the dataset entry, used to size the solver's thread share.
+    """
+    from executor import execute_code
+
+    return execute_code(code_str, timeout=timeout, memory_limit_mb=memory_limit_mb, problem=problem).output
 
 
 def format_user_traceback(exception, user_module_path):
@@ -290,6 +320,205 @@ def format_user_traceback(exception, user_module_path):
     return full_tb
 
 
+class ResultJournal:
+    """
+    Append-only JSONL journal backing a `results.json` file.
+
+    Each finished item is appended as one `{"key": ..., "value": ...}` line
+    to `results.jsonl` next to `results.json`, and the file is fsync'ed every
+    `fsync_every` records or `fsync_interval` seconds. `compact` folds the
+    journal into `results.json` (written atomically) at the end of a run;
+    until then `load_results` reads both.
+    """
+
+    def __init__(self, results_file: str, fsync_every: int = 20, fsync_interval: float = 5.0):
+        import threading
+        import time
+
+        self.results_file = results_file
+        self.journal_file = journal_path(results_file)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.last_sync = time.time()
+        self.file = None
+
+    def append(self, key: str, value):
+        """Append one item's result, replacing any earlier entry for `key`."""
+        import json
+        import time
+
+        line = json.dumps({"key": key, "value": value}, ensure_ascii=False, default=str)
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.journal_file, "a+", encoding="utf-8")
+                # A run killed mid-write leaves a partial last line; start a fresh one
+                if self.file.tell() > 0:
+                    self.file.seek(self.file.tell() - 1)
+                    if self.file.read(1) != "\n":
+                        self.file.write("\n")
+            self.file.write(line + "\n")
+            self.file.flush()
+            self.pending += 1
+            if self.pending >= self.fsync_every or time.time() - self.last_sync >= self.fsync_interval:
+                self._sync()
+
+    def update(self, result_dict: dict):
+        for key, value in result_dict.items():
+            self.append(key, value)
+
+    def _sync(self):
+        import os
+        import time
+
+        if self.file is not None:
+            os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.time()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self._sync()
+                self.file.close()
+                self.file = None
+
+    def compact(self, key_rank: Optional[dict] = None) -> dict:
+        """
+        Fold the journal into `results.json` and remove it.
+
+        With `key_rank`, keys are written in dataset order whatever order the
+        items finished in; keys outside it keep their order at the end.
+        """
+        import json
+        import os
+
+        self.close()
+        with self.lock:
+            results = load_results(self.results_file)
+            if key_rank is not None:
+                results = {k: results[k] for k in sorted(results, key=lambda k: key_rank.get(k, len(key_rank)))}
+            tmp_file = f"{self.results_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2, ensure_ascii=False, default=str)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_file, self.results_file)
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+        return results
+
+
+class CompletionManifest:
+    """
+    Completed keys per agent stage (e.g. "model", "solve", "reflexion_round_2",
+    a baseline pattern) of one result path, kept as append-only
+    `manifest.jsonl` lines so a killed run loses at most the item in flight.
+
+    A key only counts as complete while its recorded output files still
+    exist and are non-empty, and, when the stage's results are given, while
+    its results entry exists and holds no "error".
+    """
+
+    def __init__(self, result_path: str):
+        import json
+        import threading
+
+        self.result_path = result_path
+        self.manifest_file = os.path.join(result_path, "manifest.jsonl")
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[(record["stage"], record["key"])] = record
+
+    def is_complete(self, stage: str, key: str, results: Optional[dict] = None) -> bool:
+        record = self.entries.get((stage, key))
+        if record is None:
+            return False
+        for output in record["outputs"]:
+            output_path = os.path.join(self.result_path, output)
+            if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+                return False
+        # An input regenerated since (e.g. a re-modeled .py) invalidates the entry
+        for input_file, mtime in record.get("inputs", {}).items():
+            input_path = os.path.join(self.result_path, input_file)
+            if not os.path.exists(input_path) or os.path.getmtime(input_path) != mtime:
+                return False
+        if results is not None:
+            if key not in results:
+                return False
+            if isinstance(results[key], dict) and "error" in results[key]:
+                return False
+        return True
+
+    def mark_complete(self, stage: str, key: str, outputs: list, inputs: Optional[list] = None):
+        """
+        Record `key` as done for `stage`. `outputs` are paths relative to the
+        result path; `inputs` are files the stage read (e.g. the code being
+        debugged), whose modification times are remembered.
+        """
+        import json
+
+        record = {"stage": stage, "key": key, "outputs": outputs}
+        if inputs:
+            record["inputs"] = {
+                os.path.relpath(input_path, self.result_path): os.path.getmtime(input_path)
+                for input_path in inputs if os.path.exists(input_path)
+            }
+        with self.lock:
+            self.entries[(stage, key)] = record
+            with open(self.manifest_file, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def load_config_section(section: str, defaults: dict, config_path: str = "config.json") -> dict:
+    """`defaults` overridden by one section of config.json (all defaults when the file or section is missing)."""
+    import json
+
+    config = dict(defaults)
+    if os.path.exists(config_path):
+        with open(config_path, "r") as f:
+            config.update(json.load(f).get(section, {}))
+    return config
+
+
+def journal_path(results_file: str) -> str:
+    """`.../results.json` -> `.../results.jsonl`"""
+    root, _ = os.path.splitext(results_file)
+    return f"{root}.jsonl"
+
+
+def load_results(results_file: str) -> dict:
+    """
+    Load a run's results from `results.json`, the `results.jsonl` journal of
+    an unfinished (or crashed) run, or both. Journal entries win, and a
+    truncated last line is ignored.
+    """
+    import json
+
+    results = {}
+    if os.path.exists(results_file):
+        with open(results_file, "r", encoding="utf-8") as file:
+            results = json.load(file)
+    journal_file = journal_path(results_file)
+    if os.path.exists(journal_file):
+        with open(journal_file, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                results[record["key"]] = record["value"]
+    return results
+
+
 def token_cost_calculate(token_usage: dict):
     """Legacy function for backward compatibility - use TokenManager.calculate_cost instead"""
     # Create a temporary TokenManager instance to use the cost calculation
@@ -323,6 +552,7 @@ class TokenManager:
             "prompt_tokens": 0,
             "total_tokens": 0,
             "num": 0,
+            "cached_num": 0,
             "model": llm_model
         }
         self.token_cost = {
@@ -333,6 +563,8 @@ class TokenManager:
             "prompt_avg_cost": 0,
             "total_avg_cost": 0
         }
+        # Prompt/completion tokens of debug calls per round, keyed by round number
+        self.debug_rounds = {}
     
     def calculate_cost(self, token_usage: dict):
         """Calculate token costs based on usage"""
@@ -349,13 +581,15 @@ class TokenManager:
         return prompt_cost, completion_cost, total_cost
     
     def add_usage(self, response_token_usage):
-        """Add token usage from a single response"""
+        """Add token usage from a single response (cache hits count as zero-cost calls)"""
         completion_tokens = getattr(response_token_usage, 'completion_tokens', 0)
         prompt_tokens = getattr(response_token_usage, 'prompt_tokens', 0)
         
         self.token_usage["completion_tokens"] += completion_tokens
         self.token_usage["prompt_tokens"] += prompt_tokens
         self.token_usage["num"] += 1
+        if getattr(response_token_usage, 'cached', False):
+            self.token_usage["cached_num"] += 1
         self.token_usage["total_tokens"] = self.token_usage["completion_tokens"] + self.token_usage["prompt_tokens"]
         
         # Calculate costs
@@ -389,6 +623,15 @@ class TokenManager:
             self.token_cost["completion_avg_cost"] = self.token_cost["completion_cost"] / self.token_usage["num"]
             self.token_cost["total_avg_cost"] = self.token_cost["total_cost"] / self.token_usage["num"]
     
+    def add_debug_rounds(self, debug_tokens: dict):
+        """Add one problem's debug token usage per round ({round: {"prompt_tokens": ..., ...}})"""
+        for debug_round, usage in debug_tokens.items():
+            round_usage = self.debug_rounds.setdefault(
+                str(debug_round), {"prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0, "num": 0})
+            for field in ("prompt_tokens", "cached_prompt_tokens", "completion_tokens"):
+                round_usage[field] += usage.get(field, 0)
+            round_usage["num"] += 1
+
     def load_existing_data(self, token_file_path: str):
         """Load existing token data from file if it exists"""
         import json
@@ -406,6 +649,13 @@ class TokenManager:
             self.token_usage["completion_tokens"] += existing_usage.get("completion_tokens", 0)
             self.token_usage["total_tokens"] += existing_usage.get("total_tokens", 0)
             self.token_usage["num"] += existing_usage.get("num", 0)
+            self.token_usage["cached_num"] += existing_usage.get("cached_num", 0)
+            existing_rounds = token_data.get("debug_rounds", {})
+            for debug_round, usage in existing_rounds.items():
+                round_usage = self.debug_rounds.setdefault(
+                    debug_round, {"prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0, "num": 0})
+                for field in round_usage:
+                    round_usage[field] += usage.get(field, 0)
             
             # Recalculate costs with new totals
             self.token_usage["total_tokens"] = self.token_usage["completion_tokens"] + self.token_usage["prompt_tokens"]
@@ -434,6 +684,8 @@ class TokenManager:
             "token_usage": self.token_usage,
             "token_cost": self.token_cost
         }
+        if self.debug_rounds:
+            token_to_save["debug_rounds"] = self.debug_rounds
         
         with open(token_file_path, "w", encoding="utf-8") as f:
             json.dump(token_to_save, f, indent=2, ensure_ascii=False)
@@ -450,3 +702,6 @@ class TokenManager:
         """Print token usage and cost summary"""
         console.print(f"Token Usage: {self.token_usage}", style=style)
         console.print(f"Token Cost (dollar): {self.token_cost}", style=style)
+        for debug_round, usage in sorted(self.debug_rounds.items(), key=lambda item: int(item[0])):
+            average = usage["prompt_tokens"] / usage["num"] if usage["num"] else 0
+            console.print(f"Debug round {debug_round}: {usage} (avg prompt tokens {average:.0f})", style=style)
@@ -1,18 +1,27 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from itertools import islice
 import json
 import os
-import pandas as pd
-from utils import combine_sample_data, str2py, extract_code_model, TokenManager
-from method import or_thought_modeling, debug,  or_thought_modeling_wo_understanding, or_thought_modeling_build_simplified, or_thought_modeling_understanding_simplified, zero_shot_cot, self_consistency_vote, standard
-from analyze import execute_matching_files, compare_results
-from utils import execute_str_function, token_cost_calculate, extract_target_text
-from prompt import standard_prompt, feedback_prompt, reflection_prompt
+import queue
+import threading
 import time
+from utils import combine_sample_data, str2py, extract_code_model, TokenManager, ResultJournal, CompletionManifest, load_results
+from method import or_thought_modeling, debug, submit_debug, hint_debug, compact_debug as compact_debug_call, or_thought_modeling_wo_understanding, or_thought_modeling_build_simplified, or_thought_modeling_understanding_simplified, zero_shot_cot, self_consistency_vote, standard
+from analyze import execute_matching_files, compare_results
+from executor import execute_code
+from autofix import apply_autofix, is_objective_value
+from fix_index import error_signature, get_fix_index
+from utils import execute_str_function, token_cost_calculate, extract_target_text, apply_code_patch, code_diff, error_window, cached_prompt_tokens
+from prompt import standard_prompt, feedback_prompt, reflection_prompt, compact_debug_prompt, compact_debug_followup_prompt
+from llm_call import LLMStatsWindow, save_llm_stats
+from scheduler import CostScheduler
+from shards import shard_data
 
 from rich.console import Console
 from rich.panel import Panel
 from rich.progress import Progress, TextColumn, BarColumn, TimeElapsedColumn, TimeRemainingColumn, track
-from typing import Optional, Tuple
+from typing import Any, Callable, Iterator, Optional, Tuple
 
 class Dataset:
     """ 
@@ -23,7 +32,8 @@ class Dataset:
                  dataset_name: str,
                  dataset_root: str = 'datasets/summary/',
                  item_range: Optional[Tuple[int, int]] = None,
-                 problems: list = []):
+                 problems: list = [],
+                 shard: Optional[Tuple[int, int]] = None):
         self.data_path = f'{dataset_root}/summary_{dataset_name}.json'
         with open(self.data_path, "r", encoding="utf-8") as file:
             data = json.load(file)
@@ -33,6 +43,9 @@ class Dataset:
             self.data = dict(list(data.items())[item_range[0]:item_range[1]])
         if problems:
             self.data = {key: value for key, value in self.data.items() if key in problems}
+        if shard:
+            # Shard (i, N) of the selected problems, balanced by expected cost
+            self.data = shard_data(self.data, shard)
         if dataset_name == "complexor":
             self.ground_truth = {
                 key: value.get('sample')[0].get('output')[0]
@@ -59,12 +72,205 @@ class Dataset:
         return len(self.data)
 
 
+# Set while the progress bars of concurrently running agents share one view
+_shared_progress: Optional[Progress] = None
+
+
+@contextmanager
+def shared_progress(console: Optional[Console] = None) -> Iterator[Progress]:
+    """
+    Show the progress bars of all agents run inside the block in one live
+    view, so several agents can run at the same time in one terminal.
+    """
+    global _shared_progress
+    progress = Progress(
+        TextColumn("[bold blue]{task.description}"),
+        BarColumn(bar_width=None),
+        TextColumn("[bold green]{task.completed}/{task.total}"),
+        "•",
+        TimeElapsedColumn(),
+        console=console or Console(),
+        expand=True
+    )
+    with progress:
+        _shared_progress = progress
+        try:
+            yield progress
+        finally:
+            _shared_progress = None
+
+
+class SharedProgressView:
+    """An agent's bars inside the shared view; entering and leaving it does nothing."""
+
+    def __init__(self, progress: Progress):
+        self.progress = progress
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def add_task(self, description: str, **kwargs):
+        return self.progress.add_task(description, **kwargs)
+
+    def update(self, task, **kwargs):
+        self.progress.update(task, **kwargs)
+
+
+def progress_view(*columns, **kwargs):
+    """A new Progress with `columns`, or a view onto the shared one while `shared_progress` is active."""
+    if _shared_progress is not None:
+        return SharedProgressView(_shared_progress)
+    return Progress(*columns, **kwargs)
+
+
+def track_items(items, total: int, description: str) -> Iterator:
+    """rich's `track`, drawn in the shared view while `shared_progress` is active."""
+    if _shared_progress is None:
+        yield from track(items, total=total, description=description)
+        return
+    task = _shared_progress.add_task(description, total=total)
+    for item in items:
+        yield item
+        _shared_progress.update(task, advance=1)
+
+
+def pending_items(data_items: list,
+                  manifest: CompletionManifest,
+                  stage: str,
+                  results: Optional[dict],
+                  resume: bool,
+                  console: Console) -> list:
+    """When resuming, drop the items already completed for `stage`."""
+    if not resume:
+        return data_items
+    pending = [(key, value) for key, value in data_items if not manifest.is_complete(stage, key, results)]
+    console.print(f"Resuming {stage}: {len(data_items) - len(pending)} completed items skipped, {len(pending)} to run",
+                  style="bold yellow")
+    return pending
+
+
+def run_concurrently(items: list,
+                     worker: Callable,
+                     concurrency: int = 1,
+                     description: str = "Processing...",
+                     console: Optional[Console] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Run `worker(key, value)` over `items` with at most `concurrency` calls in
+    flight and yield `(key, result)` as each call completes.
+
+    Items are dispatched in the given order and results are consumed in the
+    calling thread, so callers can update shared state (results.json, token
+    managers) without locking. The progress bar shows the in-flight count and
+    throughput.
+    """
+    concurrency = max(1, concurrency)
+    progress = progress_view(
+        TextColumn("[bold blue]{task.description}"),
+        BarColumn(bar_width=None),
+        "[progress.percentage]{task.percentage:>3.0f}%",
+        "•",
+        TextColumn("[bold green]{task.completed}/{task.total}"),
+        "•",
+        TextColumn("in-flight: {task.fields[in_flight]}"),
+        "•",
+        TextColumn("{task.fields[throughput]:.1f} items/min"),
+        "•",
+        TimeElapsedColumn(),
+        "•",
+        TimeRemainingColumn(),
+        console=console or Console(),
+        expand=True
+    )
+    with progress, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        task = progress.add_task(description, total=len(items), in_flight=0, throughput=0.0)
+        start_time = time.time()
+        pending = {}
+        item_iter = iter(items)
+
+        def fill():
+            for key, value in item_iter:
+                pending[executor.submit(worker, key, value)] = key
+                if len(pending) >= concurrency:
+                    break
+
+        fill()
+        progress.update(task, in_flight=len(pending))
+        completed = 0
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                yield key, future.result()
+                completed += 1
+            fill()
+            elapsed = max(time.time() - start_time, 1e-6)
+            progress.update(task,
+                            completed=completed,
+                            in_flight=len(pending),
+                            throughput=completed / elapsed * 60)
+
 
 class ORThoughtModelAgent():
     """
     Answer the optimization question with solution path 
     """
 
+    def model_item(self,
+                   key: str,
+                   value: dict,
+                   dataset: Dataset,
+                   result_path: str,
+                   llm_model: str = "gpt-4.1-nano",
+                   temperature: float = 0.0,
+                   mode: str = "formalized"):
+        """
+        Generate the solution path, model and code for one problem and save its
+        `{key}.txt`/`{key}.py` files.
+
+        Returns:
+            tuple: (result entry for results.json, token usage or None on error)
+        """
+        item_result = {}
+        nlp = value.get('description')
+        if dataset.if_sample_data:
+            sample_data = value.get('sample')[0].get('input')
+            nlp = combine_sample_data(nlp, sample_data)
+
+        try:
+            if mode=="formalized":
+                response, response_token_usage = or_thought_modeling(nlp=nlp, llm_model=llm_model, temperature=temperature)
+            elif mode=="formalized_understanding_simplified":
+                response, response_token_usage = or_thought_modeling_understanding_simplified(nlp=nlp, llm_model=llm_model, temperature=temperature)
+            elif mode=="wo_understanding":
+                response, response_token_usage = or_thought_modeling_wo_understanding(nlp=nlp, llm_model=llm_model, temperature=temperature)
+            elif mode=="formalized_build_simplified":
+                response, response_token_usage = or_thought_modeling_build_simplified(nlp=nlp, llm_model=llm_model, temperature=temperature)
+            else:
+                raise ValueError(f"Unknown mode: {mode}. Supported modes are: formalized, informalized, wo_understanding, wo_build, self_plan")
+        except Exception as e:
+            item_result["error"] = str(e)
+            return item_result, None
+        solution_path = extract_target_text(response, "solution_path")
+        model_text, code_text = extract_code_model(response)
+        item_result["solution_path"] = solution_path
+        item_result["model_text"] = model_text
+        item_result["code_text"] = code_text
+        item_result["response"] = response
+
+        # save model and code files
+        txt_filename = os.path.join(result_path, f"{key}.txt")
+        with open(txt_filename, "w", encoding="utf-8") as f:
+            f.write(model_text)
+        py_filename = os.path.join(result_path, f"{key}.py")
+        success = str2py(code_text, py_filename)
+        if not success:
+            item_result["write_error"] = "Failed to write code file"
+
+        return item_result, response_token_usage
+
     def __call__(
         self,
         dataset: Dataset,
@@ -72,7 +278,9 @@ class ORThoughtModelAgent():
         item_num: int,
         llm_model: str = "gpt-4.1-nano",
         temperature: float = 0.0,
-        mode: str ="formalized" 
+        mode: str ="formalized",
+        concurrency: int = 1,
+        resume: bool = False
     ):
 
         data = dataset.data
@@ -83,88 +291,64 @@ class ORThoughtModelAgent():
 
         # Initialize token manager
         token_manager = TokenManager(llm_model)
+        stats_window = LLMStatsWindow()
 
         result_path = os.path.join(save_path, f"orthought_{mode}")
         os.makedirs(result_path, exist_ok=True)
         console.print(f"result_path: {result_path}", style="bold green")
         results_file = os.path.join(result_path, f"results.json")
-        result_dict = {}
-        execute_results = {}
+        journal = ResultJournal(results_file)
+        manifest = CompletionManifest(result_path)
         except_keys = []
 
         # Use list unpacking to take the first item_num elements
         data_items = list(islice(data.items(), item_num))
-        for key, value in track(
-                data_items,
-                description=
-                f"🦊 | ORThought Model Agent ({mode})| Processing -{dataset.dataset_name}-..."
-        ):
-
-            time.sleep(1)
-            result_dict[key] = {}
-            nlp = value.get('description')
-            if dataset.if_sample_data:
-                sample_data = value.get('sample')[0].get('input')
-                nlp = combine_sample_data(nlp, sample_data)
-
-            try:
-                if mode=="formalized":
-                    response, response_token_usage = or_thought_modeling(nlp=nlp, llm_model=llm_model, temperature=temperature)
-                elif mode=="formalized_understanding_simplified":
-                    response, response_token_usage = or_thought_modeling_understanding_simplified(nlp=nlp, llm_model=llm_model, temperature=temperature)
-                elif mode=="wo_understanding":
-                    response, response_token_usage = or_thought_modeling_wo_understanding(nlp=nlp, llm_model=llm_model, temperature=temperature)
-                elif mode=="formalized_build_simplified":
-                    response, response_token_usage = or_thought_modeling_build_simplified(nlp=nlp, llm_model=llm_model, temperature=temperature)
-                else:
-                    raise ValueError(f"Unknown mode: {mode}. Supported modes are: formalized, informalized, wo_understanding, wo_build, self_plan")
-            except Exception as e:
-                console.print(f"Error processing {key}: {e}",
+        key_rank = {key: rank for rank, (key, _) in enumerate(data_items)}
+        todo_items = pending_items(data_items, manifest, "model", load_results(results_file), resume, console)
+        # Longest problems first, so they do not become the tail of the run
+        scheduler = CostScheduler(dataset.dataset_name, f"{llm_model}/orthought_{mode}/model")
+        todo_items = scheduler.order(todo_items)
+
+        def worker(key, value):
+            return self.model_item(key, value, dataset, result_path,
+                                   llm_model=llm_model, temperature=temperature, mode=mode)
+
+        for key, (item_result, response_token_usage) in run_concurrently(
+                todo_items,
+                scheduler.timed(worker),
+                concurrency=concurrency,
+                description=f"🦊 | ORThought Model Agent ({mode})| Processing -{dataset.dataset_name}-...",
+                console=console):
+
+            if "error" in item_result:
+                console.print(f"Error processing {key}: {item_result['error']}",
                                 style="bold red")
-                result_dict[key]["error"] = str(e)
                 except_keys.append(key)
-                continue
-            from utils import extract_target_text
-            solution_path = extract_target_text(response, "solution_path")
-            model_text, code_text = extract_code_model(response)
-            result_dict[key]["solution_path"] = solution_path
-            result_dict[key]["model_text"] = model_text
-            result_dict[key]["code_text"] = code_text
-            result_dict[key]["response"] = response
-
-            if os.path.exists(results_file):
-                with open(results_file, "r", encoding="utf-8") as file:
-                    existing_data = json.load(file)
-            else:
-                existing_data = {}
-
-            # combine new data
-            existing_data.update(result_dict)
-            # write back to file
-            with open(results_file, "w", encoding="utf-8") as file:
-                json.dump(existing_data,
-                            file,
-                            indent=2,
-                            ensure_ascii=False)
-
-            # save model and code files
-            txt_filename = os.path.join(result_path, f"{key}.txt")
-            with open(txt_filename, "w", encoding="utf-8") as f:
-                f.write(model_text)
-            py_filename = os.path.join(result_path, f"{key}.py")
-            success = str2py(code_text, py_filename)
-            if not success:
+            if "write_error" in item_result:
                 console.print(f"Failed to write code for key: {key}",
                                 style="bold red")
 
+            journal.append(key, item_result)
+            if "error" not in item_result and "write_error" not in item_result:
+                manifest.mark_complete("model", key, [f"{key}.txt", f"{key}.py"])
+
             # Add token usage to manager
-            token_manager.add_usage(response_token_usage)
+            if response_token_usage is not None:
+                token_manager.add_usage(response_token_usage)
 
+        # Fold the journal into results.json, keeping dataset order
+        journal.compact(key_rank)
+        scheduler.save()
+        self.finish(console, result_path, token_manager, except_keys, len(data_items), stats_window)
+        stats_window.close()
+
+    def finish(self, console: Console, result_path: str, token_manager: TokenManager, except_keys: list, item_count: int,
+               stats_window: Optional[LLMStatsWindow] = None):
         console.print(f"All model and code files saved in {result_path} directory")
         console.print(f"Except keys: {except_keys}", style="bold red")
         # Show the results (Table)
         console.print(
-            f"Modeling Process Completed: {len(data_items)} items processed"
+            f"Modeling Process Completed: {item_count} items processed"
         )
         token_manager.print_summary(console, style="bold green")
 
@@ -172,6 +356,7 @@ class ORThoughtModelAgent():
         # Load existing data if exists and save updated data
         token_manager.load_existing_data(token_save_path)
         token_manager.save_to_file(token_save_path)
+        save_llm_stats(os.path.join(result_path, "llm_stats.json"), stats_window)
 
 
 class ORThoughtSolveAgent():
@@ -180,6 +365,371 @@ class ORThoughtSolveAgent():
     This agent is responsible for the solving part of the ORThought workflow.
     """
 
+    # Local fixes tried per problem before the remaining errors go to the LLM
+    AUTOFIX_MAX_TRY = 3
+
+    @staticmethod
+    def result_paths(save_path: str, base_pattern: str, debug_max_try: int) -> Tuple[str, str, str]:
+        """Return (folder with the generated code, folder for solve results, process name)."""
+        initial_path = os.path.join(save_path, base_pattern)
+        if debug_max_try > 0:
+            result_path = os.path.join(save_path, base_pattern, "debug")
+            process_name = f"{base_pattern} Code Debugging"
+        else:
+            result_path = initial_path
+            process_name = f"{base_pattern} Code Execution"
+        return initial_path, result_path, process_name
+
+    def solve_item(self,
+                   key: str,
+                   value: dict,
+                   dataset: Dataset,
+                   initial_path: str,
+                   result_path: str,
+                   llm_model: str = "gpt-4.1-nano",
+                   temperature: float = 0.0,
+                   debug_max_try: int = 0,
+                   debug_candidates: int = 1,
+                   candidate_temperature: float = 0.7,
+                   autofix: bool = False,
+                   compact_debug: bool = False):
+        """
+        Execute the generated code of one problem, debugging it up to
+        `debug_max_try` times, and save the final `{key}.py`. With
+        `debug_candidates` > 1 each round tries several fixes at once (see
+        `debug_candidates`). With `autofix`, errors that one of the rules in
+        autofix.py recognizes are repaired locally, and the LLM is only
+        asked when no rule applies. Errors with a signature in the fix index
+        are first tried with their known fixes (see `known_fix`). With
+        `compact_debug`, single-candidate rounds continue one conversation
+        and apply the patch the LLM answers with (see `compact_messages`).
+
+        Returns:
+            tuple: (result entry for results.json, (completion_tokens, prompt_tokens))
+        """
+        nlp = value.get('description')
+        if dataset.if_sample_data:
+            sample_data = value.get('sample')[0].get('input')
+            nlp = combine_sample_data(nlp, sample_data)
+        item_result = {}
+
+        try:
+            model_path = os.path.join(initial_path, f"{key}.txt")
+            with open(model_path, 'r', encoding='utf-8') as f:
+                model_text = f.read()
+        except FileNotFoundError:
+            item_result["error"] = "Model file not found"
+            return item_result, (0, 0)
+        try:
+            code_path = os.path.join(initial_path, f"{key}.py")
+            with open(code_path, 'r', encoding='utf-8') as f:
+                code_text = f.read()
+        except FileNotFoundError:
+            item_result["error"] = "Code file not found"
+            return item_result, (0, 0)
+
+        execution = execute_code(code_text, problem=value)
+        execute_result = execution.output
+        item_result["execution_round_0"] = execution.summary()
+
+        debug_round = 0
+        autofix_count = 0
+        # Whether the last repair was made without a full debug call
+        local_repair = False
+        fix_index = get_fix_index()
+        tried_signatures = set()
+        # Compact mode: the debug conversation so far, the code as the LLM last saw it
+        # and a note on a patch that could not be applied
+        conversation, llm_code, patch_note = [], code_text, None
+        debug_tokens = {}
+        completion_tokens, prompt_tokens = 0, 0
+        while (
+                type(execute_result) is str
+        ) and "Error" in execute_result and debug_round < debug_max_try:
+            if autofix and autofix_count < self.AUTOFIX_MAX_TRY:
+                fixed_code, rule = apply_autofix(code_text, execute_result)
+                if fixed_code is not None:
+                    autofix_count += 1
+                    code_text = fixed_code
+                    execution = execute_code(code_text, problem=value)
+                    execute_result = execution.output
+                    item_result.setdefault("autofix", []).append(
+                        {"rule": rule, "after_debug_round": debug_round, "execution": execution.summary()})
+                    local_repair = True
+                    continue
+            signature = error_signature(execute_result, code_text) if fix_index.enabled else None
+            if signature is not None and signature not in tried_signatures:
+                tried_signatures.add(signature)
+                known_fix, known_tokens = self.known_fix(
+                    fix_index, signature, value, code_text, execute_result, llm_model, temperature)
+                completion_tokens += known_tokens[0]
+                prompt_tokens += known_tokens[1]
+                if known_fix is not None:
+                    code_text = known_fix["code_text"]
+                    execute_result = known_fix["execution"].output
+                    item_result.setdefault("fix_index", []).append(
+                        {"kind": known_fix["kind"], "signature": signature, "after_debug_round": debug_round,
+                         "execution": known_fix["execution"].summary()})
+                    local_repair = True
+                    continue
+            debug_round += 1
+            local_repair = False
+            error_message, previous_code = execute_result, code_text
+            if debug_candidates > 1:
+                round_result, round_tokens = self.debug_candidates(
+                    value, nlp, model_text, code_text, execute_result,
+                    llm_model, temperature, debug_candidates, candidate_temperature)
+                completion_tokens += round_tokens[0]
+                prompt_tokens += round_tokens[1]
+                debug_tokens[debug_round] = {"prompt_tokens": round_tokens[1], "completion_tokens": round_tokens[0]}
+                item_result[f"debug_round_{debug_round}_candidates"] = round_result["candidates"]
+                if round_result["response"] is None:
+                    item_result["error"] = round_result["error"]
+                    continue
+                code_text = round_result["code_text"]
+                execute_result = round_result["execution"].output
+                item_result[f"debug_round_{debug_round}"] = round_result["response"]
+                item_result[f"execution_round_{debug_round}"] = round_result["execution"].summary()
+                self.index_fix(fix_index, error_message, previous_code, code_text, round_result["execution"])
+                continue
+            try:
+                if compact_debug:
+                    messages = self.compact_messages(conversation, nlp, model_text, code_text, execute_result,
+                                                     llm_code, patch_note)
+                    response, response_token_usage = compact_debug_call(
+                        messages=messages, llm_model=llm_model, temperature=temperature)
+                    conversation = messages + [{"role": "assistant", "content": response}]
+                else:
+                    response, response_token_usage = debug(
+                        nlp=nlp,
+                        model_text=model_text,
+                        code_text=code_text,
+                        error_message=execute_result,
+                        llm_model=llm_model,
+                        temperature=temperature
+                    )
+                completion_tokens += getattr(response_token_usage, 'completion_tokens', 0)  # type: ignore
+                prompt_tokens += getattr(response_token_usage, 'prompt_tokens', 0)  # type: ignore
+            except Exception as e:
+                item_result["error"] = str(e)
+                continue
+            debug_tokens[debug_round] = {
+                "prompt_tokens": getattr(response_token_usage, 'prompt_tokens', 0),
+                "cached_prompt_tokens": cached_prompt_tokens(response_token_usage),
+                "completion_tokens": getattr(response_token_usage, 'completion_tokens', 0)}
+            if compact_debug:
+                patched_code, patch_status = apply_code_patch(code_text, response)
+                if patched_code is None and "<code>" in response:
+                    patched_code, patch_status = extract_target_text(response, "code"), "full code"
+                item_result[f"debug_round_{debug_round}_patch"] = patch_status
+                patch_note = None
+                if patched_code is None:
+                    patch_note = f"Your last patch could not be applied ({patch_status}), so the code is unchanged. "
+                code_text = llm_code = patched_code if patched_code is not None else code_text
+            else:
+                code_text = extract_target_text(response, "code")
+            execution = execute_code(code_text, problem=value)
+            execute_result = execution.output
+            item_result[f"debug_round_{debug_round}"] = response
+            item_result[f"execution_round_{debug_round}"] = execution.summary()
+            self.index_fix(fix_index, error_message, previous_code, code_text, execution)
+        if "autofix" in item_result or "fix_index" in item_result:
+            # A repair that leaves the code returning an objective without a full debug call replaces that call
+            item_result["llm_calls_saved"] = int(is_objective_value(execute_result) and local_repair)
+        if debug_tokens:
+            item_result["debug_tokens"] = debug_tokens
+        item_result["code_text"] = code_text
+        item_result["execute_result"] = execute_result
+
+        # Save code file
+        py_filename = os.path.join(result_path, f"{key}.py")
+        success = str2py(code_text, py_filename)
+        if not success:
+            item_result["write_error"] = "Failed to write code file"
+
+        return item_result, (completion_tokens, prompt_tokens)
+
+    @staticmethod
+    def compact_messages(conversation: list,
+                         nlp: str,
+                         model_text: str,
+                         code_text: str,
+                         error_message: str,
+                         llm_code: str,
+                         patch_note: Optional[str]) -> list:
+        """
+        Messages for the next compact debug turn. The first turn carries the
+        full context; later turns only add the traceback window and the
+        changes made to the code since the LLM's last patch, so the earlier
+        turns form a prefix the provider can cache.
+        """
+        if not conversation:
+            content = compact_debug_prompt.format(nlp=nlp, model_text=model_text, code_text=code_text,
+                                                  error_message=error_message)
+        else:
+            changes = ""
+            if code_text != llm_code:
+                changes = f"\nThe code was changed since your last patch:\n\n```diff\n{code_diff(llm_code, code_text)}\n```\n"
+            content = compact_debug_followup_prompt.format(patch_note=patch_note or "",
+                                                           error_message=error_window(error_message),
+                                                           changes=changes)
+        return conversation + [{"role": "user", "content": content}]
+
+    @staticmethod
+    def resolves(execution, signature: Optional[str], code_text: str) -> bool:
+        """Whether `execution` of `code_text` got past the error with `signature`."""
+        if execution.ok:
+            return True
+        return execution.error_kind == "exception" and error_signature(execution.output, code_text) != signature
+
+    @classmethod
+    def index_fix(cls, fix_index, error_message: str, previous_code: str, code_text: str, execution):
+        """Remember a debug round's change as the fix for its error if the error went away."""
+        if fix_index.enabled and cls.resolves(execution, error_signature(error_message, previous_code), code_text):
+            fix_index.record(error_message, previous_code, code_text)
+
+    @classmethod
+    def known_fix(cls,
+                  fix_index,
+                  signature: str,
+                  value: dict,
+                  code_text: str,
+                  error_message: str,
+                  llm_model: str,
+                  temperature: float) -> Tuple[Optional[dict], Tuple[int, int]]:
+        """
+        Try the fixes stored for an error signature before a full debug
+        round: first replay their line rewrites on the failing line, then
+        send the most used fix's diff as a hint in a short prompt.
+
+        Returns:
+            tuple: ({"kind", "code_text", "execution"} or None, (completion_tokens, prompt_tokens))
+        """
+        fixes = fix_index.lookup(signature)
+        if not fixes:
+            return None, (0, 0)
+        for fix in fixes:
+            patched_code = fix_index.apply_patch(fix, code_text, error_message)
+            if patched_code is None:
+                continue
+            execution = execute_code(patched_code, problem=value)
+            if cls.resolves(execution, signature, patched_code):
+                fix_index.mark_used(signature, fix, "patched")
+                return {"kind": "patch", "code_text": patched_code, "execution": execution}, (0, 0)
+        try:
+            response, response_token_usage = hint_debug(code_text=code_text,
+                                                        error_message=error_message,
+                                                        hint=fix_index.hint(fixes),
+                                                        llm_model=llm_model,
+                                                        temperature=temperature)
+        except Exception:
+            return None, (0, 0)
+        tokens = (getattr(response_token_usage, 'completion_tokens', 0), getattr(response_token_usage, 'prompt_tokens', 0))
+        hinted_code = extract_target_text(response, "code")
+        execution = execute_code(hinted_code, problem=value)
+        if not cls.resolves(execution, signature, hinted_code):
+            return None, tokens
+        fix_index.mark_used(signature, fixes[0], "hinted")
+        return {"kind": "hint", "code_text": hinted_code, "execution": execution}, tokens
+
+    @staticmethod
+    def debug_candidates(value: dict,
+                         nlp: str,
+                         model_text: str,
+                         code_text: str,
+                         error_message: str,
+                         llm_model: str,
+                         temperature: float,
+                         k: int,
+                         candidate_temperature: float) -> Tuple[dict, Tuple[int, int]]:
+        """
+        One debug round with `k` candidate fixes requested at once. Each fix is
+        executed as soon as it arrives; the first one that runs without error
+        wins; the remaining requests are cancelled and executions still running
+        are killed, so they free their pool worker and cores. If none
+        runs cleanly, the lowest-numbered executed candidate carries on to the
+        next round. Candidate 0 uses `temperature`, the others
+        `candidate_temperature` so that they differ.
+
+        Returns:
+            tuple: ({"response", "code_text", "execution", "candidates", "error"},
+                    (completion_tokens, prompt_tokens))
+        """
+        completion_tokens, prompt_tokens = 0, 0
+        candidates = [{"candidate": i, "status": "cancelled"} for i in range(k)]
+        llm_futures = {
+            submit_debug(nlp=nlp, model_text=model_text, code_text=code_text, error_message=error_message,
+                         llm_model=llm_model, temperature=temperature if i == 0 else candidate_temperature,
+                         sample=i): i
+            for i in range(k)
+        }
+        execute_futures = {}
+        executions = {}
+        winner = None
+        pending = set(llm_futures)
+        cancel = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=k)
+        try:
+            while pending and winner is None:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=lambda f: llm_futures.get(f, execute_futures.get(f))):
+                    if future in llm_futures:
+                        i = llm_futures[future]
+                        try:
+                            response, response_token_usage = future.result()
+                        except Exception as e:
+                            candidates[i].update(status="llm_error", error=str(e))
+                            continue
+                        completion_tokens += getattr(response_token_usage, 'completion_tokens', 0)
+                        prompt_tokens += getattr(response_token_usage, 'prompt_tokens', 0)
+                        candidate_code = extract_target_text(response, "code")
+                        candidates[i].update(status="running", response=response, code_text=candidate_code)
+                        execute_future = executor.submit(execute_code, candidate_code, problem=value, cancel=cancel)
+                        execute_futures[execute_future] = i
+                        pending.add(execute_future)
+                    else:
+                        i = execute_futures[future]
+                        executions[i] = future.result()
+                        output = executions[i].output
+                        failed = type(output) is str and "Error" in output
+                        candidates[i].update(status="failed" if failed else "winner",
+                                             execution=executions[i].summary())
+                        if not failed:
+                            winner = i
+                            break
+        finally:
+            cancel.set()
+            for future in pending:
+                if future in llm_futures:
+                    future.cancel()
+            # Cancelled executions stop within a poll interval
+            executor.shutdown(wait=True)
+        for future, i in execute_futures.items():
+            if candidates[i]["status"] != "running":
+                continue
+            execution = future.result()
+            if execution.error_kind == "cancelled":
+                candidates[i].update(status="cancelled", execution=execution.summary())
+            else:
+                # Finished before it could be stopped; its result is kept but it does not win
+                executions[i] = execution
+                output = execution.output
+                candidates[i].update(status="failed" if type(output) is str and "Error" in output else "finished",
+                                     execution=execution.summary())
+
+        if winner is None and executions:
+            winner = min(executions)
+        round_result = {"candidates": [{field: entry for field, entry in candidate.items() if field != "code_text"}
+                                       for candidate in candidates],
+                        "response": None, "code_text": None, "execution": None, "error": None}
+        if winner is None:
+            round_result["error"] = next((c["error"] for c in candidates if "error" in c), "No debug candidate returned")
+        else:
+            round_result.update(response=candidates[winner]["response"],
+                                code_text=candidates[winner]["code_text"],
+                                execution=executions[winner])
+        return round_result, (completion_tokens, prompt_tokens)
+
     def __call__(
         self,
         dataset: Dataset,
@@ -189,6 +739,11 @@ class ORThoughtSolveAgent():
         llm_model: str = "gpt-4.1-nano",
         temperature: float = 0.0,
         debug_max_try: int = 0,
+        debug_candidates: int = 1,
+        candidate_temperature: float = 0.7,
+        autofix: bool = False,
+        compact_debug: bool = False,
+        resume: bool = False,
     ):
 
         data = dataset.data
@@ -199,110 +754,84 @@ class ORThoughtSolveAgent():
 
         # Initialize token manager
         token_manager = TokenManager(llm_model)
+        stats_window = LLMStatsWindow()
 
-        initial_path = os.path.join(save_path, base_pattern)
-        if debug_max_try > 0:
-            result_path = os.path.join(save_path, base_pattern, "debug")
-            process_name = f"{base_pattern} Code Debugging"
-        else:
-            result_path = initial_path
-            process_name = f"{base_pattern} Code Execution"
+        initial_path, result_path, process_name = self.result_paths(save_path, base_pattern, debug_max_try)
         
         os.makedirs(result_path, exist_ok=True)
         console.print(Panel.fit(process_name), style="bold blue")
         console.print(f"result_path: {result_path}", style="bold green")
         results_file = os.path.join(result_path, f"results.json")
-        result_dict = {}
+        journal = ResultJournal(results_file)
+        manifest = CompletionManifest(result_path)
         execute_results = {}
         except_keys = []
 
         # Use list unpacking to take the first item_num elements
         data_items = list(islice(data.items(), item_num))
-        for key, value in track(
-                data_items,
+        key_rank = {key: rank for rank, (key, _) in enumerate(data_items)}
+        previous_results = load_results(results_file)
+        todo_items = pending_items(data_items, manifest, "solve", previous_results, resume, console)
+        self.restore_skipped(data_items, todo_items, previous_results, execute_results)
+        scheduler = CostScheduler(dataset.dataset_name, f"{llm_model}/{base_pattern}/solve")
+        todo_items = scheduler.order(todo_items)
+        for key, value in track_items(
+                scheduler.timed_items(todo_items),
+                total=len(todo_items),
                 description=
                 f"🦊 |{base_pattern} Debugging| Processing ({dataset.dataset_name})..."
         ):
-
-            time.sleep(1)
-            nlp = value.get('description')
-            if dataset.if_sample_data:
-                sample_data = value.get('sample')[0].get('input')
-                nlp = combine_sample_data(nlp, sample_data)
-            result_dict[key] = {}
-
-            try:
-                model_path = os.path.join(initial_path, f"{key}.txt")
-                with open(model_path, 'r', encoding='utf-8') as f:
-                    model_text = f.read()
-            except FileNotFoundError:
-                console.print(f"Model file not found for {key}. Skipping.", style="bold red")
-                except_keys.append(key)
-                result_dict[key]["error"] = "Model file not found"
+            item_result, (completion_tokens, prompt_tokens) = self.solve_item(
+                key, value, dataset, initial_path, result_path,
+                llm_model=llm_model, temperature=temperature, debug_max_try=debug_max_try,
+                debug_candidates=debug_candidates, candidate_temperature=candidate_temperature,
+                autofix=autofix, compact_debug=compact_debug)
+            self.record_item(console, key, item_result, execute_results, except_keys)
+            journal.append(key, item_result)
+            self.mark_item(manifest, key, item_result, initial_path)
+            if "code_text" not in item_result:
                 continue
-            try:
-                code_path = os.path.join(initial_path, f"{key}.py")
-                with open(code_path, 'r', encoding='utf-8') as f:
-                    code_text = f.read()
-            except FileNotFoundError:
-                console.print(f"Code file not found for {key}. Skipping.", style="bold red")
-                except_keys.append(key)
-                result_dict[key]["error"] = "Code file not found"
-                continue
-
-            execute_result = execute_str_function(code_text)
-
-            debug_round = 0
-            completion_tokens, prompt_tokens = 0, 0
-            while (
-                    type(execute_result) is str
-            ) and "Error" in execute_result and debug_round < debug_max_try:
-                debug_round += 1
-                try:
-                    response, response_token_usage = debug(
-                        nlp=nlp,
-                        model_text=model_text,
-                        code_text=code_text,
-                        error_message=execute_result,
-                        llm_model=llm_model,
-                        temperature=temperature
-                    )
-                    completion_tokens += getattr(response_token_usage, 'completion_tokens', 0)  # type: ignore
-                    prompt_tokens += getattr(response_token_usage, 'prompt_tokens', 0)  # type: ignore
-                except Exception as e:
-                    console.print(f"Error processing {key}: {e}", style="bold red")
-                    result_dict[key]["error"] = str(e)
-                    except_keys.append(key)
-                    continue
-                code_text = extract_target_text(response, "code")
-                execute_result = execute_str_function(code_text)
-                result_dict[key][f"debug_round_{debug_round}"] = response
-            result_dict[key]["code_text"] = code_text
-            execute_results[key] = execute_result
-            result_dict[key]["execute_result"] = execute_result
-
-            if os.path.exists(results_file):
-                with open(results_file, "r", encoding="utf-8") as file:
-                    existing_data = json.load(file)
-            else:
-                existing_data = {}
-
-            # Merge new data
-            existing_data.update(result_dict)
-            # Write back to file
-            with open(results_file, "w", encoding="utf-8") as file:
-                json.dump(existing_data, file, indent=2, ensure_ascii=False)
-
-            # Save code file
-            py_filename = os.path.join(result_path, f"{key}.py")
-            success = str2py(code_text, py_filename)
-            if not success:
-                console.print(f"Failed to write code for key: {key}",
-                              style="bold red")
 
             # Add token usage to manager
             token_manager.add_raw_tokens(completion_tokens, prompt_tokens)
-
+            token_manager.add_debug_rounds(item_result.get("debug_tokens", {}))
+
+        journal.compact(key_rank)
+        scheduler.save()
+        self.finish(console, dataset, result_path, token_manager, execute_results, except_keys, base_pattern, len(data_items),
+                    stats_window)
+        stats_window.close()
+
+    @staticmethod
+    def mark_item(manifest: CompletionManifest, key: str, item_result: dict, initial_path: str):
+        if "code_text" in item_result and "error" not in item_result and "write_error" not in item_result:
+            manifest.mark_complete("solve", key, [f"{key}.py"], inputs=[os.path.join(initial_path, f"{key}.py")])
+
+    @staticmethod
+    def restore_skipped(data_items: list, todo_items: list, previous_results: dict, execute_results: dict):
+        """Take execute results of items skipped on resume from the previous run."""
+        todo_keys = {key for key, _ in todo_items}
+        for key, _ in data_items:
+            if key not in todo_keys:
+                execute_results[key] = previous_results[key]["execute_result"]
+
+    @staticmethod
+    def record_item(console: Console, key: str, item_result: dict, execute_results: dict, except_keys: list):
+        if "code_text" not in item_result:
+            console.print(f"{item_result['error']} for {key}. Skipping.", style="bold red")
+            except_keys.append(key)
+            return
+        if "error" in item_result:
+            console.print(f"Error processing {key}: {item_result['error']}", style="bold red")
+            except_keys.append(key)
+        if "write_error" in item_result:
+            console.print(f"Failed to write code for key: {key}",
+                          style="bold red")
+        execute_results[key] = item_result["execute_result"]
+
+    def finish(self, console: Console, dataset: Dataset, result_path: str, token_manager: TokenManager,
+               execute_results: dict, except_keys: list, base_pattern: str, item_count: int,
+               stats_window: Optional[LLMStatsWindow] = None):
         # comapre execute results with ground truth
         # execute_results = execute_matching_files(result_path, "*.py")
         console.print("🐻 Comparing execute results with ground truth...")
@@ -316,14 +845,216 @@ class ORThoughtSolveAgent():
         console.print(f"👌 All results saved in {result_path} directory")
         console.print(f"Except keys: {except_keys}", style="bold red")
         console.print(
-            f"{base_pattern} Debugging Process Completed: {len(data_items)} items processed"
+            f"{base_pattern} Debugging Process Completed: {item_count} items processed"
         )
         token_manager.print_summary(console, style="bold green")
+        self.report_repairs(console, result_path)
 
         token_save_path = os.path.join(result_path, "token.json")
         # Load existing data if exists and save updated data
         token_manager.load_existing_data(token_save_path)
         token_manager.save_to_file(token_save_path)
+        save_llm_stats(os.path.join(result_path, "llm_stats.json"), stats_window)
+
+
+    @staticmethod
+    def report_repairs(console: Console, result_path: str):
+        """Print the repairs made without a full debug call and how many LLM debug calls they saved."""
+        results = load_results(os.path.join(result_path, "results.json"))
+        rules, kinds = {}, {}
+        for item_result in results.values():
+            for fix in item_result.get("autofix", []):
+                rules[fix["rule"]] = rules.get(fix["rule"], 0) + 1
+            for fix in item_result.get("fix_index", []):
+                kinds[fix["kind"]] = kinds.get(fix["kind"], 0) + 1
+        if not rules and not kinds:
+            return
+        saved = sum(item_result.get("llm_calls_saved", 0) for item_result in results.values())
+        console.print(f"🔧 Autofix: {sum(rules.values())} local fixes {rules}, "
+                      f"fix index: {sum(kinds.values())} known fixes reused {kinds}, "
+                      f"{saved} LLM debug calls saved", style="bold green")
+
+
+class ORThoughtPipelineAgent():
+    """
+    Fused ORThought model-then-solve pipeline.
+
+    Each problem moves on to execution and the debug loop as soon as its code
+    has been generated, instead of waiting for the whole dataset to be
+    modeled. Generation and solving run as two pools of workers connected by
+    a bounded queue, so the wall time approaches that of the slowest stage.
+    The output layout is the same as running ORThoughtModelAgent followed by
+    ORThoughtSolveAgent.
+    """
+
+    def __call__(
+        self,
+        dataset: Dataset,
+        save_path: str,
+        item_num: int,
+        llm_model: str = "gpt-4.1-nano",
+        temperature: float = 0.0,
+        mode: str = "formalized",
+        debug_max_try: int = 0,
+        debug_candidates: int = 1,
+        candidate_temperature: float = 0.7,
+        autofix: bool = False,
+        compact_debug: bool = False,
+        concurrency: int = 1,
+        queue_size: Optional[int] = None,
+        resume: bool = False,
+    ):
+        data = dataset.data
+        item_num = min(item_num, len(dataset))
+        concurrency = max(1, concurrency)
+        queue_size = queue_size or 2 * concurrency
+
+        console = Console()
+        model_agent = ORThoughtModelAgent()
+        solve_agent = ORThoughtSolveAgent()
+        base_pattern = f"orthought_{mode}"
+
+        model_path = os.path.join(save_path, base_pattern)
+        initial_path, result_path, process_name = solve_agent.result_paths(save_path, base_pattern, debug_max_try)
+        os.makedirs(model_path, exist_ok=True)
+        os.makedirs(result_path, exist_ok=True)
+        console.print(Panel.fit(f"{base_pattern} Pipeline: Modeling -> {process_name}"), style="bold blue")
+        console.print(f"result_path: {result_path}", style="bold green")
+        model_journal = ResultJournal(os.path.join(model_path, "results.json"))
+        model_manifest = CompletionManifest(model_path)
+        # Without debugging both stages share one results.json
+        if result_path == model_path:
+            solve_journal, solve_manifest = model_journal, model_manifest
+        else:
+            solve_journal = ResultJournal(os.path.join(result_path, "results.json"))
+            solve_manifest = CompletionManifest(result_path)
+
+        model_token_manager = TokenManager(llm_model)
+        solve_token_manager = TokenManager(llm_model)
+        # The stages run interleaved, so both get the statistics of the whole pipeline
+        stats_window = LLMStatsWindow()
+        execute_results = {}
+        model_except_keys, solve_except_keys = [], []
+
+        data_items = list(islice(data.items(), item_num))
+        key_rank = {key: rank for rank, (key, _) in enumerate(data_items)}
+        previous_solve_results = load_results(os.path.join(result_path, "results.json"))
+        todo_items = pending_items(data_items, solve_manifest, "solve", previous_solve_results, resume, console)
+        solve_agent.restore_skipped(data_items, todo_items, previous_solve_results, execute_results)
+        # Items whose code is already generated go straight to the solve stage
+        modeled_keys = set()
+        if resume:
+            previous_model_results = load_results(os.path.join(model_path, "results.json"))
+            modeled_keys = {key for key, _ in todo_items
+                            if model_manifest.is_complete("model", key, previous_model_results)}
+        # Order by the expected time of both stages, longest first
+        model_scheduler = CostScheduler(dataset.dataset_name, f"{llm_model}/{base_pattern}/model")
+        solve_scheduler = CostScheduler(dataset.dataset_name, f"{llm_model}/{base_pattern}/solve")
+        todo_items = model_scheduler.order(todo_items, solve_scheduler)
+        model_item = model_scheduler.timed(model_agent.model_item)
+        solve_item = solve_scheduler.timed(solve_agent.solve_item)
+
+        item_queue = queue.Queue()
+        for item in todo_items:
+            item_queue.put(item)
+        solve_queue = queue.Queue(maxsize=queue_size)
+        event_queue = queue.Queue()
+
+        def model_worker():
+            while True:
+                try:
+                    key, value = item_queue.get_nowait()
+                except queue.Empty:
+                    return
+                if key in modeled_keys:
+                    event_queue.put(("model", key, None))
+                    solve_queue.put((key, value))
+                    continue
+                try:
+                    event = ("model", key, model_item(
+                        key, value, dataset, model_path,
+                        llm_model=llm_model, temperature=temperature, mode=mode))
+                except Exception as e:
+                    event = ("model", key, ({"error": str(e)}, None))
+                event_queue.put(event)
+                # Blocks while the solve stage is saturated (backpressure)
+                solve_queue.put((key, value))
+
+        def solve_worker():
+            while True:
+                item = solve_queue.get()
+                if item is None:
+                    return
+                key, value = item
+                try:
+                    event = ("solve", key, solve_item(
+                        key, value, dataset, initial_path, result_path,
+                        llm_model=llm_model, temperature=temperature, debug_max_try=debug_max_try,
+                        debug_candidates=debug_candidates, candidate_temperature=candidate_temperature,
+                        autofix=autofix, compact_debug=compact_debug))
+                except Exception as e:
+                    event = ("solve", key, ({"error": str(e)}, (0, 0)))
+                event_queue.put(event)
+
+        model_threads = [threading.Thread(target=model_worker, daemon=True) for _ in range(concurrency)]
+        solve_threads = [threading.Thread(target=solve_worker, daemon=True) for _ in range(concurrency)]
+        for thread in model_threads + solve_threads:
+            thread.start()
+
+        def close_solve_stage():
+            for thread in model_threads:
+                thread.join()
+            for _ in solve_threads:
+                solve_queue.put(None)
+
+        threading.Thread(target=close_solve_stage, daemon=True).start()
+
+        with progress_view(
+            TextColumn("[bold blue]{task.description}"),
+            BarColumn(bar_width=None),
+            TextColumn("[bold green]{task.completed}/{task.total}"),
+            "•",
+            TimeElapsedColumn(),
+            console=console,
+            expand=True
+        ) as progress:
+            model_task = progress.add_task(f"🦊 |{base_pattern} Modeling| -{dataset.dataset_name}-", total=len(todo_items))
+            solve_task = progress.add_task(f"🦊 |{process_name}| -{dataset.dataset_name}-", total=len(todo_items))
+            solved = 0
+            while solved < len(todo_items):
+                stage, key, result = event_queue.get()
+                if stage == "model" and result is None:
+                    # Skipped on resume
+                    progress.update(model_task, advance=1)
+                elif stage == "model":
+                    item_result, response_token_usage = result
+                    if "error" in item_result:
+                        console.print(f"Error processing {key}: {item_result['error']}", style="bold red")
+                        model_except_keys.append(key)
+                    model_journal.append(key, item_result)
+                    if "error" not in item_result and "write_error" not in item_result:
+                        model_manifest.mark_complete("model", key, [f"{key}.txt", f"{key}.py"])
+                    if response_token_usage is not None:
+                        model_token_manager.add_usage(response_token_usage)
+                    progress.update(model_task, advance=1)
+                else:
+                    item_result, (completion_tokens, prompt_tokens) = result
+                    solve_agent.record_item(console, key, item_result, execute_results, solve_except_keys)
+                    solve_journal.append(key, item_result)
+                    solve_agent.mark_item(solve_manifest, key, item_result, initial_path)
+                    if "code_text" in item_result:
+                        solve_token_manager.add_raw_tokens(completion_tokens, prompt_tokens)
+                        solve_token_manager.add_debug_rounds(item_result.get("debug_tokens", {}))
+                    solved += 1
+                    progress.update(solve_task, advance=1)
+
+        model_journal.compact(key_rank)
+        solve_journal.compact(key_rank)
+        model_scheduler.save()
+        model_agent.finish(console, model_path, model_token_manager, model_except_keys, len(data_items), stats_window)
+        solve_agent.finish(console, dataset, result_path, solve_token_manager, execute_results,
+                           solve_except_keys, base_pattern, len(data_items), stats_window)
+        stats_window.close()
 
 
 class Baselines():
@@ -332,7 +1063,24 @@ class Baselines():
         self.code_result = {}
         self.pattern = ""
 
-    def __call__(self, dataset: Dataset, save_path: str, item_num: int, pattern: str, llm_model: str = "gpt-4.1-nano", temperature: float = 0.0):
+    @staticmethod
+    def save_sample_counts(console: Console, result_path: str, sample_counts: dict):
+        """Merge the number of self-consistency samples per problem into samples.json."""
+        samples_file = os.path.join(result_path, "samples.json")
+        per_problem = {}
+        if os.path.exists(samples_file):
+            with open(samples_file, "r", encoding="utf-8") as f:
+                per_problem = json.load(f).get("per_problem", {})
+        per_problem.update(sample_counts)
+        total = sum(per_problem.values())
+        with open(samples_file, "w", encoding="utf-8") as f:
+            json.dump({"total": total, "mean": total / len(per_problem), "per_problem": per_problem},
+                      f, indent=2, ensure_ascii=False)
+        console.print(f"Self-consistency samples: {sum(sample_counts.values())} for {len(sample_counts)} problems "
+                      f"(mean {sum(sample_counts.values()) / len(sample_counts):.2f})", style="bold green")
+
+    def __call__(self, dataset: Dataset, save_path: str, item_num: int, pattern: str, llm_model: str = "gpt-4.1-nano", temperature: float = 0.0, resume: bool = False,
+                 self_consistency: Optional[dict] = None):
 
         console = Console()
         data = dataset.data
@@ -340,12 +1088,21 @@ class Baselines():
         result_path = os.path.join(save_path, pattern)
         os.makedirs(result_path, exist_ok=True)
         results_file = os.path.join(result_path, "results.json")
-        result_dict = {}
+        journal = ResultJournal(results_file)
+        manifest = CompletionManifest(result_path)
+        data_items = list(islice(data.items(), item_num))
+        key_rank = {key: rank for rank, (key, _) in enumerate(data_items)}
+        todo_items = pending_items(data_items, manifest, pattern, load_results(results_file), resume, console)
+        scheduler = CostScheduler(dataset.dataset_name, f"{llm_model}/{pattern}")
+        todo_items = scheduler.order(todo_items)
         
         # Initialize TokenManager
         token_manager = TokenManager(llm_model)
+        stats_window = LLMStatsWindow()
+        # Samples drawn per problem by self_consistency
+        sample_counts = {}
 
-        with Progress(
+        with progress_view(
             TextColumn("[bold blue]{task.description}"),
             BarColumn(bar_width=None),
             "[progress.percentage]{task.percentage:>3.0f}%",
@@ -358,54 +1115,20 @@ class Baselines():
             console=Console(),
             expand=True
         ) as progress:
-            task = progress.add_task(f"Baseline -{pattern}- Processing data", total=item_num)
+            task = progress.add_task(f"Baseline -{pattern}- Processing -{dataset.dataset_name}-", total=len(todo_items))
 
-            for i, (key, value) in enumerate(islice(data.items(), item_num)):
+            for key, value in scheduler.timed_items(todo_items):
                 try:
-                    import time
-                    time.sleep(1)
-                    problem_description = value.get('description')
-                    nlp = problem_description
-                    if dataset.if_sample_data:
-                        sample_data = value.get('sample')[0].get('input')
-                        nlp = combine_sample_data(problem_description, sample_data)
-
-                    if pattern == "standard":
-                        response, tokens = standard(nlp,
-                                                    llm_model=llm_model, 
-                                                    temperature=temperature)
-                        model_text, code_text = extract_code_model(response)
-                    elif pattern == "zero-shot_cot":
-                        response, tokens = zero_shot_cot(nlp=nlp,
-                                                         llm_model=llm_model,
-                                                         temperature=temperature)
-                        model_text, code_text = extract_code_model(response)
-                    elif pattern == "self_consistency":
-                        most_frequent_response, response, tokens = self_consistency_vote(nlp=nlp, 
-                                                                                         llm_model=llm_model, 
-                                                                                         temperature=temperature)
-                        model_text, code_text = extract_code_model(most_frequent_response)
-                    else:
-                        console.print(f"Unknown pattern: {pattern}", style="blod red")
-                        raise ValueError(f"Unknown pattern: {pattern}")
+                    response, model_text, code_text, tokens = self.generate_item(
+                        key, value, dataset, pattern, llm_model=llm_model, temperature=temperature,
+                        self_consistency=self_consistency)
+                    if pattern == "self_consistency":
+                        sample_counts[key] = tokens.samples
 
                     # Add token usage to manager
                     token_manager.add_usage(tokens)
                     
-                    result_dict[key] = response
-                    # Check if file exists
-                    if os.path.exists(results_file):
-                        with open(results_file, "r", encoding="utf-8") as file:
-                            existing_data = json.load(file)
-                    else:
-                        existing_data = {}
-
-                    # Merge new data
-                    existing_data.update(result_dict)
-
-                    # Write back to file
-                    with open(results_file, "w", encoding="utf-8") as file:
-                        json.dump(existing_data, file, indent=2, ensure_ascii=False)
+                    journal.append(key, response)
 
                     txt_filename = os.path.join(result_path, f"{key}.txt")
                     with open(txt_filename, "w", encoding="utf-8") as f:
@@ -416,12 +1139,60 @@ class Baselines():
                     success = str2py(code_text, py_filename)
                     if not success:
                         console.print(f"Failed to write code for key: {key}", style="bold red")
+                    else:
+                        manifest.mark_complete(pattern, key, [f"{key}.txt", f"{key}.py"])
                     progress.update(task, advance=1)
                 except Exception as e:
                     console.print(f"Error processing {key}: {e}", style="bold red")
                     progress.update(task, advance=1)
                     continue
 
+        journal.compact(key_rank)
+        scheduler.save()
+        self.finish(console, dataset, result_path, token_manager, sample_counts, stats_window)
+        stats_window.close()
+
+    @staticmethod
+    def generate_item(key: str, value: dict, dataset: Dataset, pattern: str, llm_model: str = "gpt-4.1-nano",
+                      temperature: float = 0.0, self_consistency: Optional[dict] = None):
+        """
+        Generate the model and code for one problem with a baseline pattern.
+
+        Returns:
+            tuple: (response for results.json, model text, code text, token usage)
+        """
+        problem_description = value.get('description')
+        nlp = problem_description
+        if dataset.if_sample_data:
+            sample_data = value.get('sample')[0].get('input')
+            nlp = combine_sample_data(problem_description, sample_data)
+
+        if pattern == "standard":
+            response, tokens = standard(nlp,
+                                        llm_model=llm_model, 
+                                        temperature=temperature)
+            model_text, code_text = extract_code_model(response)
+        elif pattern == "zero-shot_cot":
+            response, tokens = zero_shot_cot(nlp=nlp,
+                                             llm_model=llm_model,
+                                             temperature=temperature)
+            model_text, code_text = extract_code_model(response)
+        elif pattern == "self_consistency":
+            most_frequent_response, response, tokens = self_consistency_vote(nlp=nlp, 
+                                                                             llm_model=llm_model, 
+                                                                             temperature=temperature,
+                                                                             problem=value,
+                                                                             **(self_consistency or {}))
+            model_text, code_text = extract_code_model(most_frequent_response)
+        else:
+            raise ValueError(f"Unknown pattern: {pattern}")
+        return response, model_text, code_text, tokens
+
+    def finish(self, console: Console, dataset: Dataset, result_path: str, token_manager: TokenManager,
+               sample_counts: dict, stats_window: Optional[LLMStatsWindow] = None):
+        """Save token usage, then execute the generated code and compare it with the ground truth."""
+        if sample_counts:
+            self.save_sample_counts(console, result_path, sample_counts)
 
         console.print("\n👌 All the problems have been translated to models and codes", style="bold green")
         console.print("-"*20)
@@ -432,12 +1203,13 @@ class Baselines():
         # Load existing data if exists and save updated data
         token_manager.load_existing_data(token_save_path)
         token_manager.save_to_file(token_save_path)
+        save_llm_stats(os.path.join(result_path, "llm_stats.json"), stats_window)
         console.print(f"👌 Token Usage is calculated and results saved in {token_save_path}\n", style="bold green")
 
 
         # Execute the code files and save the results
         console.print("🐻 Executing code generated...", style="bold green")
-        execution_results = execute_matching_files(result_path, "*.py", True)
+        execution_results = execute_matching_files(result_path, "*.py", True, problems=dataset.data)
         self.code_result = execution_results
         compare_results(execution_results,
                         dataset.ground_truth,
@@ -463,7 +1235,8 @@ class Reflexion():
         llm_model: str = "gpt-4.1-nano",
         temperature: float = 0.0,
         round_num: int = 1,
-        start_round: int = 0
+        start_round: int = 0,
+        resume: bool = False
     ):
         from method import reflexion
         data = dataset.data
@@ -475,6 +1248,7 @@ class Reflexion():
         for r in range(start_round + 1, start_round + round_num + 1):
             # Initialize TokenManager
             token_manager = TokenManager(llm_model)
+            stats_window = LLMStatsWindow()
 
             result_path = os.path.join(save_path, "reflexion",
                                     f"round_{r}")
@@ -484,21 +1258,39 @@ class Reflexion():
             os.makedirs(result_path, exist_ok=True)
 
             results_file = os.path.join(result_path, f"results.json")
-            result_dict = {}
+            journal = ResultJournal(results_file)
             execute_results = {}
             except_keys = []
 
+            # Results of the initial pattern (round 0) and earlier reflexion rounds,
+            # read from results.json and/or an unfinished run's results.jsonl
+            previous_results = {0: load_results(os.path.join(initial_path, "results.json"))}
+            for i in range(1, r):
+                previous_results[i] = load_results(os.path.join(save_path, "reflexion", f"round_{i}", "results.json"))
+
             data_items = list(islice(data.items(), item_num))
-            for key, value in track(
-                    data_items,
+            key_rank = {key: rank for rank, (key, _) in enumerate(data_items)}
+            stage = f"reflexion_round_{r}"
+            manifest = CompletionManifest(result_path)
+            todo_items = pending_items(data_items, manifest, stage, load_results(results_file), resume, console)
+            todo_keys = {key for key, _ in todo_items}
+            for key, _ in data_items:
+                if key not in todo_keys:
+                    # Completed in an earlier run; only its code needs re-executing
+                    with open(os.path.join(result_path, f"{key}.py"), 'r', encoding='utf-8') as f:
+                        execute_results[key] = execute_str_function(f.read(), problem=data[key])
+
+            scheduler = CostScheduler(dataset.dataset_name, f"{llm_model}/reflexion")
+            todo_items = scheduler.order(todo_items)
+            for key, value in track_items(
+                    scheduler.timed_items(todo_items),
+                    total=len(todo_items),
                     description=
                     f"|Reflexion| Processing -{dataset.dataset_name}- Round {r}..."
             ):
-                time.sleep(2)
-
                 # A list to store history messages
                 messages = []
-                result_dict[key] = {}
+                item_result = {}
                 nlp = value.get('description')
                 if dataset.if_sample_data:
                     sample_data = value.get('sample')[0].get('input')
@@ -512,19 +1304,18 @@ class Reflexion():
                     # Load the previous round's messages
                     try:
                         if i == 0:
-                            round_result_file_path = os.path.join(initial_path, f"results.json")
                             round_result_folder_path = initial_path
-                            df = pd.read_json(round_result_file_path,
-                                            orient='index')
-                            messages.append({"role": "assistant", "content": df.loc[key].values[0]})
+                            initial_response = previous_results[i][key]
+                            if isinstance(initial_response, list):
+                                # self_consistency stores all sampled responses
+                                initial_response = initial_response[0]
+                            messages.append({"role": "assistant", "content": initial_response})
                         else:
-                            round_result_file_path = os.path.join(save_path, "reflexion", f"round_{i}", f"results.json")
                             round_result_folder_path = os.path.join(save_path, "reflexion", f"round_{i}")
-                            df = pd.read_json(round_result_file_path, orient='index')
                             messages.append({"role": "user", "content": feedback_prompt})
-                            messages.append({"role": "assistant", "content": df.loc[key]["feedback_response"]})
+                            messages.append({"role": "assistant", "content": previous_results[i][key]["feedback_response"]})
                             messages.append({"role": "user", "content": reflection_prompt})
-                            messages.append({"role": "assistant", "content": df.loc[key]["reflection_response"]})
+                            messages.append({"role": "assistant", "content": previous_results[i][key]["reflection_response"]})
                     except:
                         console.print(f"Round {i} results not found for {key}. Skipping.",
                                       style="bold red")
@@ -534,7 +1325,7 @@ class Reflexion():
                     code_path = os.path.join(round_result_folder_path, f"{key}.py")
                     with open(code_path, 'r', encoding='utf-8') as f:
                         code_text = f.read()
-                    execute_result = execute_str_function(code_text)
+                    execute_result = execute_str_function(code_text, problem=value)
 
                 except FileNotFoundError:
                     console.print(f"Code file not found for {key}. Skipping.",
@@ -551,29 +1342,17 @@ class Reflexion():
                 except Exception as e:
                     console.print(f"Error processing {key}: {e}",
                                   style="bold red")
-                    result_dict[key]["error"] = str(e)
+                    item_result["error"] = str(e)
+                    journal.append(key, item_result)
                     except_keys.append(key)
                     continue
-                result_dict[key]["feedback_response"] = feedback_response
-                result_dict[key]["reflection_response"] = reflection_response
+                item_result["feedback_response"] = feedback_response
+                item_result["reflection_response"] = reflection_response
                 model_text, code_text = extract_code_model(reflection_response)
-                execute_result = execute_str_function(code_text)
+                execute_result = execute_str_function(code_text, problem=value)
                 execute_results[key] = execute_result
 
-                if os.path.exists(results_file):
-                    with open(results_file, "r", encoding="utf-8") as file:
-                        existing_data = json.load(file)
-                else:
-                    existing_data = {}
-
-                # Merge new data
-                existing_data.update(result_dict)
-                # Write back to file
-                with open(results_file, "w", encoding="utf-8") as file:
-                    json.dump(existing_data,
-                              file,
-                              indent=2,
-                              ensure_ascii=False)
+                journal.append(key, item_result)
 
                 # Save model and code files
                 txt_filename = os.path.join(result_path, f"{key}.txt")
@@ -584,10 +1363,16 @@ class Reflexion():
                 if not success:
                     console.print(f"Failed to write code for key: {key}",
                                   style="bold red")
+                else:
+                    manifest.mark_complete(stage, key, [f"{key}.txt", f"{key}.py"],
+                                           inputs=[os.path.join(round_result_folder_path, f"{key}.py")])
 
                 # Add token usage to manager
                 token_manager.add_usage(reflection_token_usage)
 
+            journal.compact(key_rank)
+            scheduler.save()
+
             # compare execute results with ground truth
             console.print("🐻 Comparing execute results with ground truth...")
             compare_results(execute_results,
@@ -610,3 +1395,5 @@ class Reflexion():
             # Load existing data if exists and save updated data
             token_manager.load_existing_data(token_save_path)
             token_manager.save_to_file(token_save_path)
+            save_llm_stats(os.path.join(result_path, "llm_stats.json"), stats_window)
+            stats_window.close()